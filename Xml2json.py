@@ -1,18 +1,17 @@
 import sublime, sublime_plugin
 import os
+import threading
+import time
+from collections import deque
 
 try:
 	st_ver = int(sublime.version())
 except Exception:
 	st_ver = 4000
 if st_ver >= 3000:
-	from collections import OrderedDict
-	import json
-	from . import xmltodict
+	from . import xml2json_core
 else:
-	import xmltodict
-	import simplejson as json
-	from ordereddict import OrderedDict
+	import xml2json_core
 
 def get_xml_candidates():
 	return [
@@ -31,128 +30,48 @@ def get_json_candidates():
 def get_settings():
 	return sublime.load_settings('xml2json.sublime-settings')
 
-def get_bool_setting(key, default):
-	value = get_settings().get(key, default)
-	if isinstance(value, str):
-		value = value.strip().lower()
-		if value in ('true', '1', 'yes', 'on', 'pretty', 'enable', 'enabled'):
-			return True
-		if value in ('false', '0', 'no', 'off', 'compact', 'disable', 'disabled'):
-			return False
-	return bool(value)
-
-def get_json_indent():
-	indent = get_settings().get('pretty_json_indent', 2)
-	try:
-		indent = int(indent)
-		if indent < 0:
-			indent = 2
-	except Exception:
-		indent = 2
-	return indent
-
-def get_xml_indent():
-	indent = get_settings().get('pretty_xml_indent', 2)
-	try:
-		indent = int(indent)
-		if indent < 0:
-			indent = 2
-	except Exception:
-		indent = 2
-	return ' ' * indent
-
-def get_json_ensure_ascii():
-	return get_bool_setting('json_ensure_ascii', False)
-
-def get_json_sort_keys():
-	return get_bool_setting('json_sort_keys', False)
-
-def get_attr_text_normalization_enabled():
-	return get_bool_setting('normalize_attribute_text_pairs', True)
-
-def get_attr_text_value_key():
-	value_key = get_settings().get('attribute_text_value_key', 'value')
-	if not isinstance(value_key, str):
-		return 'value'
-	value_key = value_key.strip()
-	return value_key or 'value'
-
-def get_default_root_name():
-	root = get_settings().get('default_xml_root_name', 'root')
-	if not isinstance(root, str):
-		return 'root'
-	root = root.strip()
-	return root or 'root'
-
-def get_empty_tag_style():
-	style = get_settings().get('empty_tag_style', 'compact')
-	if isinstance(style, str):
-		style = style.strip().lower()
-	else:
-		style = 'compact'
-	if style not in ('compact', 'spaced', 'expanded'):
-		style = 'compact'
-	return style
-
-def get_default_pretty():
-	default_value = get_settings().get('default_conversion_pretty', True)
-	if isinstance(default_value, str):
-		default_value = default_value.strip().lower()
-		if default_value == 'compact':
-			return False
-		if default_value == 'pretty':
-			return True
-	return bool(default_value)
-
-def get_include_xml_declaration():
-	return get_bool_setting('include_xml_declaration', True)
-
-def get_line_ending():
-	value = get_settings().get('line_ending', 'auto')
-	if isinstance(value, str):
-		value = value.strip().lower()
-		if value in ('lf', '\\n', 'unix'):
-			return '\n'
-		if value in ('crlf', '\\r\\n', 'windows'):
-			return '\r\n'
-		if value in ('cr', '\\r', 'mac'):
-			return '\r'
-	return None
-
-def get_ensure_final_newline():
-	return get_bool_setting('ensure_final_newline', True)
+# parsed settings, rebuilt after the settings file changes
+_conversion_settings = None
 
-def get_trim_trailing_whitespace():
-	return get_bool_setting('trim_trailing_whitespace', True)
+def _invalidate_conversion_settings():
+	global _conversion_settings
+	_conversion_settings = None
 
-def normalize_newlines(text, source_text=None):
-	target_newline = get_line_ending()
-	if target_newline is None and source_text:
-		if '\r\n' in source_text:
-			target_newline = '\r\n'
-		elif '\r' in source_text:
-			target_newline = '\r'
-		else:
-			target_newline = '\n'
-
-	text = text.replace('\r\n', '\n').replace('\r', '\n')
-	has_trailing_newline = text.endswith('\n')
-
-	if get_trim_trailing_whitespace():
-		lines = text.split('\n')
-		lines = [line.rstrip(' \t') for line in lines]
-		text = '\n'.join(lines)
-
-	if target_newline:
-		text = text.replace('\n', target_newline)
-
-	newline = target_newline or '\n'
-
-	if get_ensure_final_newline():
-		if not text.endswith(('\n', '\r')):
-			text += newline
-	elif has_trailing_newline and not text.endswith(('\n', '\r')):
-		text += newline
+def get_conversion_settings():
+	"""
+	The current settings as an immutable xml2json_core.ConversionSettings.
+	Commands take one snapshot when they start and pass it along, so a
+	conversion sees consistent values even if the settings change meanwhile.
+	"""
+	global _conversion_settings
+	snapshot = _conversion_settings
+	if snapshot is None:
+		settings = get_settings()
+		settings.clear_on_change('xml2json')
+		settings.add_on_change('xml2json', _invalidate_conversion_settings)
+		snapshot = _conversion_settings = xml2json_core.ConversionSettings.load(settings.get)
+	return snapshot
+
+def plugin_unloaded():
+	get_settings().clear_on_change('xml2json')
+	for preview in _live_previews.values():
+		preview.stop()
+	_live_previews.clear()
+
+def get_background_conversion(size, settings):
+	return settings.background_conversion and size >= settings.background_conversion_min_size
+
+def normalize_newlines(text, source_text=None, settings=None, clean=False, timings=None):
+	settings = settings or get_conversion_settings()
+	with xml2json_core.timed(timings, 'newlines', len(text)) as stage:
+		text = xml2json_core.normalize_newlines(
+			text,
+			settings.line_ending,
+			settings.trim_trailing_whitespace,
+			settings.ensure_final_newline,
+			source_text,
+			clean)
+		stage.size_out = len(text)
 	return text
 
 def setSyntaxSafely(view, candidates):
@@ -167,7 +86,7 @@ def setSyntaxSafely(view, candidates):
 		except Exception:
 			pass
 
-def newViewWithText(text, syntax=None, source_text=None):
+def newViewWithText(text, syntax=None, source_text=None, normalize=True, settings=None, timings=None):
 	newView = sublime.active_window().new_file()
 
 	try:
@@ -175,41 +94,45 @@ def newViewWithText(text, syntax=None, source_text=None):
 	except Exception:
 		st_ver = 4000
 
-	text = normalize_newlines(text, source_text)
+	if normalize:
+		text = normalize_newlines(text, source_text, settings, timings=timings)
 
-	if st_ver >= 3000:
-		newView.run_command('append',{'characters':text})
-	else:
-		newEdit = newView.begin_edit()
-		newView.insert(newEdit,0,text)
-		newView.end_edit(newEdit)
+	with xml2json_core.timed(timings, 'append', len(text)):
+		if st_ver >= 3000:
+			newView.run_command('append',{'characters':text})
+		else:
+			newEdit = newView.begin_edit()
+			newView.insert(newEdit,0,text)
+			newView.end_edit(newEdit)
 	if syntax == 'xml':
 		setSyntaxSafely(newView, get_xml_candidates())
 
 	elif syntax == 'json':
 		setSyntaxSafely(newView, get_json_candidates())
 
-def save_with_prompt(source_view, text, syntax, extension, source_label, source_text=None):
+def save_with_prompt(source_view, text, syntax, extension, source_label, source_text=None, normalize=True, settings=None, timings=None):
 	target_path = None
 	source_path = source_view.file_name()
 	if source_path:
 		target_path = os.path.splitext(source_path)[0] + extension
 	if not target_path:
-		newViewWithText(text, syntax, source_text)
+		newViewWithText(text, syntax, source_text, normalize, settings, timings)
 		sublime.status_message(source_label + ': source not saved, opened new buffer')
 		return
 
-	text = normalize_newlines(text, source_text)
+	if normalize:
+		text = normalize_newlines(text, source_text, settings, timings=timings)
 	if os.path.exists(target_path):
 		choice = sublime.yes_no_cancel_dialog('File exists:\n{}\nOverwrite?'.format(target_path), 'Overwrite', 'Don\'t Overwrite')
 		if choice != sublime.DIALOG_YES:
-			newViewWithText(text, syntax, source_text)
+			newViewWithText(text, syntax, normalize=False, timings=timings)
 			sublime.status_message(source_label + ': did not overwrite existing file')
 			return
 
 	try:
-		with open(target_path, 'w', encoding='utf-8') as handle:
-			handle.write(text)
+		with xml2json_core.timed(timings, 'write', len(text)):
+			with open(target_path, 'w', encoding='utf-8') as handle:
+				handle.write(text)
 		new_view = sublime.active_window().open_file(target_path)
 		if syntax == 'json':
 			setSyntaxSafely(new_view, get_json_candidates())
@@ -218,288 +141,829 @@ def save_with_prompt(source_view, text, syntax, extension, source_label, source_
 		sublime.status_message(source_label + ': saved to ' + target_path)
 	except Exception as e:
 		sublime.error_message(source_label + ' error saving file: ' + str(e))
-		newViewWithText(text, syntax)
+		newViewWithText(text, syntax, normalize=False)
+
+# view id -> ConversionJob for conversions running in the background
+_running_jobs = {}
+
+class ConversionJob(object):
+	"""
+	State shared between a background conversion and the UI thread.
+	"""
+	def __init__(self, view, label):
+		self.view = view
+		self.label = label
+		self.cancelled = False
+		self.percent = None
+
+	def progress(self, done, total):
+		if self.cancelled:
+			raise xml2json_core.ConversionCancelled()
+		percent = int(done * 100 / total) if total else 100
+		if percent != self.percent:
+			self.percent = percent
+			sublime.set_timeout(lambda: self.show_status('{}%'.format(percent)), 0)
+
+	def show_status(self, text):
+		self.view.set_status('xml2json', self.label + ': ' + text)
+
+	def clear_status(self):
+		self.view.erase_status('xml2json')
+
+def selected_regions(view):
+	"""
+	The non-empty selections of `view`, or [] when nothing is selected.
+	"""
+	return [region for region in view.sel() if not region.empty()]
+
+def run_conversion(view, label, work, on_done, selections=True):
+	"""
+	Run work(fulltext, progress, settings, timings) on a snapshot of the
+	whole buffer and of the settings, and pass the result to
+	on_done(result, fulltext, change_count, timings) on the UI thread.
+	`timings` is an xml2json_core.Timings when stage_timings is on, else None.
+
+	With `selections` set and text selected, each non-empty selection is
+	converted on its own instead and the results replace the selections in
+	one edit; on_done is not called then.
+
+	Buffers of at least background_conversion_min_size characters are
+	converted on a worker thread, reporting progress in the status bar; the
+	job can be stopped with the xml2json_cancel command. work() may return
+	None to signal that it already reported a failure.
+	"""
+	if view.id() in _running_jobs:
+		sublime.status_message(label + ': a conversion is already running in this view')
+		return
+	settings = get_conversion_settings()
+	work = cached_work(label, work, settings)
+	timings = xml2json_core.Timings(settings.instrument_memory) if settings.instrument else None
+	change_count = view.change_count()
+	regions = selected_regions(view) if selections else []
+	if regions:
+		texts = [view.substr(region) for region in regions]
+		size = sum(len(text) for text in texts)
+		# a selection inside a larger file keeps its own trailing newline
+		# (or lack of it) instead of following ensure_final_newline
+		work_all = lambda progress: convert_all(work, texts, progress, [
+			settings.replace(ensure_final_newline=text.endswith('\n')) for text in texts], timings)
+		replace = replace_regions_when_done(view, regions, change_count, label)
+		done = lambda result: replace(result, timings)
+	else:
+		fulltext = view.substr(sublime.Region(0, view.size()))
+		size = len(fulltext)
+		work_all = lambda progress: work(fulltext, progress, settings, timings)
+		done = lambda result: on_done(result, fulltext, change_count, timings)
+	if timings is not None:
+		done = report_timings_when_done(view, label, timings, done)
+
+	if not get_background_conversion(size, settings):
+		try:
+			result = work_all(None)
+		except Exception as e:
+			sublime.error_message(label + ' error: ' + str(e))
+			return
+		if result is not None:
+			done(result)
+		return
+
+	start_job(view, label, work_all, done)
+
+# results of recent conversions, bounded by the result_cache_mb setting
+_result_cache = xml2json_core.ResultCache(0)
+
+def cached_work(label, work, settings):
+	"""
+	Wrap a run_conversion() work function so that converting the same text
+	with the same command and settings again returns the earlier result.
+	"""
+	max_bytes = settings.result_cache_mb << 20
+	if max_bytes != _result_cache.max_bytes:
+		_result_cache.resize(max_bytes)
+	if not max_bytes:
+		return work
+
+	def cached(fulltext, progress, settings, timings):
+		with xml2json_core.timed(timings, 'cache', len(fulltext)) as stage:
+			key = _result_cache.key(fulltext, label, settings.output_key())
+			result = _result_cache.get(key)
+			if result is not None:
+				stage.name = 'cache hit'
+				stage.size_out = len(result)
+			else:
+				stage.name = 'cache miss'
+		if result is None:
+			result = work(fulltext, progress, settings, timings)
+			if result is not None:
+				_result_cache.put(key, result)
+		return result
+	return cached
+
+# most recent stage timing lines, shown in the xml2json_timings output panel
+_timing_history = deque(maxlen=200)
+
+def report_timings_when_done(view, label, timings, on_done):
+	"""
+	Wrap a run_conversion() callback so the stage timings are reported once
+	it has run: a summary in the status bar and a line in the history panel.
+	"""
+	def done(result):
+		on_done(result)
+		summary = '{} {:.2f}s: {}'.format(label, timings.total(), timings.summary())
+		sublime.status_message(summary)
+		name = view.file_name() or view.name() or 'untitled'
+		_timing_history.append('{} [{}] {}'.format(
+			time.strftime('%H:%M:%S'), os.path.basename(name), summary))
+		window = view.window() or sublime.active_window()
+		if window is not None:
+			update_timings_panel(window)
+	return done
+
+def update_timings_panel(window):
+	if st_ver >= 3000:
+		panel = window.create_output_panel('xml2json_timings')
+	else:
+		panel = window.get_output_panel('xml2json_timings')
+	lines = list(_timing_history)
+	lines.append('result cache: {}'.format(_result_cache))
+	panel.run_command('xml2json_replace', {'text': '\n'.join(lines) + '\n'})
+
+class Xml2jsonShowTimingsCommand(sublime_plugin.WindowCommand):
+	def run(self):
+		update_timings_panel(self.window)
+		self.window.run_command('show_panel', {'panel': 'output.xml2json_timings'})
+
+def convert_all(work, texts, progress, settings, timings=None):
+	"""
+	work() for each of `texts` with the matching entry of `settings`, spread
+	over a few threads. Returns the list of results, or None as soon as one
+	conversion fails.
+	"""
+	total = sum(len(text) for text in texts)
+	done = [0] * len(texts)
+	results = [None] * len(texts)
+	errors = []
+	pending = list(range(len(texts) - 1, -1, -1))
+	lock = threading.Lock()
+
+	def part_progress(index):
+		size = len(texts[index])
+		def report(part_done, part_total):
+			done[index] = part_done * size // part_total if part_total else size
+			progress(sum(done), total)
+		return report if progress is not None else None
+
+	def run():
+		while not errors:
+			with lock:
+				if not pending:
+					return
+				index = pending.pop()
+			try:
+				results[index] = work(texts[index], part_progress(index), settings[index], timings)
+			except BaseException as e:
+				errors.append(e)
+				return
+			if results[index] is None:
+				# work() already reported the failure
+				errors.append(None)
+				return
+
+	threads = [threading.Thread(target=run) for _ in range(min(len(texts), 4) - 1)]
+	for thread in threads:
+		thread.start()
+	run()
+	for thread in threads:
+		thread.join()
+	if errors:
+		if errors[0] is not None:
+			raise errors[0]
+		return None
+	return results
+
+def start_job(view, label, work, on_done):
+	"""
+	Run work(progress) on a worker thread registered as the running job of
+	`view`, then on_done(result) on the UI thread unless it was cancelled,
+	failed or returned None.
+	"""
+	job = ConversionJob(view, label)
+	_running_jobs[view.id()] = job
+	job.show_status('started')
+
+	def finish(result):
+		_running_jobs.pop(view.id(), None)
+		job.clear_status()
+		if job.cancelled:
+			sublime.status_message(label + ': cancelled')
+		elif result is not None:
+			on_done(result)
+
+	def worker():
+		result = None
+		try:
+			result = work(job.progress)
+		except xml2json_core.ConversionCancelled:
+			pass
+		except Exception as e:
+			# `e` is unbound once the except block ends, before the callback runs
+			message = label + ' error: ' + str(e)
+			sublime.set_timeout(lambda: sublime.error_message(message), 0)
+		sublime.set_timeout(lambda: finish(result), 0)
+
+	# a thread of our own, so long conversions don't hold up the shared async
+	# worker other plugins rely on
+	thread = threading.Thread(target=worker)
+	thread.daemon = True
+	thread.start()
+
+def replace_when_done(view, syntax, label):
+	"""
+	on_done callback for run_conversion() that replaces the buffer contents.
+	"""
+	def on_done(result, fulltext, change_count, timings=None):
+		with xml2json_core.timed(timings, 'replace', len(result)):
+			view.run_command('xml2json_replace', {
+				'text': result,
+				'change_count': change_count,
+				'syntax': syntax,
+				'label': label})
+	return on_done
+
+def replace_regions_when_done(view, regions, change_count, label):
+	"""
+	Callback for run_conversion() that replaces each of `regions` with the
+	matching result.
+	"""
+	def on_done(results, timings=None):
+		with xml2json_core.timed(timings, 'replace', sum(len(result) for result in results)):
+			view.run_command('xml2json_replace', {
+				'texts': results,
+				'regions': [[region.begin(), region.end()] for region in regions],
+				'change_count': change_count,
+				'label': label})
+	return on_done
+
+class Xml2jsonReplaceCommand(sublime_plugin.TextCommand):
+	"""
+	Applies a background conversion result, unless the buffer was modified
+	after the conversion started. Replaces the whole buffer with `text`, or
+	each of `regions` with the matching entry of `texts`.
+	"""
+	def run(self, edit, text=None, change_count=None, syntax=None, label='xml2json', regions=None, texts=None):
+		if change_count is not None and self.view.change_count() != change_count:
+			sublime.status_message(label + ': buffer changed during conversion, result discarded')
+			return
+		if regions is not None:
+			# back to front, so earlier regions keep their offsets
+			for (begin, end), text in sorted(zip(regions, texts), reverse=True):
+				self.view.replace(edit, sublime.Region(begin, end), text)
+			return
+		self.view.replace(edit, sublime.Region(0, self.view.size()), text)
+		if syntax == 'json':
+			setSyntaxSafely(self.view, get_json_candidates())
+		elif syntax == 'xml':
+			setSyntaxSafely(self.view, get_xml_candidates())
+
+class Xml2jsonCancelCommand(sublime_plugin.TextCommand):
+	def run(self, edit):
+		job = _running_jobs.get(self.view.id())
+		if job:
+			job.cancelled = True
+			job.show_status('cancelling...')
+
+	def is_enabled(self):
+		return self.view.id() in _running_jobs
+
+# source view id -> LivePreview
+_live_previews = {}
+
+class LivePreview(object):
+	"""
+	JSON preview of an XML view, kept up to date in a scratch view by an
+	xml2json_core.LiveConversion. A pause in editing converts the buffer
+	again on a worker thread; only the elements that changed are parsed
+	and only their JSON is replaced in the preview.
+	"""
+	def __init__(self, view, preview, settings):
+		self.view = view
+		self.preview = preview
+		self.settings = settings
+		self.live = xml2json_core.LiveConversion(
+			pretty=settings.pretty,
+			indent=settings.json_indent,
+			ensure_ascii=settings.ensure_ascii,
+			sort_keys=settings.sort_keys,
+			normalize=settings.normalize,
+			value_key=settings.value_key)
+		# bumped by every edit, so only the timer of the last one updates
+		self.generation = 0
+		self.running = False
+		self.pending = False
+		self.stopped = False
+		# preview change count after our last update; anything else means
+		# the preview was edited and has to be replaced in full
+		self.change_count = None
+
+	def schedule(self):
+		self.generation += 1
+		generation = self.generation
+		sublime.set_timeout(lambda: self.due(generation), self.settings.live_preview_delay)
+
+	def due(self, generation):
+		if self.stopped or generation != self.generation:
+			return
+		if self.running:
+			self.pending = True
+			return
+		self.running = True
+		fulltext = self.view.substr(sublime.Region(0, self.view.size()))
+		thread = threading.Thread(target=lambda: self.convert(fulltext))
+		thread.daemon = True
+		thread.start()
+
+	def convert(self, fulltext):
+		result = error = None
+		try:
+			result = self.live.update(fulltext)
+		except Exception as e:
+			error = e
+		sublime.set_timeout(lambda: self.apply(result, error), 0)
+
+	def apply(self, result, error):
+		self.running = False
+		if self.stopped:
+			return
+		if error is not None:
+			self.view.set_status('xml2json_preview', 'JSON preview: ' + str(error))
+		else:
+			self.view.erase_status('xml2json_preview')
+			self.show(result)
+		if self.pending:
+			self.pending = False
+			self.due(self.generation)
+
+	def show(self, result):
+		begin, end, text = result
+		if self.preview.change_count() != self.change_count:
+			text = self.live.text
+			if self.settings.ensure_final_newline and not text.endswith('\n'):
+				text += '\n'
+			self.preview.run_command('xml2json_replace', {'text': text})
+		elif begin != end or text:
+			self.preview.run_command('xml2json_replace', {
+				'regions': [[begin, end]],
+				'texts': [text]})
+		self.change_count = self.preview.change_count()
+
+	def stop(self, close_preview=False):
+		self.stopped = True
+		self.view.erase_status('xml2json_preview')
+		if close_preview:
+			if hasattr(self.preview, 'close'):
+				self.preview.close()
+			else:
+				window = self.preview.window()
+				if window is not None:
+					window.focus_view(self.preview)
+					window.run_command('close_file')
+					window.focus_view(self.view)
 
-def xml2json(fulltext, pretty=None):
+class Xml2jsonLivePreviewCommand(sublime_plugin.TextCommand):
+	"""
+	Shows the JSON of this XML view in a scratch view in the next group and
+	keeps it up to date while editing, or stops a running preview.
+	"""
+	def run(self, edit):
+		view = self.view
+		preview = _live_previews.pop(view.id(), None)
+		if preview is not None:
+			preview.stop(close_preview=True)
+			return
+		window = view.window() or sublime.active_window()
+		if window.num_groups() == 1:
+			window.set_layout({
+				'cols': [0.0, 0.5, 1.0],
+				'rows': [0.0, 1.0],
+				'cells': [[0, 0, 1, 1], [1, 0, 2, 1]]})
+		group = (window.get_view_index(view)[0] + 1) % window.num_groups()
+		preview_view = window.new_file()
+		preview_view.set_scratch(True)
+		name = view.file_name() or view.name() or 'untitled'
+		preview_view.set_name('JSON preview - ' + os.path.basename(name))
+		setSyntaxSafely(preview_view, get_json_candidates())
+		window.set_view_index(preview_view, group, len(window.views_in_group(group)))
+		window.focus_view(view)
+
+		preview = _live_previews[view.id()] = LivePreview(view, preview_view, get_conversion_settings())
+		preview.due(preview.generation)
+
+class Xml2jsonLivePreviewListener(sublime_plugin.EventListener):
+	def on_modified(self, view):
+		preview = _live_previews.get(view.id())
+		if preview is not None:
+			preview.schedule()
+
+	def on_close(self, view):
+		preview = _live_previews.pop(view.id(), None)
+		if preview is not None:
+			preview.stop(close_preview=True)
+			return
+		for source_id, preview in list(_live_previews.items()):
+			if preview.preview.id() == view.id():
+				del _live_previews[source_id]
+				preview.stop()
+
+
+def xml2json(fulltext, pretty=None, progress=None, settings=None, timings=None):
+	settings = settings or get_conversion_settings()
 	if pretty is None:
-		pretty = get_default_pretty()
+		pretty = settings.pretty
+	convert = xml2json_core.xml_to_json
+	if 0 < settings.parallel_conversion_min_size <= len(fulltext) and use_worker_processes():
+		convert = lambda *args, **kwargs: xml2json_core.xml_to_json_parallel(*args, min_size=0, **kwargs)
 	try:
-		jsonObj = xmltodict.parse(fulltext)
-		if get_attr_text_normalization_enabled():
-			jsonObj = apply_attr_text_normalization(jsonObj)
-		if pretty:
-			jsonStr = json.dumps(
-				jsonObj,
-				indent=get_json_indent(),
-				ensure_ascii=get_json_ensure_ascii(),
-				sort_keys=get_json_sort_keys())
-		else:
-			jsonStr = json.dumps(
-				jsonObj,
-				ensure_ascii=get_json_ensure_ascii(),
-				sort_keys=get_json_sort_keys())
+		jsonStr = convert(
+			fulltext,
+			pretty=pretty,
+			indent=settings.json_indent,
+			ensure_ascii=settings.ensure_ascii,
+			sort_keys=settings.sort_keys,
+			normalize=settings.normalize,
+			value_key=settings.value_key,
+			progress=progress,
+			timings=timings,
+			spill_size=settings.spill_text_min_size)
+	except xml2json_core.ConversionCancelled:
+		raise
 	except Exception as e:
 		sublime.error_message('xml2json error: ' + str(e))
 		return None
 	return jsonStr
 
+def xml2json_normalized(fulltext, progress=None, settings=None, timings=None):
+	settings = settings or get_conversion_settings()
+	jsonStr = xml2json(fulltext, progress=progress, settings=settings, timings=timings)
+	if jsonStr:
+		return normalize_newlines(jsonStr, fulltext, settings, clean=True, timings=timings)
+	return None
+
 class Xml2jsonCommand(sublime_plugin.TextCommand):
 	def run(self,edit):
-		fulltext = self.view.substr(sublime.Region(0, self.view.size()))
-		jsonStr = xml2json(fulltext)
-		if jsonStr:
-			newViewWithText(jsonStr, 'json', fulltext)
-
-def apply_attr_text_normalization(node, value_key=None):
-	"""
-	Smartly flattens xmltodict structure.
-	1. Flattens attributes ("@key" -> "key") and text ("#text" -> configurable value key).
-	2. Handles conflicts: if <tag value="100">text</tag>, keeps original structure to save data.
-	3. Smart Empty Tag Handling:
-	   - If inside a list: checks siblings. If ANY sibling has text, forces text="" for consistency.
-	     If NO siblings have text, leaves them as pure objects.
-	   - If single node: checks attributes. If exactly 1 attribute (e.g. <item name="x"/>), forces text="".
-	"""
-	value_key = value_key or get_attr_text_value_key()
-
-	def _convert(current, is_list_item=False):
-		# Base case: primitive types (str, int, none, etc.) return as is
-		if not isinstance(current, (dict, list)):
-			return current
-
-		# --- CASE 1: Processing a LIST of items (Siblings) ---
-		if isinstance(current, list):
-			# Check Condition 1: Do any siblings have text?
-			siblings_have_text = False
-			for item in current:
-				if isinstance(item, dict) and '#text' in item:
-					siblings_have_text = True
-					break
-			
-			new_list = []
-			for item in current:
-				# Apply Condition 1 Logic:
-				# If we are in a mixed list (some have text), force empty strings on the others for consistency.
-				if isinstance(item, dict) and siblings_have_text:
-					attr_keys = [k for k in item.keys() if k.startswith('@')]
-					child_keys = [k for k in item.keys() if not k.startswith('@') and k != '#text']
-					has_text = '#text' in item
-					
-					# Only force if it's an "empty leaf" (has attrs, no children, no text)
-					if attr_keys and not child_keys and not has_text:
-						item = item.copy()
-						item['#text'] = ""
-				
-				# Recurse with flag indicating this came from a list
-				new_list.append(_convert(item, is_list_item=True))
-			return new_list
-
-		# --- CASE 2: Processing a DICT (Single Item) ---
-		if isinstance(current, dict):
-			new_dict = OrderedDict()
-			
-			# Analyze the node structure
-			attr_keys = [k for k in current.keys() if k.startswith('@')]
-			child_keys = [k for k in current.keys() if not k.startswith('@') and k != '#text']
-			has_text = '#text' in current
-
-			# --- Fix: Handle Consistency for Empty Tags ---
-			if attr_keys and not child_keys and not has_text:
-				should_force_text = False
-				
-				# Condition 2: Single Node Logic (No Siblings)
-				# If this is NOT a list item, we look for "Single Attribute" heuristic.
-				# e.g., <item key="val"/> -> likely a key-value pair.
-				# e.g., <item id="1" type="bool"/> -> likely just an object.
-				if not is_list_item:
-					if len(attr_keys) == 1:
-						should_force_text = True
-				
-				# Note: If is_list_item is True, we rely entirely on the LIST block above.
-				# If the LIST block didn't add #text, it means no siblings had text, so we don't add it here.
-
-				if should_force_text:
-					has_text = True
-					current = current.copy()
-					current['#text'] = ""
-
-			# --- Conflict Detection ---
-			conflict = False
-			if has_text:
-				for k in attr_keys:
-					if k[1:] == value_key:
-						conflict = True
-						break
-
-			for key, val in current.items():
-				if conflict:
-					# Keep structure on conflict
-					new_dict[key] = _convert(val) # Reset is_list_item for children
-				else:
-					# Flatten
-					if key == '#text':
-						new_dict[value_key] = val
-					elif key.startswith('@'):
-						new_dict[key[1:]] = val
-					else:
-						# Recurse (children are new contexts, not list items of THIS node)
-						new_dict[key] = _convert(val) 
-			
-			return new_dict
-
-		return current
-
-	return _convert(node)
-
-def json2xml(fulltext, pretty=None):
-	if pretty is None:
-		pretty = get_default_pretty()
+		run_conversion(self.view, 'xml2json', xml2json_normalized,
+			lambda jsonStr, fulltext, change_count, timings: newViewWithText(jsonStr, 'json', normalize=False, timings=timings))
+
+def xml2json_path(fulltext, path, progress=None, settings=None, timings=None):
+	settings = settings or get_conversion_settings()
 	try:
-		data = json.JSONDecoder(object_pairs_hook=OrderedDict).decode(fulltext)
-		root_name = get_default_root_name() or "root"
-		
-		# decide if we need to wrap the data
-		if isinstance(data, list):
-			# Case 1: List at root level (e.g. [{}, {}]) -> Wrap in item tags under root
-			wrapped = OrderedDict([(
-				root_name, 
-				OrderedDict([("item", data)])
-			)])
-		elif not isinstance(data, dict):
-			# Case 2: Primitive types (string, int, etc.) -> Wrap directly
-			wrapped = OrderedDict([(root_name, data)])
-		else:
-			# Case 3: Dictionary
-			# We must wrap if:
-			# A) There are multiple keys (e.g. {"a":1, "b":2})
-			# OR
-			# B) There is exactly 1 key, BUT its value is a LIST (e.g. {"string": [{}, {}]})
-			#    Because xmltodict expands lists into sibling nodes, creating multiple roots.
-			
-			need_wrap = False
-			if len(data) > 1:
-				need_wrap = True
-			elif len(data) == 1:
-				first_key = list(data.keys())[0]
-				first_value = list(data.values())[0]
-				
-				# 1. If value is a list, xmltodict creates multiple roots -> Must Wrap
-				if isinstance(first_value, list):
-					need_wrap = True
-				# 2. If key looks like an attribute (@...) or text (#text), 
-				#    it cannot be a root tag name -> Must Wrap
-				elif first_key.startswith('@') or first_key == '#text':
-					need_wrap = True
-
-			if need_wrap:
-				wrapped = OrderedDict([(root_name, data)])
-			else:
-				wrapped = data
+		jsonStr = xml2json_core.extract_path(
+			fulltext,
+			path,
+			pretty=settings.pretty,
+			indent=settings.json_indent,
+			ensure_ascii=settings.ensure_ascii,
+			sort_keys=settings.sort_keys,
+			normalize=settings.normalize,
+			value_key=settings.value_key,
+			progress=progress,
+			timings=timings)
+	except xml2json_core.ConversionCancelled:
+		raise
+	except Exception as e:
+		sublime.error_message('xml2json_path error: ' + str(e))
+		return None
+	return normalize_newlines(jsonStr, fulltext, settings, clean=True, timings=timings)
+
+# the path given to xml2json_path last, offered again the next time
+_last_path = ''
+
+class Xml2jsonPathCommand(sublime_plugin.TextCommand):
+	"""
+	Converts just the elements matching a path like /feed/entry[10:20] or
+	/feed/entry[@type="post"] (see xml2json_core.parse_path()) to JSON in a
+	new buffer, without building the rest of the document.
+	"""
+	def run(self, edit, path=None):
+		global _last_path
+		view = self.view
+		if path is None:
+			window = view.window() or sublime.active_window()
+			window.show_input_panel('Convert path to JSON:', _last_path or '/',
+				lambda path: view.run_command('xml2json_path', {'path': path}), None, None)
+			return
+		_last_path = path
+		run_conversion(view, 'xml2json ' + path,
+			lambda fulltext, progress, settings, timings: xml2json_path(fulltext, path, progress, settings, timings),
+			lambda jsonStr, fulltext, change_count, timings: newViewWithText(jsonStr, 'json', normalize=False, timings=timings),
+			selections=False)
 
-		xmlStr = xmltodict.unparse(
-			wrapped,
+class ViewAppender(object):
+	"""
+	Writer for a worker thread that appends what it is given to `view` on
+	the UI thread, in batches of about `batch` characters.
+	"""
+	def __init__(self, view, batch=1 << 18):
+		self.view = view
+		self.batch = batch
+		self.parts = []
+		self.size = 0
+
+	def write(self, text):
+		self.parts.append(text)
+		self.size += len(text)
+		if self.size >= self.batch:
+			self.flush()
+
+	def flush(self):
+		if self.parts:
+			text = ''.join(self.parts)
+			self.parts = []
+			self.size = 0
+			sublime.set_timeout(lambda: self.view.run_command('append', {'characters': text}), 0)
+
+class Xml2jsonLinesCommand(sublime_plugin.TextCommand):
+	"""
+	Converts each record of an XML feed to one line of compact JSON (JSON
+	Lines) in a new buffer, which fills up while the conversion runs. The
+	records are the elements the `records` path selects, by default the
+	json_lines_records setting.
+	"""
+	def run(self, edit, records=None):
+		view = self.view
+		if view.id() in _running_jobs:
+			sublime.status_message('xml2json_lines: a conversion is already running in this view')
+			return
+		settings = get_conversion_settings()
+		records = records or settings.json_lines_records
+		fulltext = view.substr(sublime.Region(0, view.size()))
+		target = sublime.active_window().new_file()
+		setSyntaxSafely(target, get_json_candidates())
+		writer = ViewAppender(target)
+
+		def work(progress):
+			xml2json_core.xml_to_ndjson(
+				fulltext,
+				writer,
+				records,
+				ensure_ascii=settings.ensure_ascii,
+				sort_keys=settings.sort_keys,
+				normalize=settings.normalize,
+				value_key=settings.value_key,
+				progress=progress)
+			writer.flush()
+			return True
+		start_job(view, 'xml2json_lines', work,
+			lambda result: sublime.status_message('xml2json_lines: done'))
+
+def json2xml(fulltext, pretty=None, progress=None, settings=None, timings=None):
+	settings = settings or get_conversion_settings()
+	if pretty is None:
+		pretty = settings.pretty
+	try:
+		xmlStr = xml2json_core.json_to_xml(
+			fulltext,
 			pretty=pretty,
-			full_document=get_include_xml_declaration(),
-			indent=get_xml_indent(),
-			empty_tag_style=get_empty_tag_style())
+			root_name=settings.root_name,
+			full_document=settings.xml_declaration,
+			indent=settings.xml_indent,
+			empty_tag_style=settings.empty_tag_style,
+			progress=progress,
+			timings=timings)
+	except xml2json_core.ConversionCancelled:
+		raise
 	except Exception as e:
 		sublime.error_message('json2xml error: ' + str(e))
 		return None
 	return xmlStr
 
+def json2xml_normalized(fulltext, progress=None, settings=None, timings=None):
+	settings = settings or get_conversion_settings()
+	xmlStr = json2xml(fulltext, progress=progress, settings=settings, timings=timings)
+	if xmlStr:
+		return normalize_newlines(xmlStr, fulltext, settings, timings=timings)
+	return None
+
 class Json2xmlCommand(sublime_plugin.TextCommand):
 	def run(self,edit):
-		fulltext = self.view.substr(sublime.Region(0, self.view.size()))
-		xmlStr = json2xml(fulltext)
-		if xmlStr:
-			newViewWithText(xmlStr, 'xml', fulltext)
+		run_conversion(self.view, 'json2xml', json2xml_normalized,
+			lambda xmlStr, fulltext, change_count, timings: newViewWithText(xmlStr, 'xml', normalize=False, timings=timings))
 
 class Xml2jsonSaveCommand(sublime_plugin.TextCommand):
 	def run(self, edit):
-		fulltext = self.view.substr(sublime.Region(0, self.view.size()))
-		jsonStr = xml2json(fulltext)
-		if jsonStr:
-			save_with_prompt(self.view, jsonStr, 'json', '.json', 'xml2json_save', fulltext)
+		view = self.view
+		run_conversion(view, 'xml2json_save', xml2json_normalized,
+			lambda jsonStr, fulltext, change_count, timings: save_with_prompt(view, jsonStr, 'json', '.json', 'xml2json_save', normalize=False, timings=timings),
+			selections=False)
 
 class Json2xmlSaveCommand(sublime_plugin.TextCommand):
 	def run(self, edit):
-		fulltext = self.view.substr(sublime.Region(0, self.view.size()))
-		xmlStr = json2xml(fulltext)
-		if xmlStr:
-			save_with_prompt(self.view, xmlStr, 'xml', '.xml', 'json2xml_save', fulltext)
+		view = self.view
+		run_conversion(view, 'json2xml_save', json2xml_normalized,
+			lambda xmlStr, fulltext, change_count, timings: save_with_prompt(view, xmlStr, 'xml', '.xml', 'json2xml_save', normalize=False, timings=timings),
+			selections=False)
+
+def format_json(fulltext, pretty, progress=None, settings=None, timings=None):
+	settings = settings or get_conversion_settings()
+	format = xml2json_core.format_json
+	if 0 < settings.parallel_conversion_min_size <= len(fulltext) and use_worker_processes():
+		format = lambda *args, **kwargs: xml2json_core.format_json_parallel(*args, min_size=0, **kwargs)
+	formatted = format(
+		fulltext,
+		pretty=pretty,
+		indent=settings.json_indent,
+		ensure_ascii=settings.ensure_ascii,
+		sort_keys=settings.sort_keys,
+		progress=progress,
+		timings=timings)
+	return normalize_newlines(formatted, fulltext, settings, clean=True, timings=timings)
+
+def format_xml(fulltext, pretty, progress=None, settings=None, timings=None):
+	settings = settings or get_conversion_settings()
+	formatted = xml2json_core.reformat_xml(
+		fulltext,
+		pretty=pretty,
+		indent=settings.xml_indent,
+		empty_tag_style=settings.empty_tag_style,
+		progress=progress,
+		timings=timings)
+	return normalize_newlines(formatted, fulltext, settings, timings=timings)
+
+def convert_file(source_path, target_path, progress=None, settings=None):
+	"""
+	Convert source_path to target_path on disk with the given settings.
+	"""
+	to = xml2json_core.guess_direction(source_path)
+	extension = os.path.splitext(target_path)[1].lower()
+	if extension == '.json':
+		to = 'json'
+	elif extension in ('.jsonl', '.ndjson'):
+		to = 'ndjson'
+	elif extension == '.xml':
+		to = 'xml'
+	return xml2json_core.convert_file_with_settings(source_path, target_path,
+		settings or get_conversion_settings(), to, progress)
+
+class ConvertFileToFileCommand(sublime_plugin.WindowCommand):
+	"""
+	Converts a file on disk to another file without opening either in a
+	view. The source is read in chunks and the result written as it is
+	produced, so files far larger than a comfortable buffer work too.
+	"""
+	def run(self, source=None, target=None):
+		if source is None:
+			view = self.window.active_view()
+			initial = (view and view.file_name()) or ''
+			self.window.show_input_panel('Convert file:', initial,
+				lambda path: self.run(path, target), None, None)
+			return
+		source = os.path.expanduser(source.strip())
+		if not os.path.isfile(source):
+			sublime.error_message('convert_file_to_file: no such file:\n' + source)
+			return
+		if target is None:
+			to = xml2json_core.guess_direction(source)
+			initial = os.path.splitext(source)[0] + ('.json' if to == 'json' else '.xml')
+			self.window.show_input_panel('Save converted file to:', initial,
+				lambda path: self.run(source, path), None, None)
+			return
+		target = os.path.expanduser(target.strip())
+		if os.path.abspath(target) == os.path.abspath(source):
+			sublime.error_message('convert_file_to_file: target is the source file')
+			return
+		if os.path.exists(target):
+			choice = sublime.yes_no_cancel_dialog('File exists:\n{}\nOverwrite?'.format(target), 'Overwrite', 'Don\'t Overwrite')
+			if choice != sublime.DIALOG_YES:
+				sublime.status_message('convert_file_to_file: did not overwrite existing file')
+				return
+
+		view = self.window.active_view() or self.window.new_file()
+		if view.id() in _running_jobs:
+			sublime.status_message('convert_file_to_file: a conversion is already running in this view')
+			return
+		label = 'convert ' + os.path.basename(source)
+		settings = get_conversion_settings()
+		start_job(view, label,
+			lambda progress: convert_file(source, target, progress, settings),
+			lambda path: sublime.status_message(label + ': saved to ' + path))
 
-class PrettyJsonCommand(sublime_plugin.TextCommand):
-	def run(self, edit):
-		region = sublime.Region(0, self.view.size())
-		fulltext = self.view.substr(region)
-		try:
-			jsonObj = json.JSONDecoder(object_pairs_hook=OrderedDict).decode(fulltext)
-		except Exception as e:
-			sublime.error_message('pretty json error: ' + str(e))
+def use_worker_processes():
+	"""
+	Whether folder conversions, and xml2json or Pretty/Compact JSON on
+	buffers past parallel_conversion_min_size, may use a process pool.
+	Workers have to be forked: started any other way they would launch
+	another plugin host. Forking the multithreaded host is safe here
+	because a worker only runs the pure-Python conversion core on the
+	data it is handed: it never calls the sublime API, and the worker
+	functions take no lock, so a lock another host thread held at the
+	fork (and that stays held in the child) is never waited on. The
+	workers exit when the pool shuts down.
+	"""
+	try:
+		import multiprocessing
+		return multiprocessing.get_start_method() == 'fork'
+	except Exception:
+		return False
+
+def split_globs(text):
+	"""
+	'*.xml, !old/*' -> (['*.xml'], ['old/*'])
+	"""
+	include, exclude = [], []
+	for glob in text.replace(',', ' ').split():
+		if glob.startswith('!'):
+			if glob[1:]:
+				exclude.append(glob[1:])
+		else:
+			include.append(glob)
+	return include, exclude
+
+def show_output_panel(window, text):
+	if st_ver >= 3000:
+		panel = window.create_output_panel('xml2json')
+	else:
+		panel = window.get_output_panel('xml2json')
+	panel.run_command('append', {'characters': text})
+	window.run_command('show_panel', {'panel': 'output.xml2json'})
+
+def show_batch_summary(window, summary, label):
+	lines = []
+	for result in summary.results:
+		if result.status == 'failed':
+			lines.append('failed     {}: {}'.format(result.source, result.error))
+		elif result.status == 'skipped':
+			lines.append('up to date {}'.format(result.target))
+		else:
+			lines.append('converted  {} -> {} ({:.2f}s)'.format(result.source, result.target, result.seconds))
+	lines.append('')
+	lines.append(label + ': ' + str(summary))
+	show_output_panel(window, '\n'.join(lines) + '\n')
+	sublime.status_message(label + ': ' + str(summary))
+
+class ConvertFolderCommand(sublime_plugin.WindowCommand):
+	"""
+	Converts every matching file below a folder, next to the source file.
+	`to` is 'json' or 'xml'; with skip_newer, files whose target is at
+	least as new as the source are skipped.
+	"""
+	def run(self, folder=None, include=None, to='json', skip_newer=False):
+		if folder is None:
+			view = self.window.active_view()
+			folders = self.window.folders()
+			if folders:
+				initial = folders[0]
+			elif view and view.file_name():
+				initial = os.path.dirname(view.file_name())
+			else:
+				initial = ''
+			self.window.show_input_panel('Convert folder:', initial,
+				lambda path: self.run(path, include, to, skip_newer), None, None)
 			return
+		folder = os.path.expanduser(folder.strip())
+		if not os.path.isdir(folder):
+			sublime.error_message('convert_folder: no such folder:\n' + folder)
+			return
+		if include is None:
+			initial = '*.xml' if to == 'json' else '*.json'
+			self.window.show_input_panel('Files to convert (globs, ! to exclude):', initial,
+				lambda globs: self.run(folder, globs, to, skip_newer), None, None)
+			return
+		includes, excludes = split_globs(include)
+		if not includes:
+			includes = None
 
-		formatted = json.dumps(
-			jsonObj,
-			indent=get_json_indent(),
-			ensure_ascii=get_json_ensure_ascii(),
-			sort_keys=get_json_sort_keys())
-		formatted = normalize_newlines(formatted, fulltext)
-		self.view.replace(edit, region, formatted)
-		setSyntaxSafely(self.view, get_json_candidates())
+		view = self.window.active_view() or self.window.new_file()
+		if view.id() in _running_jobs:
+			sublime.status_message('convert_folder: a conversion is already running in this view')
+			return
+		label = 'convert ' + os.path.basename(os.path.normpath(folder))
+		settings = get_conversion_settings()
+		processes = use_worker_processes()
+		window = self.window
+		start_job(view, label,
+			lambda progress: xml2json_core.convert_folder(folder, to, includes, excludes,
+				skip_newer=skip_newer, settings=settings, processes=processes, progress=progress),
+			lambda summary: show_batch_summary(window, summary, label))
 
-class CompactJsonCommand(sublime_plugin.TextCommand):
+class PrettyJsonCommand(sublime_plugin.TextCommand):
 	def run(self, edit):
-		region = sublime.Region(0, self.view.size())
-		fulltext = self.view.substr(region)
-		try:
-			jsonObj = json.JSONDecoder(object_pairs_hook=OrderedDict).decode(fulltext)
-		except Exception as e:
-			sublime.error_message('compact json error: ' + str(e))
-			return
+		run_conversion(self.view, 'pretty json',
+			lambda fulltext, progress, settings, timings: format_json(fulltext, True, progress, settings, timings),
+			replace_when_done(self.view, 'json', 'pretty json'))
 
-		compact = json.dumps(
-			jsonObj,
-			ensure_ascii=get_json_ensure_ascii(),
-			sort_keys=get_json_sort_keys(),
-			separators=(',', ':'))
-		compact = normalize_newlines(compact, fulltext)
-		self.view.replace(edit, region, compact)
-		setSyntaxSafely(self.view, get_json_candidates())
+class CompactJsonCommand(sublime_plugin.TextCommand):
+	def run(self, edit):
+		run_conversion(self.view, 'compact json',
+			lambda fulltext, progress, settings, timings: format_json(fulltext, False, progress, settings, timings),
+			replace_when_done(self.view, 'json', 'compact json'))
 
 class PrettyXmlCommand(sublime_plugin.TextCommand):
 	def run(self, edit):
-		region = sublime.Region(0, self.view.size())
-		fulltext = self.view.substr(region)
-		try:
-			xmlObj = xmltodict.parse(fulltext)
-			pretty_xml = xmltodict.unparse(
-				xmlObj,
-				pretty=True,
-				indent=get_xml_indent(),
-				empty_tag_style=get_empty_tag_style())
-		except Exception as e:
-			sublime.error_message('pretty xml error: ' + str(e))
-			return
-
-		pretty_xml = normalize_newlines(pretty_xml, fulltext)
-		self.view.replace(edit, region, pretty_xml)
-		setSyntaxSafely(self.view, get_xml_candidates())
+		run_conversion(self.view, 'pretty xml',
+			lambda fulltext, progress, settings, timings: format_xml(fulltext, True, progress, settings, timings),
+			replace_when_done(self.view, 'xml', 'pretty xml'))
 
 class CompactXmlCommand(sublime_plugin.TextCommand):
 	def run(self, edit):
-		region = sublime.Region(0, self.view.size())
-		fulltext = self.view.substr(region)
-		try:
-			xmlObj = xmltodict.parse(fulltext)
-			compact_xml = xmltodict.unparse(
-				xmlObj,
-				pretty=False,
-				indent=get_xml_indent(),
-				empty_tag_style=get_empty_tag_style())
-		except Exception as e:
-			sublime.error_message('compact xml error: ' + str(e))
-			return
-
-		compact_xml = normalize_newlines(compact_xml, fulltext)
-		self.view.replace(edit, region, compact_xml)
-		setSyntaxSafely(self.view, get_xml_candidates())
+		run_conversion(self.view, 'compact xml',
+			lambda fulltext, progress, settings, timings: format_xml(fulltext, False, progress, settings, timings),
+			replace_when_done(self.view, 'xml', 'compact xml'))
@@ -0,0 +1,401 @@
+"""
+Benchmarks for the xml2json conversion stages.
+
+Generates synthetic corpora and times every stage of the conversions on
+its own, reporting throughput and (with --memory) the tracemalloc peak:
+
+	python bench/benchmark.py                         # run, print a table
+	python bench/benchmark.py --save bench/baseline.json
+	python bench/benchmark.py --baseline bench/baseline.json
+	python bench/benchmark.py --depths 10,100,1000,5000
+	python bench/benchmark.py --interning
+
+With --baseline the run fails (exit status 1) when a stage got slower or
+needs more memory than the stored numbers allow for (--tolerance).
+--depths times the tree walkers per element on documents of a fixed size
+nested ever deeper instead. --interning reports how much memory the parsed
+trees of the corpora keep with and without interning names and short values.
+Corpora are generated from a fixed seed, so runs are comparable as long
+as --size stays the same.
+
+This folder is not loaded by Sublime Text; run it with any Python 3.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xmltodict
+import xml2json_core
+
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+try:
+	_clock = time.perf_counter
+except AttributeError:
+	_clock = time.time
+
+WORDS = ('alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'theta', 'kappa',
+	'lambda', 'sigma', 'omega', 'north', 'south', 'value', 'record', 'item')
+UNICODE_WORDS = (u'café', u'naïve', u'über', u'日本語',
+	u'данные', u'αβγ', u'☃', u'\U0001f600')
+
+
+def _escape(text):
+	return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+def _words(rnd, count, words=WORDS):
+	return ' '.join(rnd.choice(words) for _ in range(count))
+
+def _wide(rnd):
+	# one record with many differently named children
+	parts = ['<record id="{}">'.format(rnd.randint(1, 10 ** 6))]
+	for index in range(40):
+		parts.append('<field{0}>{1}</field{0}>'.format(index, _words(rnd, 2)))
+	parts.append('</record>')
+	return ''.join(parts)
+
+def _deep(rnd):
+	depth = 40
+	opening = ''.join('<level{} n="{}">'.format(index, index) for index in range(depth))
+	closing = ''.join('</level{}>'.format(index) for index in reversed(range(depth)))
+	return '<chain>' + opening + _words(rnd, 3) + closing + '</chain>'
+
+def _attributes(rnd):
+	attrs = ' '.join('{}="{}"'.format(name, rnd.randint(0, 99999))
+		for name in rnd.sample(WORDS, 8))
+	return '<entry {}/><entry key="{}"/>'.format(attrs, rnd.choice(WORDS))
+
+def _text(rnd):
+	return '<para lang="en">{}</para>'.format(_escape(_words(rnd, 120) + ' & more <text>'))
+
+def _list(rnd):
+	return '<row id="{}" kind="{}">{}</row>'.format(
+		rnd.randint(1, 10 ** 6), rnd.choice(('a', 'b')), rnd.choice(WORDS))
+
+def _unicode(rnd):
+	return u'<note who="{}">{}</note>'.format(rnd.choice(UNICODE_WORDS), _words(rnd, 12, UNICODE_WORDS))
+
+CORPORA = OrderedDict([
+	('wide', _wide),
+	('deep', _deep),
+	('attributes', _attributes),
+	('text', _text),
+	('list', _list),
+	('unicode', _unicode),
+])
+
+def make_corpus(name, size, seed=0):
+	"""
+	XML document of about `size` characters built from `name` records.
+	"""
+	rnd = random.Random(seed)
+	record = CORPORA[name]
+	parts = []
+	length = 0
+	while length < size:
+		part = record(rnd)
+		parts.append(part)
+		length += len(part)
+	return u'<?xml version="1.0" encoding="utf-8"?>\n<corpus>\n' + u'\n'.join(parts) + u'\n</corpus>\n'
+
+
+def make_chains(depth, nodes):
+	"""
+	XML document of about `nodes` elements, nested `depth` levels deep.
+	"""
+	opening = ''.join('<level{} n="{}">'.format(index, index) for index in range(depth))
+	closing = ''.join('</level{}>'.format(index) for index in reversed(range(depth)))
+	chain = opening + 'leaf' + closing
+	return u'<corpus>' + chain * max(1, nodes // depth) + u'</corpus>'
+
+
+# parse options that intern names and short values, as the live preview does
+INTERNING = dict(intern_limit=xml2json_core.INTERN_LIMIT,
+	intern_value_length=xml2json_core.INTERN_VALUE_LENGTH)
+
+def _stages(xml_text):
+	"""
+	(name, function) pairs for every stage, each set up with the output of
+	the stage before it so the timed call does nothing else.
+	"""
+	xml_bytes = xml_text.encode('utf-8')
+	tree = xmltodict.parse(xml_bytes)
+	normalized = xml2json_core.apply_attr_text_normalization(tree)
+	pretty = json.dumps(normalized, indent=2, ensure_ascii=False, separators=xml2json_core.PRETTY_SEPARATORS)
+	compact = json.dumps(normalized, ensure_ascii=False)
+	decoded = json.JSONDecoder(object_pairs_hook=xml2json_core._object_pairs_hook).decode(pretty)
+	dirty = json.dumps(normalized, indent=2, ensure_ascii=False, separators=(', ', ': ')).replace('\n', '\r\n')
+	return [
+		('parse', lambda: xmltodict.parse(xml_bytes)),
+		('parse_interned', lambda: xmltodict.parse(xml_bytes, **INTERNING)),
+		('normalize', lambda: xml2json_core.apply_attr_text_normalization(tree)),
+		('parse_normalized', lambda: xml2json_core.parse_xml_normalized(xml_bytes)),
+		('dumps_pretty', lambda: json.dumps(normalized, indent=2, ensure_ascii=False,
+			separators=xml2json_core.PRETTY_SEPARATORS)),
+		('dumps_compact', lambda: json.dumps(normalized, ensure_ascii=False)),
+		('xml_to_json', lambda: xml2json_core.xml_to_json(xml_bytes)),
+		('reformat_xml', lambda: xml2json_core.reformat_xml(xml_bytes)),
+		('decode', lambda: json.JSONDecoder(
+			object_pairs_hook=xml2json_core._object_pairs_hook).decode(pretty)),
+		('format_json', lambda: xml2json_core.format_json(pretty)),
+		('unparse', lambda: xmltodict.unparse(xml2json_core.wrap_for_xml(decoded), pretty=True,
+			emitter='direct')),
+		('unparse_sax', lambda: xmltodict.unparse(xml2json_core.wrap_for_xml(decoded), pretty=True)),
+		('newlines_clean', lambda: xml2json_core.normalize_newlines(pretty)),
+		('newlines_dirty', lambda: xml2json_core.normalize_newlines(dirty, '\r\n')),
+	], len(compact)
+
+def _depth_stages(xml_text):
+	"""
+	(name, function) pairs for the stages that walk the whole tree.
+	"""
+	xml_bytes = xml_text.encode('utf-8')
+	tree = xmltodict.parse(xml_bytes)
+	normalized = xml2json_core.apply_attr_text_normalization(tree)
+	return [
+		('normalize', lambda: xml2json_core.apply_attr_text_normalization(tree)),
+		('dumps_pretty', lambda: xml2json_core.dumps_json(normalized, indent=2,
+			separators=xml2json_core.PRETTY_SEPARATORS)),
+		('dumps_compact', lambda: xml2json_core.dumps_json(normalized)),
+		('xml_to_json', lambda: xml2json_core.xml_to_json(xml_bytes, pretty=False)),
+		('reformat_xml', lambda: xml2json_core.reformat_xml(xml_bytes)),
+		('unparse', lambda: xmltodict.unparse(tree, emitter='direct')),
+		('unparse_sax', lambda: xmltodict.unparse(tree)),
+	]
+
+def _time(func, repeat):
+	best = None
+	for _ in range(repeat):
+		gc.collect()
+		started = _clock()
+		func()
+		elapsed = _clock() - started
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+def _peak(func):
+	gc.collect()
+	tracemalloc.start()
+	try:
+		func()
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+def _kept(func):
+	# bytes still allocated by the result of func()
+	gc.collect()
+	tracemalloc.start()
+	try:
+		result = func()
+		return tracemalloc.get_traced_memory()[0]
+	finally:
+		del result
+		tracemalloc.stop()
+
+def run(corpora, size, repeat=3, memory=False, stages=None, report=None):
+	"""
+	Benchmark results as {corpus: {stage: {"seconds", "mb_per_s"[, "peak_mb"]}}}.
+	Throughput is measured against the size of the XML input.
+	"""
+	results = OrderedDict()
+	for name in corpora:
+		xml_text = make_corpus(name, size)
+		megabytes = len(xml_text.encode('utf-8')) / 1e6
+		stage_funcs, _ = _stages(xml_text)
+		results[name] = OrderedDict()
+		for stage, func in stage_funcs:
+			if stages and stage not in stages:
+				continue
+			seconds = _time(func, repeat)
+			result = OrderedDict([
+				('seconds', round(seconds, 5)),
+				('mb_per_s', round(megabytes / seconds, 3) if seconds else None),
+			])
+			if memory:
+				result['peak_mb'] = round(_peak(func) / 1e6, 3)
+			results[name][stage] = result
+			if report is not None:
+				report(name, stage, result)
+	return results
+
+def run_depths(depths, nodes, repeat=3, stages=None, report=None):
+	"""
+	Cost per element as {depth: {stage: {"seconds", "us_per_node"}}} for
+	documents of the same size nested `depth` levels deep; the tree walkers
+	do not recurse, so it should stay flat as the depth grows.
+	"""
+	results = OrderedDict()
+	for depth in depths:
+		count = max(1, nodes // depth) * depth
+		results[depth] = OrderedDict()
+		for stage, func in _depth_stages(make_chains(depth, nodes)):
+			if stages and stage not in stages:
+				continue
+			seconds = _time(func, repeat)
+			result = OrderedDict([
+				('seconds', round(seconds, 5)),
+				('us_per_node', round(seconds * 1e6 / count, 3)),
+			])
+			results[depth][stage] = result
+			if report is not None:
+				report(depth, stage, result)
+	return results
+
+def run_interning(corpora, size, repeat=3, report=None):
+	"""
+	Memory kept by the parsed tree of every corpus, without and with
+	INTERNING, as {corpus: {parser: {"kept_mb", "interned_mb", "saved",
+	"seconds", "interned_seconds"}}}.
+	"""
+	results = OrderedDict()
+	for name in corpora:
+		xml_bytes = make_corpus(name, size).encode('utf-8')
+		results[name] = OrderedDict()
+		for parser, parse in (('parse', xmltodict.parse),
+				('parse_normalized', xml2json_core.parse_xml_normalized)):
+			plain = lambda: parse(xml_bytes)
+			interned = lambda: parse(xml_bytes, **INTERNING)
+			kept, kept_interned = _kept(plain), _kept(interned)
+			result = OrderedDict([
+				('kept_mb', round(kept / 1e6, 3)),
+				('interned_mb', round(kept_interned / 1e6, 3)),
+				('saved', round(1 - float(kept_interned) / kept, 3)),
+				('seconds', round(_time(plain, repeat), 5)),
+				('interned_seconds', round(_time(interned, repeat), 5)),
+			])
+			results[name][parser] = result
+			if report is not None:
+				report(name, parser, result)
+	return results
+
+def compare(results, baseline, tolerance):
+	"""
+	Regression messages for stages more than `tolerance` (a fraction)
+	slower or bigger than in `baseline`.
+	"""
+	regressions = []
+	for name, stages in results.items():
+		for stage, result in stages.items():
+			old = baseline.get(name, {}).get(stage)
+			if not old:
+				continue
+			for key, unit in (('seconds', 's'), ('peak_mb', 'MB')):
+				if key in result and old.get(key):
+					if result[key] > old[key] * (1 + tolerance):
+						regressions.append('{}/{}: {} {:.3f}{} -> {:.3f}{} (+{:.0f}%)'.format(
+							name, stage, key, old[key], unit, result[key], unit,
+							(result[key] / old[key] - 1) * 100))
+	return regressions
+
+def _print_row(name, stage, result):
+	line = '{:<11} {:<17} {:>9.4f}s {:>9.2f} MB/s'.format(
+		name, stage, result['seconds'], result['mb_per_s'] or 0)
+	if 'peak_mb' in result:
+		line += ' {:>10.2f} MB peak'.format(result['peak_mb'])
+	print(line)
+	sys.stdout.flush()
+
+def _print_interning_row(name, parser, result):
+	print('{:<11} {:<17} {:>8.2f} MB -> {:>8.2f} MB ({:>4.0%} saved) {:>8.4f}s -> {:.4f}s'.format(
+		name, parser, result['kept_mb'], result['interned_mb'], result['saved'],
+		result['seconds'], result['interned_seconds']))
+	sys.stdout.flush()
+
+def _print_depth_row(depth, stage, result):
+	print('depth {:<6} {:<17} {:>9.4f}s {:>9.3f} us/node'.format(
+		depth, stage, result['seconds'], result['us_per_node']))
+	sys.stdout.flush()
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Benchmark the xml2json conversion stages.')
+	parser.add_argument('--size', type=float, default=2.0,
+		help='approximate corpus size in MB (default: 2)')
+	parser.add_argument('--corpus', action='append', choices=list(CORPORA),
+		help='corpus to run, may be repeated (default: all)')
+	parser.add_argument('--stage', action='append',
+		help='stage to run, may be repeated (default: all)')
+	parser.add_argument('--repeat', type=int, default=3,
+		help='runs per stage; the fastest counts (default: 3)')
+	parser.add_argument('--memory', action='store_true',
+		help='also measure the tracemalloc peak of every stage (slow)')
+	parser.add_argument('--baseline', help='JSON file from --save to compare against')
+	parser.add_argument('--tolerance', type=float, default=0.15,
+		help='allowed slowdown/growth against the baseline (default: 0.15)')
+	parser.add_argument('--save', help='write the results to this JSON file')
+	parser.add_argument('--depths',
+		help='instead, time the tree walkers per element on documents nested '
+		'this deep, e.g. 10,100,1000,5000')
+	parser.add_argument('--nodes', type=int, default=200000,
+		help='elements per document with --depths (default: 200000)')
+	parser.add_argument('--interning', action='store_true',
+		help='instead, report the memory kept by the parsed trees without '
+		'and with interning names and short values')
+	args = parser.parse_args(argv)
+
+	if args.depths:
+		depths = [int(depth) for depth in args.depths.split(',')]
+		print('python {}, {} elements per document, best of {}'.format(
+			platform.python_version(), args.nodes, args.repeat))
+		run_depths(depths, args.nodes, args.repeat, args.stage, _print_depth_row)
+		return 0
+
+	if (args.memory or args.interning) and tracemalloc is None:
+		parser.error('--memory and --interning need tracemalloc (Python 3.4+)')
+	if args.interning:
+		print('python {}, corpora of ~{} MB, intern_limit={}, intern_value_length={}'.format(
+			platform.python_version(), args.size, INTERNING['intern_limit'],
+			INTERNING['intern_value_length']))
+		run_interning(args.corpus or list(CORPORA), int(args.size * 1e6), args.repeat,
+			_print_interning_row)
+		return 0
+	baseline = None
+	if args.baseline:
+		with open(args.baseline) as handle:
+			baseline = json.load(handle)
+		if baseline.get('meta', {}).get('size') != args.size:
+			sys.stderr.write('warning: baseline was made with --size {}\n'.format(
+				baseline.get('meta', {}).get('size')))
+
+	print('python {} on {}, corpora of ~{} MB, best of {}'.format(
+		platform.python_version(), platform.platform(), args.size, args.repeat))
+	results = run(args.corpus or list(CORPORA), int(args.size * 1e6), args.repeat,
+		args.memory, args.stage, _print_row)
+
+	if args.save:
+		data = OrderedDict([
+			('meta', OrderedDict([
+				('size', args.size),
+				('repeat', args.repeat),
+				('python', platform.python_version()),
+			])),
+			('results', results),
+		])
+		with open(args.save, 'w') as handle:
+			json.dump(data, handle, indent=2, separators=(',', ': '))
+			handle.write('\n')
+
+	if baseline is not None:
+		regressions = compare(results, baseline.get('results', {}), args.tolerance)
+		if regressions:
+			print('\nregressions against {}:'.format(args.baseline))
+			for message in regressions:
+				print('  ' + message)
+			return 1
+		print('\nno regressions against {}'.format(args.baseline))
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
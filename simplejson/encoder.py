@@ -421,72 +421,6 @@ def _make_iterencode(markers, _default, _encoder, _indent, _floatstr,
             return str(value)
         return '"' + str(value) + '"'
 
-    def _iterencode_list(lst, _current_indent_level):
-        if not lst:
-            yield '[]'
-            return
-        if markers is not None:
-            markerid = id(lst)
-            if markerid in markers:
-                raise ValueError("Circular reference detected")
-            markers[markerid] = lst
-        buf = '['
-        if _indent is not None:
-            _current_indent_level += 1
-            newline_indent = '\n' + (_indent * _current_indent_level)
-            separator = _item_separator + newline_indent
-            buf += newline_indent
-        else:
-            newline_indent = None
-            separator = _item_separator
-        first = True
-        for value in lst:
-            if first:
-                first = False
-            else:
-                buf = separator
-            if (isinstance(value, string_types) or
-                (_PY3 and isinstance(value, binary_type))):
-                yield buf + _encoder(value)
-            elif value is None:
-                yield buf + 'null'
-            elif value is True:
-                yield buf + 'true'
-            elif value is False:
-                yield buf + 'false'
-            elif isinstance(value, integer_types):
-                yield buf + _encode_int(value)
-            elif isinstance(value, float):
-                yield buf + _floatstr(value)
-            elif _use_decimal and isinstance(value, Decimal):
-                yield buf + str(value)
-            else:
-                yield buf
-                for_json = _for_json and getattr(value, 'for_json', None)
-                if for_json and callable(for_json):
-                    chunks = _iterencode(for_json(), _current_indent_level)
-                elif isinstance(value, list):
-                    chunks = _iterencode_list(value, _current_indent_level)
-                else:
-                    _asdict = _namedtuple_as_object and getattr(value, '_asdict', None)
-                    if _asdict and callable(_asdict):
-                        chunks = _iterencode_dict(_asdict(),
-                                                  _current_indent_level)
-                    elif _tuple_as_array and isinstance(value, tuple):
-                        chunks = _iterencode_list(value, _current_indent_level)
-                    elif isinstance(value, dict):
-                        chunks = _iterencode_dict(value, _current_indent_level)
-                    else:
-                        chunks = _iterencode(value, _current_indent_level)
-                for chunk in chunks:
-                    yield chunk
-        if newline_indent is not None:
-            _current_indent_level -= 1
-            yield '\n' + (_indent * _current_indent_level)
-        yield ']'
-        if markers is not None:
-            del markers[markerid]
-
     def _stringify_key(key):
         if isinstance(key, string_types): # pragma: no cover
             pass
@@ -510,139 +444,138 @@ def _make_iterencode(markers, _default, _encoder, _indent, _floatstr,
             raise TypeError("key " + repr(key) + " is not a string")
         return key
 
-    def _iterencode_dict(dct, _current_indent_level):
-        if not dct:
-            yield '{}'
-            return
-        if markers is not None:
-            markerid = id(dct)
-            if markerid in markers:
-                raise ValueError("Circular reference detected")
-            markers[markerid] = dct
-        yield '{'
-        if _indent is not None:
-            _current_indent_level += 1
-            newline_indent = '\n' + (_indent * _current_indent_level)
-            item_separator = _item_separator + newline_indent
-            yield newline_indent
-        else:
-            newline_indent = None
-            item_separator = _item_separator
-        first = True
-        if _PY3:
-            iteritems = dct.items()
-        else:
-            iteritems = dct.iteritems()
-        if _item_sort_key:
-            items = []
-            for k, v in dct.items():
-                if not isinstance(k, string_types):
-                    k = _stringify_key(k)
-                    if k is None:
-                        continue
-                items.append((k, v))
-            items.sort(key=_item_sort_key)
-        else:
-            items = iteritems
-        for key, value in items:
-            if not (_item_sort_key or isinstance(key, string_types)):
-                key = _stringify_key(key)
-                if key is None:
-                    # _skipkeys must be True
-                    continue
-            if first:
-                first = False
-            else:
-                yield item_separator
-            yield _encoder(key)
-            yield _key_separator
+    def _iterencode(o, _current_indent_level):
+        # Nested containers are walked with a stack instead of recursing,
+        # so any nesting depth can be encoded and every chunk is yielded
+        # from here rather than through one generator per level.
+        # Frames are [items, is_dict, markerid, separator, closing, first];
+        # a frame without items only drops the marker of a _default() object.
+        stack = []
+        value = o
+        buf = ''
+        while True:
             if (isinstance(value, string_types) or
                 (_PY3 and isinstance(value, binary_type))):
-                yield _encoder(value)
+                yield buf + _encoder(value)
             elif value is None:
-                yield 'null'
+                yield buf + 'null'
             elif value is True:
-                yield 'true'
+                yield buf + 'true'
             elif value is False:
-                yield 'false'
+                yield buf + 'false'
             elif isinstance(value, integer_types):
-                yield _encode_int(value)
+                yield buf + _encode_int(value)
             elif isinstance(value, float):
-                yield _floatstr(value)
+                yield buf + _floatstr(value)
             elif _use_decimal and isinstance(value, Decimal):
-                yield str(value)
+                yield buf + str(value)
             else:
                 for_json = _for_json and getattr(value, 'for_json', None)
                 if for_json and callable(for_json):
-                    chunks = _iterencode(for_json(), _current_indent_level)
+                    value = for_json()
+                    continue
                 elif isinstance(value, list):
-                    chunks = _iterencode_list(value, _current_indent_level)
+                    container, is_dict = value, False
                 else:
                     _asdict = _namedtuple_as_object and getattr(value, '_asdict', None)
                     if _asdict and callable(_asdict):
-                        chunks = _iterencode_dict(_asdict(),
-                                                  _current_indent_level)
+                        container, is_dict = _asdict(), True
                     elif _tuple_as_array and isinstance(value, tuple):
-                        chunks = _iterencode_list(value, _current_indent_level)
+                        container, is_dict = value, False
                     elif isinstance(value, dict):
-                        chunks = _iterencode_dict(value, _current_indent_level)
+                        container, is_dict = value, True
                     else:
-                        chunks = _iterencode(value, _current_indent_level)
-                for chunk in chunks:
-                    yield chunk
-        if newline_indent is not None:
-            _current_indent_level -= 1
-            yield '\n' + (_indent * _current_indent_level)
-        yield '}'
-        if markers is not None:
-            del markers[markerid]
+                        if markers is not None:
+                            markerid = id(value)
+                            if markerid in markers:
+                                raise ValueError("Circular reference detected")
+                            markers[markerid] = value
+                            stack.append([None, False, markerid, None, None, False])
+                        value = _default(value)
+                        continue
 
-    def _iterencode(o, _current_indent_level):
-        if (isinstance(o, string_types) or
-            (_PY3 and isinstance(o, binary_type))):
-            yield _encoder(o)
-        elif o is None:
-            yield 'null'
-        elif o is True:
-            yield 'true'
-        elif o is False:
-            yield 'false'
-        elif isinstance(o, integer_types):
-            yield _encode_int(o)
-        elif isinstance(o, float):
-            yield _floatstr(o)
-        else:
-            for_json = _for_json and getattr(o, 'for_json', None)
-            if for_json and callable(for_json):
-                for chunk in _iterencode(for_json(), _current_indent_level):
-                    yield chunk
-            elif isinstance(o, list):
-                for chunk in _iterencode_list(o, _current_indent_level):
-                    yield chunk
-            else:
-                _asdict = _namedtuple_as_object and getattr(o, '_asdict', None)
-                if _asdict and callable(_asdict):
-                    for chunk in _iterencode_dict(_asdict(),
-                            _current_indent_level):
-                        yield chunk
-                elif (_tuple_as_array and isinstance(o, tuple)):
-                    for chunk in _iterencode_list(o, _current_indent_level):
-                        yield chunk
-                elif isinstance(o, dict):
-                    for chunk in _iterencode_dict(o, _current_indent_level):
-                        yield chunk
-                elif _use_decimal and isinstance(o, Decimal):
-                    yield str(o)
+                if not container:
+                    yield buf + ('{}' if is_dict else '[]')
                 else:
                     if markers is not None:
-                        markerid = id(o)
+                        markerid = id(container)
                         if markerid in markers:
                             raise ValueError("Circular reference detected")
-                        markers[markerid] = o
-                    o = _default(o)
-                    for chunk in _iterencode(o, _current_indent_level):
-                        yield chunk
+                        markers[markerid] = container
+                    else:
+                        markerid = None
+                    closing = '}' if is_dict else ']'
+                    if _indent is not None:
+                        _current_indent_level += 1
+                        newline_indent = '\n' + (_indent * _current_indent_level)
+                        separator = _item_separator + newline_indent
+                        closing = ('\n' + (_indent * (_current_indent_level - 1)) +
+                                   closing)
+                    else:
+                        newline_indent = ''
+                        separator = _item_separator
+                    if is_dict:
+                        yield buf + '{' + newline_indent
+                        if _item_sort_key:
+                            items = []
+                            for k, v in container.items():
+                                if not isinstance(k, string_types):
+                                    k = _stringify_key(k)
+                                    if k is None:
+                                        continue
+                                items.append((k, v))
+                            items.sort(key=_item_sort_key)
+                            items = iter(items)
+                        elif _PY3:
+                            items = iter(container.items())
+                        else:
+                            items = container.iteritems()
+                    else:
+                        yield buf + '[' + newline_indent
+                        items = iter(container)
+                    stack.append([items, is_dict, markerid, separator, closing, True])
+
+            # the value is done: find the next one in the innermost
+            # container that has any left, closing the finished ones
+            buf = ''
+            while stack:
+                frame = stack[-1]
+                items = frame[0]
+                if items is None:
+                    stack.pop()
+                    del markers[frame[2]]
+                    continue
+                if frame[1]:
+                    for key, value in items:
+                        if not (_item_sort_key or isinstance(key, string_types)):
+                            key = _stringify_key(key)
+                            if key is None:
+                                # _skipkeys must be True
+                                continue
+                        break
+                    else:
+                        key = items = None
+                else:
+                    for value in items:
+                        break
+                    else:
+                        items = None
+                if items is None:
+                    stack.pop()
+                    if _indent is not None:
+                        _current_indent_level -= 1
+                    yield frame[4]
                     if markers is not None:
-                        del markers[markerid]
+                        del markers[frame[2]]
+                    continue
+                if frame[5]:
+                    frame[5] = False
+                else:
+                    buf = frame[3]
+                if frame[1]:
+                    buf += _encoder(key) + _key_separator
+                break
+            else:
+                return
 
     return _iterencode
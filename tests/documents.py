@@ -0,0 +1,77 @@
+"""
+Random documents for the equivalence tests, generated from fixed seeds so
+a failure can be replayed.
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# names repeat on purpose: siblings become lists, attributes get named like
+# children, and 'value' collides with the key normalized text goes under
+NAMES = ('a', 'b', 'value', 'item', 'n')
+TEXTS = (u'', u' ', u'text', u' padded ', u'a &amp; b &lt;c&gt;', u'café',
+	u'\U0001f600', u'1.50', u'\n  \n\t')
+ATTR_VALUES = (u'', u'1', u'x y', u'&quot;q&quot;', u'café')
+
+JSON_STRINGS = (u'', u'text', u'quote " and \\ slash', u'line\nbreak\ttab',
+	u'café', u'\U0001f600', u'\x01', u'</script>')
+JSON_NUMBERS = (0, -1, 42, 10 ** 20, 0.5, -1.25, 1e-07, 3.0)
+
+
+def random_element(rnd, depth=0, max_depth=4):
+	"""
+	One element with random attributes, text and children, as XML text.
+	"""
+	name = rnd.choice(NAMES)
+	attrs = u''.join(u' {0}="{1}"'.format(key, rnd.choice(ATTR_VALUES))
+		for key in rnd.sample(NAMES, rnd.randint(0, 2)))
+	parts = []
+	if depth < max_depth and rnd.random() < 0.6:
+		for _ in range(rnd.randint(0, 4)):
+			if rnd.random() < 0.3:
+				parts.append(rnd.choice(TEXTS))
+			parts.append(random_element(rnd, depth + 1, max_depth))
+	if rnd.random() < 0.5:
+		parts.append(rnd.choice(TEXTS))
+	if not parts and rnd.random() < 0.5:
+		return u'<{0}{1}/>'.format(name, attrs)
+	return u'<{0}{1}>{2}</{0}>'.format(name, attrs, u''.join(parts))
+
+def random_document(rnd, max_depth=4):
+	"""
+	An XML document: a random element, or a document element holding a run
+	of records the way feeds do.
+	"""
+	if rnd.random() < 0.5:
+		return random_element(rnd, 0, max_depth)
+	return random_records(rnd, rnd.randint(0, 8), max_depth)
+
+def random_records(rnd, count, max_depth=4):
+	attrs = u' id="r"' if rnd.random() < 0.3 else u''
+	records = u''.join(u'\n  ' + random_element(rnd, 1, max_depth) for _ in range(count))
+	return u'<root{0}>{1}\n</root>'.format(attrs, records)
+
+def random_value(rnd, depth=0, max_depth=4):
+	"""
+	A random decoded JSON value; objects never repeat a key.
+	"""
+	choice = rnd.random()
+	if depth >= max_depth or choice < 0.4:
+		return rnd.choice((None, True, False, rnd.choice(JSON_NUMBERS),
+			rnd.choice(JSON_STRINGS)))
+	if choice < 0.7:
+		return [random_value(rnd, depth + 1, max_depth) for _ in range(rnd.randint(0, 4))]
+	keys = rnd.sample(JSON_STRINGS + NAMES, rnd.randint(0, 4))
+	return dict((key, random_value(rnd, depth + 1, max_depth)) for key in keys)
+
+def random_json(rnd, value):
+	"""
+	`value` as JSON text with random blanks between the tokens; strings and
+	numbers are written the way json.dumps() writes them.
+	"""
+	indent = rnd.choice((None, 0, 1, 4))
+	separators = rnd.choice(((', ', ': '), (',', ':'), (' ,\n', ' :\t')))
+	text = json.dumps(value, indent=indent, separators=separators, ensure_ascii=False)
+	return rnd.choice((u'', u' ', u'\n')) + text + rnd.choice((u'', u'\r\n', u' \t'))
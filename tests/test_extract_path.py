@@ -0,0 +1,90 @@
+"""
+extract_path() against picking the same elements out of the whole list.
+"""
+import json
+import random
+import unittest
+
+import documents  # noqa: F401 (puts the package on sys.path)
+
+import xml2json_core
+
+
+def entry(index, kind):
+	return {'id': str(index), 'type': kind, 't': u'text {}'.format(index)}
+
+def entry_xml(value):
+	return u'<entry id="{id}" type="{type}"><t>{t}</t></entry>'.format(**value)
+
+def extract(xml_text, path):
+	return json.loads(xml2json_core.extract_path(xml_text, path, pretty=False))
+
+def grouped(name, values):
+	return {name: values[0] if len(values) == 1 else values}
+
+
+class ExtractPathTest(unittest.TestCase):
+
+	def setUp(self):
+		rnd = random.Random(11)
+		self.entries = [entry(index, rnd.choice(('post', 'page'))) for index in range(20)]
+		self.xml = u'<feed><title>t</title>{}<link href="x"/></feed>'.format(
+			u''.join(entry_xml(value) for value in self.entries))
+
+	def test_index_and_slices(self):
+		count = len(self.entries)
+		cases = [(u'[{}]'.format(i), slice(i, i + 1)) for i in (0, 5, count - 1)]
+		rnd = random.Random(12)
+		for _ in range(60):
+			start = rnd.choice((None, rnd.randint(0, count + 2)))
+			stop = rnd.choice((None, rnd.randint(0, count + 2)))
+			text = u'[{}:{}]'.format('' if start is None else start, '' if stop is None else stop)
+			cases.append((text, slice(start, stop)))
+		for predicate, part in cases:
+			expected = self.entries[part]
+			path = u'/feed/entry' + predicate
+			if not expected:
+				self.assertRaises(ValueError, extract, self.xml, path)
+			else:
+				self.assertEqual(extract(self.xml, path), grouped('entry', expected), path)
+
+	def test_attribute_predicates_count_matches_only(self):
+		posts = [value for value in self.entries if value['type'] == 'post']
+		self.assertEqual(extract(self.xml, u'/feed/entry[@type="post"]'), grouped('entry', posts))
+		self.assertEqual(extract(self.xml, u"/feed/entry[@type='post'][1:3]"),
+			grouped('entry', posts[1:3]))
+		self.assertEqual(extract(self.xml, u'/feed/*[@href]'),
+			json.loads(xml2json_core.xml_to_json(u'<link href="x"/>')))
+		self.assertEqual(extract(self.xml, u'/feed/entry[@id="7"]/t'), {'t': 'text 7'})
+
+	def test_wildcard_and_nested_steps(self):
+		self.assertEqual(extract(self.xml, u'/*/*[0]'), {'title': 't'})
+		self.assertEqual(extract(self.xml, u'/feed/entry[2:4]/t'),
+			{'t': ['text 2', 'text 3']})
+		# counted among the siblings under each parent
+		doc = u'<feed><g><e>1</e><e>2</e></g><g><e>3</e><e>4</e></g></feed>'
+		self.assertEqual(extract(doc, u'/feed/g/e[1]'), {'e': ['2', '4']})
+		self.assertEqual(extract(doc, u'/feed/g[1]/e'), {'e': ['3', '4']})
+
+	def test_each_match_converts_like_a_document(self):
+		rnd = random.Random(13)
+		for _ in range(300):
+			children = [documents.random_element(rnd, 1) for _ in range(rnd.randint(1, 5))]
+			doc = u'<root>' + u''.join(children) + u'</root>'
+			index = rnd.randrange(len(children))
+			expected = json.loads(xml2json_core.xml_to_json(children[index], pretty=False))
+			self.assertEqual(extract(doc, u'/root/*[{}]'.format(index)), expected, doc)
+
+	def test_bad_paths(self):
+		for path in (u'', u'/feed/entry[', u'/feed/entry[1][2]', u'/feed/entry[x]'):
+			self.assertRaises(ValueError, xml2json_core.parse_path, path)
+		self.assertRaises(ValueError, extract, self.xml, u'/other')
+
+	def test_parse_path(self):
+		self.assertEqual(xml2json_core.parse_path(u'/feed/entry[@type="post"][10:20]'), [
+			xml2json_core.PathStep('feed', (), 0, None),
+			xml2json_core.PathStep('entry', (('type', 'post'),), 10, 20)])
+
+
+if __name__ == '__main__':
+	unittest.main()
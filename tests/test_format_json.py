@@ -0,0 +1,65 @@
+"""
+format_json() against decoding the JSON and encoding it again.
+"""
+import json
+import random
+import unittest
+
+from documents import random_json, random_value
+
+import xml2json_core
+
+
+def round_trip(text, pretty=True, indent=2, ensure_ascii=False, sort_keys=False):
+	value = json.loads(text)
+	if pretty:
+		return json.dumps(value, indent=indent, ensure_ascii=ensure_ascii,
+			sort_keys=sort_keys, separators=xml2json_core.PRETTY_SEPARATORS)
+	return json.dumps(value, ensure_ascii=ensure_ascii, sort_keys=sort_keys,
+		separators=(',', ':'))
+
+
+class FormatJSONTest(unittest.TestCase):
+
+	def test_random_json_matches_round_trip(self):
+		rnd = random.Random(21)
+		for _ in range(3000):
+			text = random_json(rnd, random_value(rnd))
+			pretty = rnd.random() < 0.5
+			indent = rnd.choice((0, 2, 4))
+			self.assertEqual(xml2json_core.format_json(text, pretty, indent),
+				round_trip(text, pretty, indent), text)
+
+	def test_decoding_options_match_round_trip(self):
+		rnd = random.Random(22)
+		for _ in range(1000):
+			text = random_json(rnd, random_value(rnd))
+			pretty = rnd.random() < 0.5
+			options = rnd.choice(({'sort_keys': True}, {'ensure_ascii': True},
+				{'sort_keys': True, 'ensure_ascii': True}))
+			self.assertEqual(xml2json_core.format_json(text, pretty, **options),
+				round_trip(text, pretty, **options), text)
+
+	def test_numbers_and_strings_are_kept(self):
+		text = u'{"a":1.50,"b":"\\u00e9","c":[1e5,-0]}'
+		self.assertEqual(xml2json_core.format_json(text, pretty=False), text)
+
+	def test_invalid_json_raises(self):
+		rnd = random.Random(23)
+		broken = 0
+		for _ in range(3000):
+			text = random_json(rnd, random_value(rnd))
+			position = rnd.randrange(len(text) + 1)
+			text = text[:position] + rnd.choice((u',', u'"', u']', u'}', u'x', u':')) + text[position:]
+			try:
+				json.loads(text)
+			except ValueError:
+				broken += 1
+				self.assertRaises(ValueError, xml2json_core.format_json, text)
+			else:
+				self.assertEqual(xml2json_core.format_json(text), round_trip(text), text)
+		self.assertGreater(broken, 1000)
+
+
+if __name__ == '__main__':
+	unittest.main()
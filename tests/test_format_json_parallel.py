@@ -0,0 +1,97 @@
+"""
+format_json_parallel() against format_json(), with pieces small enough that
+the arrays are cut in many places, some of them inside items.
+"""
+import json
+import random
+import unittest
+
+from documents import random_json, random_value
+
+import xml2json_core
+
+
+def separator_items(rnd, count):
+	"""
+	Array items, many of which hold the separator between the first two
+	in a string or a nested array.
+	"""
+	items = [{'a': 0}, {'a': 1}]
+	for n in range(count):
+		items.append(rnd.choice((
+			{'a': n},
+			{'s': u'},{'},
+			{'s': u'x}, {"a": 1}, {y'},
+			{'n': [{'b': n}, {'b': [{'c': n}, {}]}]},
+			[{'a': n}, {'a': n + 1}],
+			random_value(rnd),
+		)))
+	return items
+
+
+@unittest.skipIf(xml2json_core.ProcessPoolExecutor is None, 'no concurrent.futures')
+class FormatJSONParallelTest(unittest.TestCase):
+
+	def setUp(self):
+		self.run_size = xml2json_core._PARALLEL_RUN_SIZE
+		xml2json_core._PARALLEL_RUN_SIZE = 64
+
+	def tearDown(self):
+		xml2json_core._PARALLEL_RUN_SIZE = self.run_size
+
+	def format_parallel(self, text, pretty=True, **options):
+		pieces = []
+		formatted = xml2json_core.format_json_parallel(text, pretty, workers=2,
+			min_size=0, progress=lambda done, total: pieces.append(done), **options)
+		return formatted, len(pieces)
+
+	def test_random_arrays_match_sequential(self):
+		rnd = random.Random(201)
+		split = 0
+		for _ in range(20):
+			text = random_json(rnd, separator_items(rnd, rnd.randrange(20, 200)))
+			pretty = rnd.random() < 0.5
+			options = rnd.choice(({}, {'indent': 4}, {'sort_keys': True},
+				{'ensure_ascii': True}))
+			formatted, pieces = self.format_parallel(text, pretty, **options)
+			self.assertEqual(formatted,
+				xml2json_core.format_json(text, pretty, **options), text)
+			if pieces > 2:
+				split += 1
+		self.assertGreater(split, 15)
+
+	def test_invalid_arrays_raise(self):
+		items = u','.join(u'{"a":%d,"s":"},{"}' % n for n in range(50))
+		for text in (
+			u'[' + items + u',]',
+			u'[' + items + u', \n]',
+			u'[' + items + u',,{"a":0}]',
+			u'[' + items,
+			u'[' + items + u',',
+			u'[' + items + u'] x',
+			u'[' + items + u'][]',
+			u'[' + items + u',{"a":]',
+		):
+			self.assertRaises(ValueError, xml2json_core.format_json, text)
+			self.assertRaises(ValueError, self.format_parallel, text)
+
+	def test_random_corruption_raises_like_sequential(self):
+		rnd = random.Random(202)
+		broken = 0
+		for _ in range(60):
+			text = random_json(rnd, separator_items(rnd, rnd.randrange(20, 100)))
+			position = rnd.randrange(len(text) + 1)
+			text = text[:position] + rnd.choice((u',', u'"', u']', u'}', u'x')) + text[position:]
+			try:
+				json.loads(text)
+			except ValueError:
+				broken += 1
+				self.assertRaises(ValueError, self.format_parallel, text)
+			else:
+				self.assertEqual(self.format_parallel(text)[0],
+					xml2json_core.format_json(text), text)
+		self.assertGreater(broken, 20)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,44 @@
+"""
+Trees parsed with interning against trees parsed without.
+"""
+import random
+import unittest
+
+import documents
+
+import xmltodict
+import xml2json_core
+
+
+class InternTest(unittest.TestCase):
+
+	def test_same_trees(self):
+		rnd = random.Random(43)
+		table = {}
+		for _ in range(1000):
+			doc = documents.random_document(rnd)
+			options = dict(intern_limit=rnd.choice((1, 10, 1000)),
+				intern_value_length=rnd.choice((0, 4, 40)))
+			if rnd.random() < 0.5:
+				options['intern_table'] = table
+			self.assertEqual(xmltodict.parse(doc, **options), xmltodict.parse(doc), doc)
+			self.assertEqual(xml2json_core.parse_xml_normalized(doc, **options),
+				xml2json_core.parse_xml_normalized(doc), doc)
+		self.assertLessEqual(len(table), 1000)
+
+	def test_strings_are_shared(self):
+		doc = u'<a><b kind="post">on</b><b kind="post">on</b></a>'
+		first, second = xmltodict.parse(doc, intern_limit=100, intern_value_length=8)['a']['b']
+		for (key1, value1), (key2, value2) in zip(first.items(), second.items()):
+			self.assertIs(key1, key2)
+			self.assertIs(value1, value2)
+
+	def test_table_is_bounded(self):
+		table = {}
+		doc = u'<a>' + u''.join(u'<b>{}</b>'.format(index) for index in range(100)) + u'</a>'
+		xmltodict.parse(doc, intern_limit=10, intern_value_length=8, intern_table=table)
+		self.assertEqual(len(table), 10)
+
+
+if __name__ == '__main__':
+	unittest.main()
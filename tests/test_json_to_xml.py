@@ -0,0 +1,183 @@
+"""
+Streaming json_to_xml() and _JSONReader against decoding the whole JSON
+first and writing it with xmltodict.unparse().
+"""
+import io
+import json
+import random
+import unittest
+
+from documents import random_json, random_value
+
+import xmltodict
+import xml2json_core
+
+
+class SplitReader(object):
+	"""
+	Text file that returns a few characters at a time, however many are
+	asked for.
+	"""
+	def __init__(self, text, rnd):
+		self.text = text
+		self.rnd = rnd
+		self.pos = 0
+
+	def read(self, size):
+		end = self.pos + min(size, self.rnd.randint(1, 7))
+		data = self.text[self.pos:end]
+		self.pos = end
+		return data
+
+
+def decoded_xml(text, pretty=True, root_name='root'):
+	# what json_to_xml() wrote before it streamed
+	data = json.JSONDecoder(object_pairs_hook=xml2json_core._object_pairs_hook).decode(text)
+	return xmltodict.unparse(xml2json_core.wrap_for_xml(data, root_name),
+		pretty=pretty, indent='  ', emitter='direct')
+
+def json_lines(rnd, values):
+	return u'\n'.join(json.dumps(value, ensure_ascii=rnd.random() < 0.5)
+		for value in values) + rnd.choice((u'', u'\n', u'\r\n'))
+
+def outcome(function, *args, **kwargs):
+	try:
+		return function(*args, **kwargs)
+	except ValueError:
+		return ValueError
+
+
+class JSONReaderTest(unittest.TestCase):
+
+	def read(self, text, rnd):
+		if rnd.random() < 0.5:
+			source = SplitReader(text, rnd)
+		else:
+			source = io.StringIO(text)
+		reader = xml2json_core._JSONReader(source=source,
+			chunk_size=rnd.randint(1, 4))
+		value, records = reader.document()
+		if records is not None:
+			return list(records)
+		return value
+
+	def test_values_split_across_chunks(self):
+		rnd = random.Random(181)
+		for _ in range(1000):
+			value = random_value(rnd)
+			text = random_json(rnd, value)
+			self.assertEqual(self.read(text, rnd), json.loads(text), text)
+
+	def test_numbers_at_chunk_ends(self):
+		rnd = random.Random(182)
+		for text, expected in (
+			(u'123456', 123456),
+			(u' 2.5e10 ', 2.5e10),
+			(u'[1, 22, 333, 4.25, -0.5e-3]', [1, 22, 333, 4.25, -0.5e-3]),
+			(u'1\n22\n333\n', [1, 22, 333]),
+			(u'"\\u00e9\\ud83d\\ude00"', u'\xe9\U0001f600'),
+		):
+			for _ in range(20):
+				self.assertEqual(self.read(text, rnd), expected, text)
+
+	def test_json_lines(self):
+		rnd = random.Random(183)
+		for _ in range(300):
+			values = [random_value(rnd) for _ in range(rnd.randint(2, 6))]
+			text = json_lines(rnd, values)
+			self.assertEqual(self.read(text, rnd), values, text)
+
+	def test_undecoded_tail_is_kept(self):
+		rnd = random.Random(184)
+		# (a first line with a whole array would be read for JSON Lines)
+		text = u'[\n' + u', '.join(u'"%s"' % (u'x' * n) for n in range(40)) + u']'
+		reader = xml2json_core._JSONReader(source=SplitReader(text, rnd), chunk_size=3)
+		value, records = reader.document()
+		for n, item in enumerate(records):
+			self.assertEqual(item, u'x' * n)
+			# no more than about the next item is buffered
+			self.assertLessEqual(len(reader.text), 2 * n + 16)
+
+	def test_errors_give_the_position(self):
+		rnd = random.Random(185)
+		for text, message in (
+			(u'[1, 2] x', u'Extra data (char 7)'),
+			(u'[1, 2 3]', u"Expecting ',' delimiter or ']' (char 6)"),
+		):
+			for _ in range(20):
+				with self.assertRaises(ValueError) as context:
+					self.read(text, rnd)
+				self.assertEqual(str(context.exception), message)
+
+
+class JSONToXMLTest(unittest.TestCase):
+
+	def convert(self, text, rnd, **options):
+		if rnd.random() < 0.5:
+			return xml2json_core.json_to_xml(text, **options)
+		if rnd.random() < 0.5:
+			return xml2json_core.json_to_xml(SplitReader(text, rnd), **options)
+		output = io.StringIO()
+		self.assertIsNone(xml2json_core.json_to_xml(SplitReader(text, rnd),
+			output, **options))
+		return output.getvalue()
+
+	def test_random_json_matches_decoded(self):
+		rnd = random.Random(186)
+		arrays = 0
+		for _ in range(1500):
+			value = random_value(rnd)
+			if rnd.random() < 0.3:
+				value = [random_value(rnd) for _ in range(rnd.randint(0, 5))]
+			arrays += isinstance(value, list)
+			text = random_json(rnd, value)
+			pretty = rnd.random() < 0.5
+			root_name = rnd.choice(('root', 'doc'))
+			self.assertEqual(
+				outcome(self.convert, text, rnd, pretty=pretty, root_name=root_name),
+				outcome(decoded_xml, text, pretty, root_name), text)
+		self.assertGreater(arrays, 400)
+
+	def test_arrays_become_items(self):
+		rnd = random.Random(187)
+		for _ in range(20):
+			self.assertEqual(self.convert(u'[1, {"a": "x"}, null]', rnd, pretty=False),
+				u'<?xml version="1.0" encoding="utf-8"?>\n<root><item>1</item>'
+				u'<item><a>x</a></item><item/></root>')
+
+	def test_json_lines_match_decoded_array(self):
+		rnd = random.Random(188)
+		for _ in range(500):
+			values = [random_value(rnd) for _ in range(rnd.randint(2, 6))]
+			text = json_lines(rnd, values)
+			pretty = rnd.random() < 0.5
+			self.assertEqual(outcome(self.convert, text, rnd, pretty=pretty),
+				outcome(decoded_xml, json.dumps(values), pretty), text)
+
+	def test_invalid_json_raises(self):
+		rnd = random.Random(189)
+		for text in (u'', u' ', u'[', u'[1, 2', u'[1, 2,]', u'[1,, 2]', u'[1, 2] x',
+			u'[1, 2]]', u'{"a": 1} x', u'{"a": 1}}', u'{"a":', u'1 2 x',
+			u'[1]\n[2]\nx', u'"abc', u'nul'):
+			for _ in range(10):
+				self.assertRaises(ValueError, self.convert, text, rnd)
+
+	def test_random_corruption_raises_like_decoding(self):
+		rnd = random.Random(190)
+		broken = 0
+		for _ in range(1500):
+			text = random_json(rnd, [random_value(rnd) for _ in range(rnd.randint(1, 4))])
+			position = rnd.randrange(len(text) + 1)
+			text = text[:position] + rnd.choice((u',', u'"', u']', u'}', u'x', u':')) + text[position:]
+			try:
+				json.loads(text)
+			except ValueError:
+				broken += 1
+				# JSON Lines may start with an array, or be a list of them
+				if u'\n' not in text.strip():
+					self.assertRaises(ValueError, self.convert, text, rnd)
+		self.assertGreater(broken, 1000)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,90 @@
+"""
+LiveConversion after a series of edits against converting the whole
+document again.
+"""
+import random
+import unittest
+from xml.parsers import expat
+
+from documents import random_element, random_records
+
+import xml2json_core
+
+
+def random_edit(rnd, doc):
+	"""
+	`doc` with one random change: a record replaced, added or removed, a
+	few characters typed or deleted, or the document element changed.
+	"""
+	kind = rnd.random()
+	records = doc.split(u'\n  ')
+	if kind < 0.5 and len(records) > 1:
+		index = rnd.randrange(1, len(records))
+		last = index == len(records) - 1
+		closing = u'\n</root>' if last else u''
+		if kind < 0.2:
+			records[index] = random_element(rnd, 1) + closing
+		elif kind < 0.35:
+			records.insert(index, random_element(rnd, 1))
+		elif not last:
+			del records[index]
+		return u'\n  '.join(records)
+	if kind < 0.8:
+		# typing inside the text, which may well break the markup
+		position = rnd.randrange(len(doc) + 1)
+		if rnd.random() < 0.5:
+			return doc[:position] + rnd.choice((u'x', u' ', u'<', u'é', u'"')) + doc[position:]
+		return doc[:position] + doc[position + 1:]
+	if kind < 0.9:
+		return doc.replace(u'<root', u'<root n="1"', 1) if u'<root>' in doc else doc
+	return random_records(rnd, rnd.randint(0, 6))
+
+
+class LiveConversionTest(unittest.TestCase):
+
+	def check_edits(self, seed, **options):
+		rnd = random.Random(seed)
+		live = xml2json_core.LiveConversion(**options)
+		convert = dict(options)
+		convert.pop('sort_keys', None)
+		doc = random_records(rnd, 6)
+		output = u''
+		partial = 0
+		for _ in range(400):
+			try:
+				expected = xml2json_core.xml_to_json(doc, sort_keys=options.get('sort_keys', False),
+					**convert)
+			except expat.ExpatError:
+				self.assertRaises(expat.ExpatError, live.update, doc)
+				# the last good output stays
+				self.assertEqual(live.text, output)
+			else:
+				begin, end, text = live.update(doc)
+				output = output[:begin] + text + output[end:]
+				self.assertEqual(live.text, expected, doc)
+				self.assertEqual(output, expected, doc)
+				partial += live.partial
+			doc = random_edit(rnd, doc)
+		return partial
+
+	def test_edits_match_full_conversion(self):
+		# the point is the partial updates, so make sure there were some
+		self.assertGreater(self.check_edits(7), 20)
+
+	def test_compact_not_normalized(self):
+		self.check_edits(8, pretty=False, normalize=False)
+
+	def test_ensure_ascii(self):
+		self.check_edits(9, ensure_ascii=True, value_key='text')
+
+	def test_sort_keys_converts_in_full(self):
+		self.check_edits(10, sort_keys=True)
+
+	def test_unchanged_text(self):
+		live = xml2json_core.LiveConversion()
+		live.update(u'<root><a>1</a></root>')
+		self.assertEqual(live.update(u'<root><a>1</a></root>'), (0, 0, u''))
+
+
+if __name__ == '__main__':
+	unittest.main()
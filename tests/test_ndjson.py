@@ -0,0 +1,122 @@
+"""
+xml_to_ndjson() against converting every record on its own with
+xml_to_json().
+"""
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+from documents import random_element
+
+import xml2json_core
+
+
+def record_line(record_xml, ensure_ascii=False, sort_keys=False, normalize=True):
+	# the value xml_to_json() gives the record, as one line of compact JSON
+	tree = json.loads(xml2json_core.xml_to_json(record_xml, pretty=False,
+		normalize=normalize), object_pairs_hook=OrderedDict)
+	value = list(tree.values())[0]
+	return json.dumps(value, ensure_ascii=ensure_ascii, sort_keys=sort_keys,
+		separators=(',', ':'))
+
+def random_feed(rnd):
+	"""
+	A document and its records: (name, XML) of each child of the document
+	element, and of each child of the <group> elements among them.
+	"""
+	children = []
+	grouped = []
+	for _ in range(rnd.randint(0, 12)):
+		if rnd.random() < 0.2:
+			members = [random_element(rnd, 2) for _ in range(rnd.randint(0, 4))]
+			grouped.extend(members)
+			children.append(u'<group>' + u'\n    '.join(members) + u'</group>')
+		else:
+			children.append(random_element(rnd, 1))
+	attrs = u' id="r"' if rnd.random() < 0.3 else u''
+	doc = u'<?xml version="1.0"?>\n<root{0}>{1}\n</root>\n'.format(attrs,
+		u''.join(u'\n  ' + child for child in children))
+	return doc, children, grouped
+
+def name_of(element_xml):
+	return element_xml[1:].split(u'>')[0].split(u' ')[0].rstrip(u'/')
+
+
+class NDJSONTest(unittest.TestCase):
+
+	def assertLines(self, doc, expected, **options):
+		lines = xml2json_core.xml_to_ndjson(doc, **options)
+		options.pop('records', None)
+		self.assertEqual(lines, u''.join(record_line(record, **options) + u'\n'
+			for record in expected), doc)
+
+	def test_default_records_are_the_children(self):
+		rnd = random.Random(171)
+		for _ in range(1000):
+			doc, children, grouped = random_feed(rnd)
+			options = rnd.choice(({}, {'ensure_ascii': True}, {'sort_keys': True},
+				{'normalize': False}))
+			self.assertLines(doc, children, **options)
+
+	def test_custom_paths(self):
+		rnd = random.Random(172)
+		for _ in range(500):
+			doc, children, grouped = random_feed(rnd)
+			name = rnd.choice(('a', 'item', 'group'))
+			named = [child for child in children if name_of(child) == name]
+			self.assertLines(doc, named, records=u'/root/' + name)
+			self.assertLines(doc, grouped, records=u'/root/group/*')
+			self.assertLines(doc, grouped, records=u'/*/group/*')
+			start = rnd.randint(0, 4)
+			stop = start + rnd.randint(0, 4)
+			self.assertLines(doc, named[start:stop],
+				records=u'/root/{0}[{1}:{2}]'.format(name, start, stop))
+			self.assertLines(doc, [], records=u'/other/*')
+
+	def test_output_stream(self):
+		rnd = random.Random(173)
+		doc, children, grouped = random_feed(rnd)
+		output = xml2json_core.StringIO()
+		self.assertIsNone(xml2json_core.xml_to_ndjson(doc, output))
+		self.assertEqual(output.getvalue(), xml2json_core.xml_to_ndjson(doc))
+
+
+class ConvertFileTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.source = os.path.join(self.directory, 'feed.xml')
+		self.doc, self.children, grouped = random_feed(random.Random(174))
+		with open(self.source, 'wb') as f:
+			f.write(self.doc.encode('utf-8'))
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def convert(self, name, **options):
+		target = xml2json_core.convert_file(self.source,
+			os.path.join(self.directory, name), **options)
+		with open(target, 'rb') as f:
+			return f.read().decode('utf-8')
+
+	def test_json_lines_targets(self):
+		expected = xml2json_core.xml_to_ndjson(self.doc)
+		for name in ('feed.jsonl', 'feed.ndjson', 'FEED.JSONL'):
+			self.assertEqual(self.convert(name), expected, name)
+		self.assertEqual(self.convert('feed.jsonl', records='/root/group/*'),
+			xml2json_core.xml_to_ndjson(self.doc, records='/root/group/*'))
+
+	def test_json_target(self):
+		self.assertEqual(self.convert('feed.json'),
+			xml2json_core.xml_to_json(self.doc) + u'\n')
+		# an explicit direction wins over the extension
+		self.assertEqual(self.convert('feed.jsonl', to='json'),
+			xml2json_core.xml_to_json(self.doc) + u'\n')
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,79 @@
+"""
+NewlineWriter fed in random pieces against normalize_newlines() on the
+whole text.
+"""
+import io
+import random
+import unittest
+
+import documents  # noqa: F401 (puts the package on sys.path)
+
+import xml2json_core
+
+PIECES = (u'a', u'word', u' ', u'\t', u'\r', u'\n', u'\r\n', u'é', u'  \r\n')
+NEWLINES = ('\n', '\r\n', '\r')
+
+
+def random_text(rnd):
+	return u''.join(rnd.choice(PIECES) for _ in range(rnd.randint(0, 60)))
+
+def split(rnd, text):
+	pieces = []
+	start = 0
+	while start < len(text):
+		stop = start + rnd.randint(1, 8)
+		pieces.append(text[start:stop])
+		start = stop
+	return pieces
+
+
+class NewlineWriterTest(unittest.TestCase):
+
+	def test_pieces_match_whole_text(self):
+		rnd = random.Random(4)
+		for _ in range(5000):
+			text = random_text(rnd)
+			newline = rnd.choice(NEWLINES)
+			trim = rnd.random() < 0.5
+			final = rnd.random() < 0.5
+			out = io.StringIO()
+			writer = xml2json_core.NewlineWriter(out, newline, trim, final,
+				buffer_size=rnd.randint(1, 16))
+			for piece in split(rnd, text):
+				writer.write(piece)
+			writer.finish()
+			expected = xml2json_core.normalize_newlines(text, newline, trim, final)
+			self.assertEqual(out.getvalue(), expected, (text, newline, trim, final))
+
+	def test_blocks_match_whole_text(self):
+		rnd = random.Random(5)
+		for _ in range(2000):
+			text = random_text(rnd)
+			newline = rnd.choice(NEWLINES)
+			trim = rnd.random() < 0.5
+			self.assertEqual(
+				xml2json_core.normalize_newlines(text, newline, trim,
+					block_size=rnd.randint(1, 16)),
+				xml2json_core.normalize_newlines(text, newline, trim), text)
+
+	def test_clean_text_shortcut(self):
+		rnd = random.Random(6)
+		for _ in range(2000):
+			# what clean=True promises: '\n' only and no trailing blanks
+			text = u'\n'.join(line.rstrip(u' \t') for line in
+				random_text(rnd).replace(u'\r', u'').split(u'\n'))
+			newline = rnd.choice(NEWLINES)
+			self.assertEqual(
+				xml2json_core.normalize_newlines(text, newline, clean=True),
+				xml2json_core.normalize_newlines(text, newline), text)
+
+	def test_dropped_writer_writes_nothing_more(self):
+		out = io.StringIO()
+		writer = xml2json_core.NewlineWriter(out, '\r\n', buffer_size=1 << 16)
+		writer.write(u'half\n')
+		writer.close()
+		self.assertEqual(out.getvalue(), u'')
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,106 @@
+"""
+xml_to_json_parallel() against xml_to_json(), with runs small enough that
+every document is cut into many of them.
+"""
+import random
+import unittest
+
+from documents import random_element
+
+import xml2json_core
+
+PROLOGS = (
+	u'',
+	u'<?xml version="1.0" encoding="UTF-8"?>\n',
+	u'<?xml version="1.0"?>\n<!-- feed -->\n<?pi data?>\n',
+	u'<!DOCTYPE root [\n  <!ENTITY co "ACME &amp; Co">\n  <!ENTITY e "&#233;">\n'
+	u'  <!ATTLIST leaf kind CDATA "default">\n]>\n',
+)
+
+
+def random_child(rnd, entities):
+	"""
+	A record for the document element: random elements mostly, and names
+	that come once or a few times across the document, attribute-only
+	leaves, leaves with text, and the entities of the DOCTYPE prolog.
+	"""
+	choice = rnd.random()
+	if choice < 0.15:
+		return u'<leaf a="{0}"/>'.format(rnd.randrange(10))
+	if choice < 0.25:
+		return u'<leaf>text {0}</leaf>'.format(rnd.randrange(10))
+	if choice < 0.3:
+		return u'<once{0}>x</once{0}>'.format(rnd.randrange(1000))
+	if choice < 0.35 and entities:
+		return u'<name>&co; &e;</name>'
+	return random_element(rnd, 1)
+
+def random_feed(rnd):
+	prolog = rnd.choice(PROLOGS)
+	attrs = u' id="r"' if rnd.random() < 0.3 else u''
+	children = u''.join(u'\n  ' + random_child(rnd, u'ENTITY' in prolog)
+		for _ in range(rnd.randrange(2, 60)))
+	return u'{0}<root{1}>{2}\n</root>\n'.format(prolog, attrs, children)
+
+
+@unittest.skipIf(xml2json_core.ProcessPoolExecutor is None, 'no concurrent.futures')
+class ParallelXMLTest(unittest.TestCase):
+
+	def setUp(self):
+		self.run_size = xml2json_core._PARALLEL_RUN_SIZE
+		xml2json_core._PARALLEL_RUN_SIZE = 64
+
+	def tearDown(self):
+		xml2json_core._PARALLEL_RUN_SIZE = self.run_size
+
+	def convert_parallel(self, doc, **options):
+		runs = []
+		converted = xml2json_core.xml_to_json_parallel(doc, workers=2, min_size=0,
+			progress=lambda done, total: runs.append(done), **options)
+		return converted, len(runs)
+
+	def test_random_feeds_match_sequential(self):
+		rnd = random.Random(191)
+		split = 0
+		for _ in range(60):
+			doc = random_feed(rnd)
+			pretty = rnd.random() < 0.5
+			normalize = rnd.random() < 0.7
+			converted, runs = self.convert_parallel(doc, pretty=pretty,
+				normalize=normalize)
+			self.assertEqual(converted, xml2json_core.xml_to_json(doc,
+				pretty=pretty, normalize=normalize), doc)
+			if runs > 2:
+				split += 1
+		self.assertGreater(split, 30)
+
+	def test_names_across_runs(self):
+		filler = u''.join(u'<f>{0}</f>'.format(n) for n in range(20))
+		for children in (
+			# alone in one run, repeated in a later one
+			[u'<x>1</x>', filler, u'<y/>', filler, u'<y/>'],
+			# repeated only across runs
+			[u'<x>1</x>', filler, u'<x>2</x>'],
+			# attribute-only leaves, text-bearing siblings in other runs
+			[u'<leaf a="1"/>', filler, u'<leaf>t</leaf>', filler, u'<leaf b="2"/>'],
+			[u'<leaf a="1"/>', filler, u'<leaf a="2"/>', filler, u'<leaf>t</leaf>'],
+			[u'<leaf a="1"/>', filler, u'<other>t</other>'],
+		):
+			doc = u'<root>' + u'\n'.join(children) + u'</root>'
+			for normalize in (True, False):
+				converted, runs = self.convert_parallel(doc, normalize=normalize)
+				self.assertGreater(runs, 2)
+				self.assertEqual(converted,
+					xml2json_core.xml_to_json(doc, normalize=normalize), doc)
+
+	def test_doctype_entities(self):
+		doc = PROLOGS[-1] + u'<root>' + u''.join(
+			u'<name n="{0}">&co; &e;</name><leaf/>'.format(n) for n in range(30)) + u'</root>'
+		converted, runs = self.convert_parallel(doc)
+		self.assertGreater(runs, 2)
+		self.assertEqual(converted, xml2json_core.xml_to_json(doc))
+		self.assertIn(u'ACME & Co é', converted)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,170 @@
+"""
+reformat_xml() against the tree of the document it was given.
+"""
+import io
+import random
+import unittest
+
+from documents import random_document
+
+import xmltodict
+import xml2json_core
+
+MARKUP = (u'<!-- note -->', u'<?pi data?>', u'<![CDATA[ <raw> & ]]>', u'<![CDATA[]]>')
+
+
+def with_markup(rnd, doc):
+	"""
+	`doc` with comments, processing instructions and CDATA sections after
+	some of its tags, inside the document element.
+	"""
+	parts = doc.split(u'>')
+	for index in range(len(parts) - 2):
+		if rnd.random() < 0.2:
+			parts[index + 1] = rnd.choice(MARKUP) + parts[index + 1]
+	doc = u'>'.join(parts)
+	if rnd.random() < 0.5:
+		doc = u'<?xml version="1.0"?>\n<!-- before -->' + doc + u'<?after?>'
+	return doc
+
+def squeeze(value):
+	"""
+	A tree from xmltodict.parse() with the whitespace taken out of its
+	text.
+	"""
+	if isinstance(value, dict):
+		return dict((key, squeeze(item)) for key, item in value.items())
+	if isinstance(value, list):
+		return [squeeze(item) for item in value]
+	if value is None:
+		return value
+	return u''.join(value.split())
+
+
+class ReformatXMLTest(unittest.TestCase):
+
+	def setUp(self):
+		self.lookahead = xml2json_core._REFORMAT_LOOKAHEAD
+
+	def tearDown(self):
+		xml2json_core._REFORMAT_LOOKAHEAD = self.lookahead
+
+	def test_random_documents_keep_their_tree(self):
+		rnd = random.Random(211)
+		for _ in range(1500):
+			doc = random_document(rnd)
+			if rnd.random() < 0.5:
+				doc = with_markup(rnd, doc)
+			pretty = rnd.random() < 0.7
+			indent = rnd.choice((u'  ', u'\t', u''))
+			style = rnd.choice(('compact', 'expanded', 'spaced'))
+			# with a short lookahead, elements get indented before their text
+			# is seen
+			short = rnd.random() < 0.2
+			xml2json_core._REFORMAT_LOOKAHEAD = rnd.randrange(1, 64) if short \
+				else self.lookahead
+			reformatted = xml2json_core.reformat_xml(doc, pretty=pretty,
+				indent=indent, empty_tag_style=style)
+			if short:
+				# text that comes too late stays between the added indents
+				self.assertEqual(squeeze(xmltodict.parse(reformatted)),
+					squeeze(xmltodict.parse(doc)), (doc, reformatted))
+				continue
+			self.assertEqual(xmltodict.parse(reformatted), xmltodict.parse(doc),
+				(doc, reformatted))
+			# and reformatting it again changes nothing
+			self.assertEqual(xml2json_core.reformat_xml(reformatted, pretty=pretty,
+				indent=indent, empty_tag_style=style), reformatted)
+
+	def test_comments_and_processing_instructions(self):
+		doc = (u'<!-- c --><?pi x?><a><!-- in --><b/><?p d?><c>t</c></a>'
+			u'<!-- after -->')
+		self.assertEqual(xml2json_core.reformat_xml(doc),
+			u'<!-- c -->\n<?pi x?>\n<a>\n  <!-- in -->\n  <b/>\n  <?p d?>\n'
+			u'  <c>t</c>\n</a>\n<!-- after -->')
+		self.assertEqual(xml2json_core.reformat_xml(doc, pretty=False),
+			u'<!-- c -->\n<?pi x?>\n<a><!-- in --><b/><?p d?><c>t</c></a>\n'
+			u'<!-- after -->')
+
+	def test_cdata(self):
+		doc = u'<a><b><![CDATA[<x> & y]]></b><c>1<![CDATA[2]]></c><d> <e/><![CDATA[ ]]></d></a>'
+		self.assertEqual(xml2json_core.reformat_xml(doc),
+			u'<a>\n  <b><![CDATA[<x> & y]]></b>\n  <c>1<![CDATA[2]]></c>\n'
+			u'  <d> <e/><![CDATA[ ]]></d>\n</a>')
+
+	def test_doctype_with_internal_subset(self):
+		doc = (u'<!DOCTYPE a [\n <!ENTITY e "x">\n <!-- sub -->\n'
+			u' <!ATTLIST b k CDATA "d">\n]><a><b>&e;</b></a>')
+		self.assertEqual(xml2json_core.reformat_xml(doc),
+			u'<!DOCTYPE a [\n <!ENTITY e "x">\n <!-- sub -->\n'
+			u' <!ATTLIST b k CDATA "d">\n]>\n<a>\n  <b k="d">x</b>\n</a>')
+		self.assertEqual(xml2json_core.reformat_xml(
+			u'<!DOCTYPE a SYSTEM "a.dtd"><a/>'), u'<!DOCTYPE a SYSTEM "a.dtd">\n<a/>')
+
+	def test_xml_declaration(self):
+		self.assertEqual(xml2json_core.reformat_xml(
+			u'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><a><b/></a>'),
+			u'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<a>\n  <b/>\n</a>')
+		# only if there is one; bytes are read in the declared encoding
+		self.assertEqual(xml2json_core.reformat_xml(u'<a><b/></a>'), u'<a>\n  <b/>\n</a>')
+		doc = u'<?xml version="1.0" encoding="ISO-8859-1"?><a><b>café</b></a>'
+		self.assertEqual(xml2json_core.reformat_xml(doc.encode('latin-1')),
+			u'<?xml version="1.0" encoding="ISO-8859-1"?>\n<a>\n  <b>café</b>\n</a>')
+
+	def test_mixed_content(self):
+		doc = u'<a><p>Some <b>bold</b> and <i> <x/> </i>.</p><q> <r/> </q></a>'
+		self.assertEqual(xml2json_core.reformat_xml(doc),
+			u'<a>\n  <p>Some <b>bold</b> and <i> <x/> </i>.</p>\n  <q>\n    <r/>\n  </q>\n</a>')
+		self.assertEqual(xml2json_core.reformat_xml(doc, indent=u'\t'),
+			u'<a>\n\t<p>Some <b>bold</b> and <i> <x/> </i>.</p>\n\t<q>\n\t\t<r/>\n\t</q>\n</a>')
+
+	def test_text_is_escaped(self):
+		self.assertEqual(xml2json_core.reformat_xml(
+			u'<a><b k="&quot;&lt;">x&#13;y &amp; &lt;z&gt;</b></a>'),
+			u'<a>\n  <b k=\'"&lt;\'>x&#13;y &amp; &lt;z&gt;</b>\n</a>')
+
+	def test_space_preserve(self):
+		doc = u'<a><pre xml:space="preserve">  <b> <c/> </b>\n</pre><d> <e/> </d></a>'
+		self.assertEqual(xml2json_core.reformat_xml(doc),
+			u'<a>\n  <pre xml:space="preserve">  <b> <c/> </b>\n</pre>\n'
+			u'  <d>\n    <e/>\n  </d>\n</a>')
+		self.assertEqual(xml2json_core.reformat_xml(
+			u'<a xml:space="preserve"><b/> <c/></a>'), u'<a xml:space="preserve"><b/> <c/></a>')
+
+	def test_empty_tag_styles(self):
+		doc = u'<a><b/><c></c><d x="1"/><e> </e></a>'
+		for style, expected, root in (
+			('compact', u'<a>\n  <b/>\n  <c/>\n  <d x="1"/>\n  <e/>\n</a>', u'<a/>'),
+			('expanded', u'<a>\n  <b></b>\n  <c></c>\n  <d x="1"></d>\n  <e></e>\n</a>',
+				u'<a></a>'),
+			('spaced', u'<a>\n  <b />\n  <c />\n  <d x="1" />\n  <e />\n</a>', u'<a />'),
+		):
+			self.assertEqual(xml2json_core.reformat_xml(doc, empty_tag_style=style),
+				expected, style)
+			self.assertEqual(xml2json_core.reformat_xml(u'<a/>', empty_tag_style=style),
+				root, style)
+
+	def test_lookahead(self):
+		xml2json_core._REFORMAT_LOOKAHEAD = 32
+		# text seen within the lookahead keeps the element as it is
+		doc = u'<a><p>' + u'<b>x</b>' * 3 + u'tail</p></a>'
+		self.assertEqual(xml2json_core.reformat_xml(doc),
+			u'<a>\n  <p>' + u'<b>x</b>' * 3 + u'tail</p>\n</a>')
+		# text past it is left where it is in an element that was indented
+		doc = u'<a><p>' + u'<b>x</b>' * 30 + u'tail</p><q><b/>t</q></a>'
+		reformatted = xml2json_core.reformat_xml(doc)
+		self.assertEqual(reformatted, u'<a>\n  <p>' + u''.join(
+			u'\n    <b>x</b>' for _ in range(30)) + u'tail\n  </p>\n  <q><b/>t</q>\n</a>')
+		self.assertEqual(xmltodict.parse(reformatted), xmltodict.parse(doc))
+
+	def test_output_stream(self):
+		rnd = random.Random(212)
+		for _ in range(100):
+			doc = with_markup(rnd, random_document(rnd))
+			output = io.StringIO()
+			self.assertIsNone(xml2json_core.reformat_xml(doc, output))
+			self.assertEqual(output.getvalue(), xml2json_core.reformat_xml(doc))
+
+
+if __name__ == '__main__':
+	unittest.main()
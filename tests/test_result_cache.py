@@ -0,0 +1,158 @@
+"""
+ResultCache eviction and size accounting, and the settings that go into
+its keys.
+"""
+import random
+import sys
+import unittest
+
+import documents  # noqa: F401 (puts the package on sys.path)
+
+import xml2json_core
+from xml2json_core import ConversionSettings, ResultCache
+
+
+def result(n, length=100):
+	# a different string of the same size for every n
+	return u'%08d' % n + u'x' * (length - 8)
+
+
+class ResultCacheTest(unittest.TestCase):
+
+	def test_least_recently_used_go_first(self):
+		size = sys.getsizeof(result(0))
+		cache = ResultCache(size * 3)
+		for n in range(3):
+			cache.put(n, result(n))
+		self.assertEqual(cache.get(0), result(0))
+		cache.put(3, result(3))
+		# 1 was used least recently
+		self.assertIsNone(cache.get(1))
+		self.assertEqual(list(cache.entries), [2, 0, 3])
+		cache.put(2, result(2))
+		cache.put(4, result(4))
+		self.assertEqual(list(cache.entries), [3, 2, 4])
+		self.assertEqual(cache.size, size * 3)
+
+	def test_matches_a_model(self):
+		rnd = random.Random(151)
+		cache = ResultCache(4000)
+		# key -> size, least recently used first
+		model = []
+		for _ in range(5000):
+			key = rnd.randrange(30)
+			sizes = dict(model)
+			if rnd.random() < 0.5:
+				value = result(key, rnd.choice((10, 200, 1000, 5000)))
+				cache.put(key, value)
+				model = [entry for entry in model if entry[0] != key]
+				size = sys.getsizeof(value)
+				if size <= cache.max_bytes:
+					model.append((key, size))
+				while sum(size for _, size in model) > cache.max_bytes:
+					model.pop(0)
+			elif rnd.random() < 0.05:
+				max_bytes = rnd.choice((0, 1000, 4000, 20000))
+				cache.resize(max_bytes)
+				while sum(size for _, size in model) > max_bytes:
+					model.pop(0)
+			else:
+				got = cache.get(key)
+				if key in sizes:
+					self.assertEqual(got[:8], u'%08d' % key)
+					model = [entry for entry in model if entry[0] != key] + \
+						[(key, sizes[key])]
+				else:
+					self.assertIsNone(got)
+			self.assertEqual(list(cache.entries), [key for key, _ in model])
+			self.assertEqual(cache.size, sum(size for _, size in model))
+			self.assertLessEqual(cache.size, cache.max_bytes)
+
+	def test_too_large_results_are_not_kept(self):
+		cache = ResultCache(1000)
+		cache.put('a', result(0))
+		cache.put('a', result(0, 2000))
+		self.assertIsNone(cache.get('a'))
+		self.assertEqual(cache.size, 0)
+
+	def test_hits_and_misses(self):
+		cache = ResultCache(1 << 20)
+		cache.put('a', u'x')
+		cache.get('a')
+		cache.get('b')
+		cache.get('a')
+		self.assertEqual((cache.hits, cache.misses), (2, 1))
+		cache.clear()
+		self.assertEqual((len(cache.entries), cache.size), (0, 0))
+
+	def test_zero_megabytes_turns_it_off(self):
+		settings = ConversionSettings.load(
+			lambda key, default: 0 if key == 'result_cache_mb' else default)
+		self.assertEqual(settings.result_cache_mb, 0)
+		cache = ResultCache(settings.result_cache_mb << 20)
+		cache.put('a', u'')
+		self.assertIsNone(cache.get('a'))
+		cache = ResultCache(1 << 20)
+		cache.put('a', u'x')
+		cache.resize(settings.result_cache_mb << 20)
+		self.assertIsNone(cache.get('a'))
+		self.assertEqual(cache.size, 0)
+
+	def test_keys(self):
+		key = ResultCache.key
+		self.assertEqual(key(u'caf\xe9', 'json'), key(u'caf\xe9', 'json'))
+		# text is hashed as UTF-8
+		self.assertEqual(key(u'caf\xe9')[0], key(u'caf\xe9'.encode('utf-8'))[0])
+		self.assertNotEqual(key(u'a', 'json'), key(u'b', 'json'))
+		self.assertNotEqual(key(u'a', 'json'), key(u'a', 'xml'))
+		# lone surrogates from a broken buffer do not raise
+		self.assertNotEqual(key(u'\ud800'), key(u'\udc00'))
+
+
+class OutputKeyTest(unittest.TestCase):
+
+	# a value other than the default for every setting that is not a bool
+	changed = {
+		'json_indent': 4,
+		'xml_indent': '\t',
+		'value_key': '#text',
+		'root_name': 'doc',
+		'json_lines_records': '/root/*/*',
+		'empty_tag_style': 'spaced',
+		'line_ending': '\r\n',
+		'background_conversion_min_size': 0,
+		'parallel_conversion_min_size': 1 << 30,
+		'spill_text_min_size': 1 << 10,
+		'live_preview_delay': 0,
+		'result_cache_mb': 0,
+	}
+
+	def test_every_output_setting_changes_the_key(self):
+		settings = ConversionSettings()
+		for name in ConversionSettings.__slots__:
+			value = getattr(settings, name)
+			if isinstance(value, bool):
+				other = not value
+			else:
+				other = self.changed[name]
+			self.assertNotEqual(value, other, name)
+			changed = settings.replace(**{name: other})
+			if name in ConversionSettings._runtime_fields:
+				self.assertEqual(changed.output_key(), settings.output_key(), name)
+			else:
+				self.assertNotEqual(changed.output_key(), settings.output_key(), name)
+
+	def test_runtime_settings_exist(self):
+		self.assertLessEqual(ConversionSettings._runtime_fields,
+			set(ConversionSettings.__slots__))
+
+	def test_key_is_hashable_and_stable(self):
+		settings = ConversionSettings.load(lambda key, default: default)
+		self.assertEqual(hash(settings.output_key()),
+			hash(ConversionSettings().output_key()))
+		self.assertEqual(xml2json_core.ResultCache.key(u'x', 'json', settings.output_key()),
+			xml2json_core.ResultCache.key(u'x', 'json', ConversionSettings().output_key()))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,72 @@
+"""
+Streaming XML to JSON against json.dumps() of the xmltodict tree.
+"""
+import io
+import json
+import random
+import unittest
+
+from documents import random_document
+
+import xmltodict
+import xml2json_core
+
+
+def tree_json(xml_text, indent=2, ensure_ascii=False, normalize=True):
+	tree = xmltodict.parse(xml_text.encode('utf-8'))
+	if normalize:
+		tree = xml2json_core.apply_attr_text_normalization(tree)
+	return json.dumps(tree, indent=indent, ensure_ascii=ensure_ascii,
+		separators=xml2json_core.PRETTY_SEPARATORS if indent is not None else None)
+
+
+class StreamTest(unittest.TestCase):
+
+	def test_random_documents_match_tree(self):
+		rnd = random.Random(1)
+		for _ in range(1500):
+			doc = random_document(rnd)
+			for indent in (2, None):
+				for normalize in (True, False):
+					expected = tree_json(doc, indent, False, normalize)
+					got = xml2json_core.xml_to_json(doc, pretty=indent is not None,
+						indent=indent, normalize=normalize)
+					self.assertEqual(got, expected, doc)
+
+	def test_stream_handler_matches_or_falls_back(self):
+		rnd = random.Random(2)
+		streamed = 0
+		for _ in range(1500):
+			doc = random_document(rnd)
+			ensure_ascii = rnd.random() < 0.3
+			out = io.StringIO()
+			try:
+				xml2json_core.xml_to_json_stream(doc, out.write, 2, ensure_ascii)
+			except xml2json_core.StreamFallback:
+				continue
+			streamed += 1
+			self.assertEqual(out.getvalue(), tree_json(doc, 2, ensure_ascii), doc)
+		# most documents have to go the streaming way for this to mean much
+		self.assertGreater(streamed, 1000)
+
+	def test_writes_to_output(self):
+		doc = u'<root><r a="1">x</r><r a="2"/><s>café</s></root>'
+		out = io.StringIO()
+		self.assertIsNone(xml2json_core.xml_to_json(doc, out))
+		self.assertEqual(out.getvalue(), tree_json(doc))
+
+	def test_sort_keys_uses_the_tree(self):
+		doc = u'<root><b>1</b><a>2</a></root>'
+		self.assertEqual(xml2json_core.xml_to_json(doc, sort_keys=True),
+			json.dumps(json.loads(tree_json(doc)), indent=2, sort_keys=True,
+				ensure_ascii=False, separators=xml2json_core.PRETTY_SEPARATORS))
+
+	def test_deep_nesting(self):
+		doc = u'<a>' * 5000 + u'x' + u'</a>' * 5000
+		# deeper than json.dumps() or json.loads() could go
+		self.assertEqual(xml2json_core.xml_to_json(doc, pretty=False),
+			'{"a": ' * 5000 + '"x"' + '}' * 5000)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,59 @@
+"""
+Element text collected in pieces and spilled to a temporary file, against
+keeping it in memory as one string.
+"""
+import random
+import unittest
+
+import documents  # noqa: F401 (puts the package on sys.path)
+
+import xmltodict
+import xml2json_core
+
+
+def pieces(rnd, count):
+	# text broken up by empty elements, so expat reports it in many pieces
+	return u'<br/>'.join(rnd.choice((u'  ', u'é\U0001f600', u'x' * 1000, u'\n\t', u'"\\'))
+		for _ in range(count))
+
+
+class SpillTest(unittest.TestCase):
+
+	def check(self, doc):
+		for pretty in (True, False):
+			for ensure_ascii in (False, True):
+				for normalize in (True, False):
+					options = dict(pretty=pretty, ensure_ascii=ensure_ascii, normalize=normalize)
+					self.assertEqual(
+						xml2json_core.xml_to_json(doc, spill_size=2000, **options),
+						xml2json_core.xml_to_json(doc, spill_size=0, **options))
+
+	def test_collected_elements(self):
+		rnd = random.Random(41)
+		for count in (64, 200, 500):
+			self.check(u'<doc><name>n</name><payload type="b64">{}</payload></doc>'.format(
+				pieces(rnd, count)))
+
+	def test_streamed_elements(self):
+		rnd = random.Random(42)
+		# the text of the document element and of a streamed record
+		self.check(u'<doc><r/><r/>{}</doc>'.format(pieces(rnd, 300)))
+		self.check(u'<doc><r><x/><x/>{}</r><r/></doc>'.format(pieces(rnd, 300)))
+
+	def test_blank_text(self):
+		self.check(u'<doc><p a="1">{}</p><p/></doc>'.format(u'<br/>'.join([u' \n'] * 300)))
+
+	def test_spilled_text_is_written(self):
+		text = u'x' * 1000
+		doc = u'<doc><p>{}</p></doc>'.format(u'<br/>'.join([text] * 128))
+		handler = xml2json_core._JSONStreamHandler(lambda text: None, spill_size=1000)
+		xmltodict._make_parser(handler).Parse(doc.encode('utf-8'), True)
+		self.assertTrue(handler.collector.spilled)
+
+	def test_pieces_join_with_separator(self):
+		self.assertEqual(xmltodict.parse(u'<a>x<b/>y<b/>z</a>', cdata_separator=u'|'),
+			{'a': {'b': [None, None], '#text': u'x|y|z'}})
+
+
+if __name__ == '__main__':
+	unittest.main()
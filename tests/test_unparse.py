@@ -0,0 +1,57 @@
+"""
+xmltodict.unparse(emitter='direct') against the XMLGenerator emitter.
+"""
+import random
+import unittest
+
+import documents  # noqa: F401 (puts the package on sys.path)
+
+import xmltodict
+
+VALUES = (u'', u'text', u'a & b <c>', u'q"\n\t\'', u'café', True, False, 0, 1,
+	1.5, None, b'bytes', b'caf\xc3\xa9')
+KEYS = ('a', 'b', '@x', '@y', '#text')
+
+
+def random_tree(rnd, depth=0):
+	choice = rnd.random()
+	if depth > 3 or choice < 0.3:
+		return rnd.choice(VALUES)
+	if choice < 0.5:
+		return [random_tree(rnd, depth + 1) for _ in range(rnd.randint(1, 3))]
+	return dict((key, random_tree(rnd, depth + 1))
+		for key in rnd.sample(KEYS, rnd.randint(0, 4)))
+
+def unparse(tree, emitter, **options):
+	try:
+		return xmltodict.unparse(tree, emitter=emitter, **options)
+	except Exception as e:
+		return type(e)
+
+
+class DirectEmitterTest(unittest.TestCase):
+
+	def test_random_trees_match_sax(self):
+		rnd = random.Random(31)
+		option_sets = ({}, {'pretty': True}, {'full_document': False},
+			{'empty_tag_style': 'expanded'}, {'pretty': True, 'empty_tag_style': 'spaced'})
+		for _ in range(3000):
+			tree = {'root': random_tree(rnd)}
+			for options in option_sets:
+				self.assertEqual(unparse(tree, 'direct', **options),
+					unparse(tree, 'sax', **options), (tree, options))
+
+	def test_non_strings_are_rejected_like_sax(self):
+		for tree in ({'a': {'@id': False}}, {'a': {'@id': 1}}, {'a': {'#text': True}}):
+			self.assertEqual(unparse(tree, 'sax'), unparse(tree, 'direct'))
+			self.assertTrue(isinstance(unparse(tree, 'direct'), type), tree)
+
+	def test_generators_are_streamed(self):
+		items = (str(index) for index in range(3))
+		self.assertEqual(
+			xmltodict.unparse({'root': {'item': items}}, full_document=False, emitter='direct'),
+			u'<root><item>0</item><item>1</item><item>2</item></root>')
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,3683 @@
+"""
+Sublime-independent conversion core for the xml2json package.
+
+Everything in here works on plain strings, bytes and writers so it can be
+used from the plugin commands as well as from a plain Python interpreter.
+"""
+import codecs
+import fnmatch
+import hashlib
+import io
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+
+try:
+	from concurrent.futures import ProcessPoolExecutor, as_completed
+except ImportError:
+	ProcessPoolExecutor = None
+
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+try:
+	from . import xmltodict
+except (ImportError, ValueError):
+	import xmltodict
+
+if sys.version_info >= (2, 7):
+	from collections import OrderedDict
+	import json
+else:
+	from ordereddict import OrderedDict
+	import simplejson as json
+
+if sys.version_info >= (3, 7):
+	# built-in dicts keep their insertion order, and are smaller and faster
+	_ordered_dict = dict
+	_object_pairs_hook = None
+else:
+	_ordered_dict = OrderedDict
+	_object_pairs_hook = OrderedDict
+
+try:
+	from io import StringIO
+except ImportError:
+	from StringIO import StringIO
+
+try:
+	_basestring = basestring
+except NameError:
+	_basestring = str
+try:
+	_unicode = unicode
+except NameError:
+	_unicode = str
+
+# bytes handed to expat per Parse() call when progress is reported
+CHUNK_SIZE = 1 << 20
+
+# item/key separators for indented JSON; the default ', ' of older Pythons
+# leaves a blank at the end of every line
+PRETTY_SEPARATORS = (',', ': ')
+
+# characters of text an element may collect before xml_to_json() moves it
+# to a temporary file by default (see _SpilledText)
+SPILL_TEXT_SIZE = 1 << 24
+
+# strings the intern table of a kept tree holds at most (element names,
+# attribute keys and values), and the longest values and texts put in it;
+# see xmltodict.parse(intern_limit=...)
+INTERN_LIMIT = 1 << 16
+INTERN_VALUE_LENGTH = 32
+
+# the records xml_to_ndjson() writes by default: the children of the
+# document element
+NDJSON_RECORDS = '/*/*'
+
+
+class ConversionCancelled(Exception):
+	"""
+	Raised from a progress callback to abort a running conversion.
+	"""
+	pass
+
+
+class StreamFallback(Exception):
+	"""
+	Raised by the streaming XML to JSON engine when the document needs a shape
+	it cannot produce without looking back at output it already wrote (e.g. an
+	attribute and a child element sharing a name). Callers should rerun the
+	conversion on the tree path.
+	"""
+	pass
+
+
+def _setting_bool(value):
+	if isinstance(value, _basestring):
+		value = value.strip().lower()
+		if value in ('true', '1', 'yes', 'on', 'pretty', 'enable', 'enabled'):
+			return True
+		if value in ('false', '0', 'no', 'off', 'compact', 'disable', 'disabled'):
+			return False
+	return bool(value)
+
+def _setting_indent(value):
+	try:
+		value = int(value)
+		if value < 0:
+			value = 2
+	except Exception:
+		value = 2
+	return value
+
+def _setting_name(value, default):
+	if not isinstance(value, _basestring):
+		return default
+	return value.strip() or default
+
+def _setting_empty_tag_style(value):
+	if isinstance(value, _basestring):
+		value = value.strip().lower()
+	if value not in ('compact', 'spaced', 'expanded'):
+		value = 'compact'
+	return value
+
+def _setting_pretty(value):
+	if isinstance(value, _basestring):
+		value = value.strip().lower()
+		if value == 'compact':
+			return False
+		if value == 'pretty':
+			return True
+	return bool(value)
+
+def _setting_line_ending(value):
+	if isinstance(value, _basestring):
+		value = value.strip().lower()
+		if value in ('lf', '\\n', 'unix'):
+			return '\n'
+		if value in ('crlf', '\\r\\n', 'windows'):
+			return '\r\n'
+		if value in ('cr', '\\r', 'mac'):
+			return '\r'
+	return None
+
+def _setting_size(value, default):
+	try:
+		return int(value)
+	except Exception:
+		return default
+
+
+class ConversionSettings(object):
+	"""
+	Immutable snapshot of the xml2json settings, parsed once and shared by
+	everything a command (or a batch of files) does. Build one from a
+	settings object with ConversionSettings.load(settings.get); keyword
+	arguments override single values and omitted ones take the defaults.
+	"""
+	# name -> (settings key, default raw value, parser)
+	_fields = OrderedDict([
+		('json_indent', ('pretty_json_indent', 2, _setting_indent)),
+		('xml_indent', ('pretty_xml_indent', 2, lambda v: ' ' * _setting_indent(v))),
+		('ensure_ascii', ('json_ensure_ascii', False, _setting_bool)),
+		('sort_keys', ('json_sort_keys', False, _setting_bool)),
+		('normalize', ('normalize_attribute_text_pairs', True, _setting_bool)),
+		('value_key', ('attribute_text_value_key', 'value', lambda v: _setting_name(v, 'value'))),
+		('root_name', ('default_xml_root_name', 'root', lambda v: _setting_name(v, 'root'))),
+		('json_lines_records', ('json_lines_records', NDJSON_RECORDS,
+			lambda v: _setting_name(v, NDJSON_RECORDS))),
+		('empty_tag_style', ('empty_tag_style', 'compact', _setting_empty_tag_style)),
+		('pretty', ('default_conversion_pretty', True, _setting_pretty)),
+		('xml_declaration', ('include_xml_declaration', True, _setting_bool)),
+		('line_ending', ('line_ending', 'auto', _setting_line_ending)),
+		('ensure_final_newline', ('ensure_final_newline', True, _setting_bool)),
+		('trim_trailing_whitespace', ('trim_trailing_whitespace', True, _setting_bool)),
+		('background_conversion', ('background_conversion', True, _setting_bool)),
+		('background_conversion_min_size', ('background_conversion_min_size', 262144,
+			lambda v: _setting_size(v, 262144))),
+		('parallel_conversion_min_size', ('parallel_conversion_min_size', 0,
+			lambda v: _setting_size(v, 0))),
+		('spill_text_min_size', ('spill_text_min_size', SPILL_TEXT_SIZE,
+			lambda v: _setting_size(v, SPILL_TEXT_SIZE))),
+		('live_preview_delay', ('live_preview_delay', 300, lambda v: _setting_size(v, 300))),
+		('instrument', ('stage_timings', False, _setting_bool)),
+		('instrument_memory', ('stage_timings_memory', False, _setting_bool)),
+		('result_cache_mb', ('result_cache_mb', 32, lambda v: _setting_size(v, 32))),
+	])
+	__slots__ = tuple(_fields)
+	# settings that change how a conversion runs but not what it produces
+	_runtime_fields = frozenset(['background_conversion', 'background_conversion_min_size',
+		'parallel_conversion_min_size', 'spill_text_min_size', 'live_preview_delay',
+		'instrument', 'instrument_memory', 'result_cache_mb'])
+
+	def __init__(self, **values):
+		for name, (key, default, parse) in self._fields.items():
+			object.__setattr__(self, name, values.pop(name) if name in values else parse(default))
+		if values:
+			raise TypeError('unknown settings: ' + ', '.join(sorted(values)))
+
+	@classmethod
+	def load(cls, get):
+		"""
+		Parse every setting through `get(key, default)`, e.g. Settings.get.
+		"""
+		values = {}
+		for name, (key, default, parse) in cls._fields.items():
+			values[name] = parse(get(key, default))
+		return cls(**values)
+
+	def replace(self, **changes):
+		"""
+		Copy of this snapshot with some values replaced.
+		"""
+		values = dict((name, getattr(self, name)) for name in self.__slots__)
+		values.update(changes)
+		return type(self)(**values)
+
+	def output_key(self):
+		"""
+		Hashable tuple of the values that can change a conversion's result.
+		"""
+		return tuple(getattr(self, name) for name in self.__slots__
+			if name not in self._runtime_fields)
+
+	def __setattr__(self, name, value):
+		raise AttributeError('ConversionSettings is read-only')
+
+	def __delattr__(self, name):
+		raise AttributeError('ConversionSettings is read-only')
+
+	def __reduce__(self):
+		# the default slot pickling would go through the blocked __setattr__
+		return (_rebuild_settings, (tuple(getattr(self, name) for name in self.__slots__),))
+
+	def __eq__(self, other):
+		return type(other) is type(self) and all(
+			getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __hash__(self):
+		return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+	def __repr__(self):
+		return 'ConversionSettings({})'.format(', '.join(
+			'{}={!r}'.format(name, getattr(self, name)) for name in self.__slots__))
+
+def _rebuild_settings(values):
+	return ConversionSettings(**dict(zip(ConversionSettings.__slots__, values)))
+
+
+class Timings(object):
+	"""
+	Wall time, input/output size and optionally peak allocations (with
+	tracemalloc) of the stages of one conversion:
+
+		with timings.stage('parse', len(text)) as stage:
+			tree = parse(text)
+			stage.size_out = ...
+
+	Sizes are in characters, or bytes for byte input.
+	"""
+	def __init__(self, memory=False):
+		self.stages = []
+		self.memory = memory and tracemalloc is not None
+
+	def stage(self, name, size_in=None):
+		return _Stage(self, name, size_in)
+
+	def total(self):
+		return sum(stage.seconds for stage in self.stages)
+
+	def grouped(self):
+		"""
+		Stages with the same name (e.g. from several selections) added up,
+		in the order they first ran.
+		"""
+		groups = OrderedDict()
+		for stage in self.stages:
+			group = groups.get(stage.name)
+			if group is None:
+				group = groups[stage.name] = _Stage(self, stage.name, 0)
+				group.size_out = 0
+			group.seconds += stage.seconds
+			group.size_in = _add_size(group.size_in, stage.size_in)
+			group.size_out = _add_size(group.size_out, stage.size_out)
+			if stage.peak is not None:
+				group.peak = max(group.peak or 0, stage.peak)
+		return list(groups.values())
+
+	def summary(self):
+		"""
+		One line like 'stream 1.20s 5.1MB->6.3MB, newlines 0.05s'.
+		"""
+		return ', '.join(str(stage) for stage in self.grouped())
+
+def _add_size(total, size):
+	if total is None or size is None:
+		return None
+	return total + size
+
+def _format_size(size):
+	if size >= 1e5:
+		return '{:.1f}MB'.format(size / 1e6)
+	if size >= 1e3:
+		return '{:.1f}KB'.format(size / 1e3)
+	return '{}B'.format(size)
+
+class _Stage(object):
+	__slots__ = ('timings', 'name', 'size_in', 'size_out', 'seconds', 'peak', 'started', 'traced')
+
+	def __init__(self, timings, name, size_in=None):
+		self.timings = timings
+		self.name = name
+		self.size_in = size_in
+		self.size_out = None
+		self.seconds = 0.0
+		self.peak = None
+
+	def __enter__(self):
+		self.traced = False
+		if self.timings.memory:
+			if tracemalloc.is_tracing():
+				if hasattr(tracemalloc, 'reset_peak'):
+					tracemalloc.reset_peak()
+			else:
+				tracemalloc.start()
+				self.traced = True
+		self.started = time.time()
+		return self
+
+	def __exit__(self, *exc_info):
+		self.seconds = time.time() - self.started
+		if self.timings.memory:
+			self.peak = tracemalloc.get_traced_memory()[1]
+			if self.traced:
+				tracemalloc.stop()
+		self.timings.stages.append(self)
+		return False
+
+	def __str__(self):
+		text = '{} {:.2f}s'.format(self.name, self.seconds)
+		if self.size_in is not None and self.size_out is not None:
+			text += ' {}->{}'.format(_format_size(self.size_in), _format_size(self.size_out))
+		elif self.size_in is not None:
+			text += ' ' + _format_size(self.size_in)
+		elif self.size_out is not None:
+			text += ' ->' + _format_size(self.size_out)
+		if self.peak is not None:
+			text += ' peak ' + _format_size(self.peak)
+		return text
+
+class _NoStage(object):
+	"""
+	Stand-in for _Stage when a conversion is not being timed.
+	"""
+	size_out = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		return False
+
+	def __setattr__(self, name, value):
+		pass
+
+_NO_STAGE = _NoStage()
+
+def timed(timings, name, size_in=None):
+	"""
+	timings.stage(name, size_in), or a no-op when `timings` is None.
+	"""
+	if timings is None:
+		return _NO_STAGE
+	return timings.stage(name, size_in)
+
+
+# lone surrogates can end up in str from a view; Python 2 encodes them as is
+_SURROGATES = 'surrogatepass' if sys.version_info[0] >= 3 else 'strict'
+
+class ResultCache(object):
+	"""
+	The most recently used conversion results, keyed on a hash of the
+	source text plus whatever else decides the result (command, settings),
+	and bounded by the memory the cached results take. Shared between
+	threads:
+
+		key = cache.key(text, 'pretty json', settings.output_key())
+		result = cache.get(key)
+		if result is None:
+			result = convert(text)
+			cache.put(key, result)
+	"""
+	def __init__(self, max_bytes):
+		self.max_bytes = max_bytes
+		# key -> (result, size), least recently used first
+		self.entries = OrderedDict()
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self.lock = threading.Lock()
+
+	@staticmethod
+	def key(text, *extra):
+		if isinstance(text, _unicode):
+			data = text.encode('utf-8', _SURROGATES)
+		else:
+			data = text
+		return (hashlib.sha1(data).digest(), len(text)) + extra
+
+	def get(self, key):
+		with self.lock:
+			entry = self.entries.pop(key, None)
+			if entry is None:
+				self.misses += 1
+				return None
+			self.entries[key] = entry
+			self.hits += 1
+			return entry[0]
+
+	def put(self, key, result):
+		size = sys.getsizeof(result)
+		with self.lock:
+			entry = self.entries.pop(key, None)
+			if entry is not None:
+				self.size -= entry[1]
+			if size > self.max_bytes:
+				return
+			self.entries[key] = (result, size)
+			self.size += size
+			self._evict()
+
+	def resize(self, max_bytes):
+		with self.lock:
+			self.max_bytes = max_bytes
+			self._evict()
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+			self.size = 0
+
+	def _evict(self):
+		while self.size > self.max_bytes:
+			result, size = self.entries.popitem(last=False)[1]
+			self.size -= size
+
+	def __str__(self):
+		return '{} hits, {} misses, {} results {} of {}'.format(
+			self.hits, self.misses, len(self.entries),
+			_format_size(self.size), _format_size(self.max_bytes))
+
+
+def _normalize_value(current, value_key, is_list_item=False):
+	# Base case: primitive types (str, int, none, etc.) return as is
+	if not isinstance(current, (dict, list)):
+		return current
+
+	# Walk with a stack instead of recursing, so any nesting depth works.
+	# Every container is copied before its children are done: they are
+	# (node, is_list_item, target, slot) tasks that fill target[slot].
+	result = [None]
+	tasks = [(current, is_list_item, result, 0)]
+	while tasks:
+		current, is_list_item, target, slot = tasks.pop()
+
+		# --- CASE 1: Processing a LIST of items (Siblings) ---
+		if isinstance(current, list):
+			# Check Condition 1: Do any siblings have text?
+			siblings_have_text = False
+			for item in current:
+				if isinstance(item, dict) and '#text' in item:
+					siblings_have_text = True
+					break
+
+			new_list = target[slot] = []
+			for item in current:
+				# Apply Condition 1 Logic:
+				# If we are in a mixed list (some have text), force empty strings on the others for consistency.
+				if isinstance(item, dict) and siblings_have_text:
+					attr_keys = [k for k in item.keys() if k.startswith('@')]
+					child_keys = [k for k in item.keys() if not k.startswith('@') and k != '#text']
+					has_text = '#text' in item
+
+					# Only force if it's an "empty leaf" (has attrs, no children, no text)
+					if attr_keys and not child_keys and not has_text:
+						item = item.copy()
+						item['#text'] = ""
+
+				if isinstance(item, (dict, list)):
+					# Normalize with flag indicating this came from a list
+					tasks.append((item, True, new_list, len(new_list)))
+				new_list.append(item)
+			continue
+
+		# --- CASE 2: Processing a DICT (Single Item) ---
+		new_dict = target[slot] = _ordered_dict()
+
+		# Analyze the node structure
+		attr_keys = [k for k in current.keys() if k.startswith('@')]
+		child_keys = [k for k in current.keys() if not k.startswith('@') and k != '#text']
+		has_text = '#text' in current
+
+		# --- Fix: Handle Consistency for Empty Tags ---
+		if attr_keys and not child_keys and not has_text:
+			should_force_text = False
+
+			# Condition 2: Single Node Logic (No Siblings)
+			# If this is NOT a list item, we look for "Single Attribute" heuristic.
+			# e.g., <item key="val"/> -> likely a key-value pair.
+			# e.g., <item id="1" type="bool"/> -> likely just an object.
+			if not is_list_item:
+				if len(attr_keys) == 1:
+					should_force_text = True
+
+			# Note: If is_list_item is True, we rely entirely on the LIST block above.
+			# If the LIST block didn't add #text, it means no siblings had text, so we don't add it here.
+
+			if should_force_text:
+				has_text = True
+				current = current.copy()
+				current['#text'] = ""
+
+		# --- Conflict Detection ---
+		conflict = False
+		if has_text:
+			for k in attr_keys:
+				if k[1:] == value_key:
+					conflict = True
+					break
+
+		children = []
+		for key, val in current.items():
+			if conflict:
+				# Keep structure on conflict
+				new_dict[key] = val
+				children.append((key, val))
+			else:
+				# Flatten
+				if key == '#text':
+					new_dict[value_key] = val
+				elif key.startswith('@'):
+					new_dict[key[1:]] = val
+				else:
+					# Children are new contexts, not list items of THIS node
+					new_dict[key] = val
+					children.append((key, val))
+		for key, val in children:
+			# skip values a later flattened key replaced
+			if isinstance(val, (dict, list)) and new_dict[key] is val:
+				tasks.append((val, False, new_dict, key))
+
+	return result[0]
+
+def apply_attr_text_normalization(node, value_key='value'):
+	"""
+	Smartly flattens xmltodict structure.
+	1. Flattens attributes ("@key" -> "key") and text ("#text" -> configurable value key).
+	2. Handles conflicts: if <tag value="100">text</tag>, keeps original structure to save data.
+	3. Smart Empty Tag Handling:
+	   - If inside a list: checks siblings. If ANY sibling has text, forces text="" for consistency.
+	     If NO siblings have text, leaves them as pure objects.
+	   - If single node: checks attributes. If exactly 1 attribute (e.g. <item name="x"/>), forces text="".
+	"""
+	return _normalize_value(node, value_key)
+
+
+try:
+	_RecursionError = RecursionError
+except NameError:
+	_RecursionError = RuntimeError
+
+_END = object()
+
+def _encode_walk(value, level, append, encode_string, newline, item_separator,
+	key_separator, sort_keys=False, encode_other=json.dumps):
+	"""
+	Pass the JSON for `value` to `append` laid out like json.dumps() does,
+	with newline(level) giving the line break and indent before a `level`
+	deep item ('' when compact). Walks with a stack of open containers
+	instead of recursing, so nesting depth is only limited by memory and a
+	token costs the same at any depth.
+	"""
+	# (items, is_dict, separator, closing) per open container
+	stack = []
+	while True:
+		if isinstance(value, _basestring):
+			append(encode_string(value))
+		elif value is None:
+			append('null')
+		elif value is True:
+			append('true')
+		elif value is False:
+			append('false')
+		elif type(value) is int:
+			append(int.__repr__(value))
+		elif isinstance(value, (dict, list, tuple)) and value:
+			is_dict = isinstance(value, dict)
+			level += 1
+			if is_dict:
+				items = iter(sorted(value.items()) if sort_keys else value.items())
+				append('{' + newline(level))
+				closing = newline(level - 1) + '}'
+			else:
+				items = iter(value)
+				append('[' + newline(level))
+				closing = newline(level - 1) + ']'
+			stack.append((items, is_dict, item_separator + newline(level), closing))
+			# the first item goes without a separator
+			value = next(items)
+			if is_dict:
+				key, value = value
+				if not isinstance(key, _basestring):
+					key = encode_other(key)
+				append(encode_string(key) + key_separator)
+			continue
+		elif isinstance(value, dict):
+			append('{}')
+		elif isinstance(value, (list, tuple)):
+			append('[]')
+		elif type(value) is _SpilledText:
+			value.write_json(append, encode_string)
+		else:
+			append(encode_other(value))
+
+		# the value is done: move on to the next item of the innermost
+		# container that has one, closing the finished ones
+		while stack:
+			items, is_dict, separator, closing = stack[-1]
+			value = next(items, _END)
+			if value is _END:
+				stack.pop()
+				level -= 1
+				append(closing)
+				continue
+			if is_dict:
+				key, value = value
+				if not isinstance(key, _basestring):
+					key = encode_other(key)
+				append(separator + encode_string(key) + key_separator)
+			else:
+				append(separator)
+			break
+		else:
+			return
+
+def _json_encoder(indent=None, ensure_ascii=False, sort_keys=False,
+	separators=None):
+	"""
+	(encode, newline, item_separator) for dumps_json() with these arguments:
+	encode(value, level, append) passes the JSON for `value` to `append`,
+	laid out as an item `level` deep.
+	"""
+	# json's own defaults for the separators, which depend on the version
+	encoder = json.JSONEncoder(indent=indent, separators=separators)
+	if indent is None:
+		newline = lambda level: ''
+	else:
+		if not isinstance(indent, _basestring):
+			indent = ' ' * indent
+		newlines = []
+		def newline(level):
+			while len(newlines) <= level:
+				newlines.append('\n' + indent * len(newlines))
+			return newlines[level]
+	if ensure_ascii:
+		encode_string = json.encoder.encode_basestring_ascii
+	else:
+		encode_string = json.encoder.encode_basestring
+	item_separator, key_separator = encoder.item_separator, encoder.key_separator
+	def encode(value, level, append):
+		_encode_walk(value, level, append, encode_string, newline,
+			item_separator, key_separator, sort_keys)
+	if indent is None:
+		compact = json.JSONEncoder(ensure_ascii=ensure_ascii,
+			sort_keys=sort_keys, separators=separators).encode
+		walk = encode
+		def encode(value, level, append):
+			try:
+				append(compact(value))
+			except _RecursionError:
+				walk(value, level, append)
+	return encode, newline, item_separator
+
+def dumps_json(value, indent=None, ensure_ascii=False, sort_keys=False,
+	separators=None):
+	"""
+	json.dumps(value, ...) with these arguments, for decoded JSON and
+	xmltodict trees, but without a nesting limit: indented output is written
+	by _encode_walk and compact output falls back to it when json's C
+	encoder runs out of recursion depth.
+	"""
+	encode = _json_encoder(indent, ensure_ascii, sort_keys, separators)[0]
+	chunks = []
+	encode(value, 0, chunks.append)
+	return ''.join(chunks)
+
+
+# text pieces added between two checks of an element's size against the
+# spill limit, and characters read back per block from a spilled text
+_SPILL_CHECK = 64
+_SPILL_BLOCK = 1 << 20
+
+
+class _SpilledText(object):
+	"""
+	The text of one element, collected in a temporary file as UTF-8 instead
+	of in memory. Stands in for the string in the xmltodict tree; the JSON
+	writers pass it on a block at a time through write_json().
+	"""
+	__slots__ = ('file', 'has_text', 'strip')
+
+	def __init__(self, chunks=()):
+		self.file = tempfile.TemporaryFile()
+		# whether anything but whitespace was seen yet
+		self.has_text = False
+		self.strip = False
+		for chunk in chunks:
+			self.append(chunk)
+
+	def append(self, data):
+		if not self.has_text and data.strip():
+			self.has_text = True
+		self.file.write(data.encode('utf-8'))
+
+	def finish(self, strip):
+		"""
+		Close the text; like `text.strip() or None` with `strip`.
+		"""
+		if strip and not self.has_text:
+			self.file.close()
+			return None
+		self.strip = strip
+		return self
+
+	def write_json(self, write, encode_string, block_size=_SPILL_BLOCK):
+		"""
+		Pass the text to `write` as a JSON string, encoded with
+		`encode_string` a block at a time, and drop the file.
+		"""
+		source = self.file
+		source.seek(0)
+		decoder = codecs.getincrementaldecoder('utf-8')()
+		leading = self.strip
+		# whitespace held back until text follows it
+		blanks = ''
+		write('"')
+		while True:
+			block = source.read(block_size)
+			text = decoder.decode(block, not block)
+			if self.strip:
+				if leading:
+					text = text.lstrip()
+					leading = not text
+				kept = text.rstrip()
+				if kept:
+					write(encode_string(blanks + kept)[1:-1])
+					blanks = text[len(kept):]
+				else:
+					blanks += text
+			elif text:
+				write(encode_string(text)[1:-1])
+			if not block:
+				break
+		write('"')
+		source.close()
+
+
+class _SpillingSAXHandler(xmltodict._DictSAXHandler):
+	"""
+	_DictSAXHandler that moves the text of an element to a _SpilledText once
+	it reaches `spill_size` characters, so a huge text node is never held in
+	memory. Leave `spill_size` unset for trees that are used as they are.
+	"""
+
+	def __init__(self, spill_size=None, **kwargs):
+		kwargs.setdefault('dict_constructor', _ordered_dict)
+		xmltodict._DictSAXHandler.__init__(self, **kwargs)
+		self.spill_size = spill_size
+		self.spilled = False
+		if spill_size:
+			self.characters = self._spilling_characters
+
+	def _spilling_characters(self, data):
+		chunks = self.data
+		if chunks is None:
+			self.data = [data]
+			return
+		chunks.append(data)
+		if (type(chunks) is list and len(chunks) % _SPILL_CHECK == 0
+				and sum(map(len, chunks)) >= self.spill_size):
+			self.data = _SpilledText(chunks)
+			self.spilled = True
+
+	def _join_data(self, data):
+		if type(data) is _SpilledText:
+			return data.finish(self.strip_whitespace)
+		return xmltodict._DictSAXHandler._join_data(self, data)
+
+
+class _NodeInfo(object):
+	"""
+	Bookkeeping _NormalizingSAXHandler needs for an element whose children
+	include attribute-only leaves, text-bearing elements or elements named
+	like one of its attributes. Created lazily; most elements never need it.
+	"""
+	__slots__ = ('leaves', 'text_keys', 'collided', 'overwritten')
+
+	def __init__(self):
+		self.leaves = []
+		self.text_keys = set()
+		self.collided = []
+		self.overwritten = set()
+
+
+class _NormalizingSAXHandler(_SpillingSAXHandler):
+	"""
+	_DictSAXHandler that builds the apply_attr_text_normalization() shape
+	directly while parsing, so no second walk over the tree is needed.
+
+	Attributes go in unprefixed and text under `value_key` as each element
+	closes. Elements that only carry attributes depend on their siblings (see
+	apply_attr_text_normalization), so they are remembered on their parent and
+	get their forced empty text when the parent closes. With `fix_root` off
+	the document element is left for the caller to settle (see `info`).
+	"""
+
+	def __init__(self, value_key='value', fix_root=True, **kwargs):
+		_SpillingSAXHandler.__init__(self, **kwargs)
+		self.value_key = value_key
+		self.fix_root = fix_root
+		self.info = None
+
+	def _node_info(self):
+		if self.info is None:
+			self.info = _NodeInfo()
+		return self.info
+
+	def startElement(self, full_name, attrs):
+		name = self._build_name(full_name)
+		attrs = self._attrs_to_dict(attrs)
+		self.path.append((name, attrs or None))
+		if len(self.path) > self.item_depth:
+			self.stack.append((self.item, self.data, self.info))
+			self.item = self.dict_constructor(attrs) if attrs else None
+			self.data = None
+			self.info = None
+
+	def endElement(self, full_name):
+		name = self._build_name(full_name)
+		attrs = self.path[-1][1]
+		if len(self.path) == self.item_depth:
+			item = self.item
+			if self.info is not None and self.info.leaves:
+				self.fix_leaves(item, self.info)
+			if item is None and self.data is not None:
+				item = self.cdata_separator.join(self.data)
+			should_continue = self.item_callback(self.path, item)
+			if not should_continue:
+				raise xmltodict.ParsingInterrupted()
+		if len(self.stack):
+			item, data, info = self.item, self.data, self.info
+			self.item, self.data, self.info = self.stack.pop()
+			if data is not None:
+				data = self._join_data(data)
+			if info is not None and info.leaves:
+				self.fix_leaves(item, info)
+			if item is not None:
+				is_leaf = False
+				if data:
+					if attrs and self.value_key in attrs:
+						# <tag value="x">text</tag>: keep the xmltodict keys
+						item = self._keep_structure(item, attrs, info, data)
+					else:
+						item[self.value_key] = data
+				elif attrs and len(item) == len(attrs) and (info is None or not info.collided):
+					is_leaf = True
+				self._push(name, item, is_leaf, bool(data))
+			else:
+				self._push(name, data, False, False)
+			if (not self.stack and self.fix_root and not self.item_depth
+					and self.info is not None and self.info.leaves):
+				self.fix_leaves(self.item, self.info)
+		else:
+			self.item = self.data = self.info = None
+		self.path.pop()
+
+	def _push(self, key, value, is_leaf, has_text):
+		item = self.item
+		position = 0
+		if item is None:
+			item = self.item = self.dict_constructor()
+			item[key] = value
+		elif key not in item:
+			item[key] = value
+		else:
+			existing = item[key]
+			attrs = self.path[-2][1]
+			if attrs and key in attrs and (self.info is None or key not in self.info.overwritten):
+				# first child named like an attribute replaces it in place;
+				# remember where it goes among the children for _keep_structure
+				info = self._node_info()
+				info.collided.append((key, len(item) - len(attrs) + len(info.collided)))
+				info.overwritten.add(key)
+				item[key] = value
+			elif isinstance(existing, list):
+				position = len(existing)
+				existing.append(value)
+			else:
+				item[key] = [existing, value]
+				position = 1
+		if is_leaf:
+			self._node_info().leaves.append((key, value, position))
+		if has_text:
+			self._node_info().text_keys.add(key)
+
+	def _keep_structure(self, item, attrs, info, data):
+		kept = self.dict_constructor((self._attr_key(k), v) for k, v in attrs.items())
+		children = [(k, v) for k, v in item.items() if k not in attrs]
+		if info is not None:
+			for key, index in info.collided:
+				children.insert(index, (key, item[key]))
+		for k, v in children:
+			kept[k] = v
+		kept['#text'] = data
+		return kept
+
+	def force_text(self, leaf):
+		"""
+		Give an attribute-only element its empty text; returns the new value.
+		"""
+		if self.value_key in leaf:
+			kept = self.dict_constructor((self._attr_key(k), v) for k, v in leaf.items())
+			kept['#text'] = ""
+			return kept
+		leaf[self.value_key] = ""
+		return leaf
+
+	def fix_leaves(self, item, info):
+		"""
+		Settle the attribute-only children of `item` now that all their
+		siblings are known.
+		"""
+		for key, leaf, position in info.leaves:
+			value = item[key]
+			if isinstance(value, list):
+				if key in info.text_keys:
+					value[position] = self.force_text(leaf)
+			elif value is leaf and len(leaf) == 1:
+				item[key] = self.force_text(leaf)
+		del info.leaves[:]
+
+
+class _StreamFrame(object):
+	"""
+	An element whose JSON object is currently open on the writer.
+	"""
+	__slots__ = ('level', 'entries', 'attr_keys', 'data', 'first_key',
+		'first_count', 'first_child', 'list_items', 'pending', 'text_seen',
+		'others')
+
+	def __init__(self, level):
+		self.level = level
+		self.entries = 0
+		self.attr_keys = None
+		self.data = []
+		self.first_key = None
+		self.first_count = 0
+		self.first_child = None
+		self.list_items = 0
+		self.pending = deque()
+		self.text_seen = False
+		self.others = None
+
+
+class _JSONStreamHandler(object):
+	"""
+	expat handler that writes the JSON for a document while it is parsed.
+
+	The output is byte-identical to json.dumps() of the (optionally normalized)
+	xmltodict tree. Elements are written as soon as their place in the output
+	is certain: the document element and, below it, every element that is an
+	item of the first repeated child list of an already streamed element (the
+	typical <root><record/><record/>...</root> layout). Everything else is
+	collected by a _DictSAXHandler (_NormalizingSAXHandler when normalizing)
+	and written when its parent closes, so peak memory is bounded by the
+	largest such subtree instead of the whole document.
+
+	Collected children are kept as (value, is_leaf, has_text) triples: whether
+	an attribute-only element gets an empty text depends on its siblings.
+	The text of an element that reaches `spill_size` characters goes to a
+	temporary file and is copied from there into the output.
+	"""
+
+	def __init__(self, write, indent=None, ensure_ascii=False,
+		normalize=True, value_key='value', spill_size=None):
+		self.write = write
+		self.spill_size = spill_size
+		self.normalize = normalize
+		self.value_key = value_key
+		self.encoder = json.JSONEncoder(indent=indent, ensure_ascii=ensure_ascii,
+			separators=PRETTY_SEPARATORS if indent is not None else None)
+		if ensure_ascii:
+			self.encode_string = json.encoder.encode_basestring_ascii
+		else:
+			self.encode_string = json.encoder.encode_basestring
+		self.item_separator = self.encoder.item_separator
+		self.key_separator = self.encoder.key_separator
+		self.indent = indent
+		self.newlines = []
+		self.frames = []
+		if normalize:
+			self.collector = _NormalizingSAXHandler(value_key, fix_root=False,
+				spill_size=spill_size)
+		else:
+			self.collector = _SpillingSAXHandler(spill_size=spill_size)
+		self.sub = None
+		self.sub_key = None
+		self.sub_promotable = False
+		self.parser = None
+
+	def _newline(self, level):
+		if self.indent is None:
+			return ''
+		newlines = self.newlines
+		while len(newlines) <= level:
+			newlines.append('\n' + ' ' * (self.indent * len(newlines)))
+		return newlines[level]
+
+	def _write_value(self, value, level):
+		if isinstance(value, _basestring):
+			self.write(self.encode_string(value))
+			return
+		if value is None:
+			self.write('null')
+			return
+		if self.collector.spilled:
+			# the value may hold spilled text: pass it on piece by piece
+			# instead of putting it together in memory
+			_encode_walk(value, level, self.write, self.encode_string,
+				self._newline, self.item_separator, self.key_separator,
+				encode_other=self.encoder.encode)
+			return
+		if self.indent is None:
+			try:
+				self.write(self.encoder.encode(value))
+				return
+			except _RecursionError:
+				pass
+		# json's own indenting encoder is pure Python as well, but setting it
+		# up per subtree costs more than the subtree itself
+		chunks = []
+		_encode_walk(value, level, chunks.append, self.encode_string,
+			self._newline, self.item_separator, self.key_separator,
+			encode_other=self.encoder.encode)
+		self.write(''.join(chunks))
+
+	def _begin_entry(self, frame, key):
+		if frame.entries:
+			self.write(self.item_separator)
+		self.write(self._newline(frame.level + 1))
+		self.write(self.encode_string(key))
+		self.write(self.key_separator)
+		frame.entries += 1
+
+	def _single_value(self, child):
+		value, is_leaf, has_text = child
+		if is_leaf and len(value) == 1:
+			return self.collector.force_text(value)
+		return value
+
+	def _list_value(self, children):
+		siblings_have_text = False
+		for value, is_leaf, has_text in children:
+			if has_text:
+				siblings_have_text = True
+				break
+		values = []
+		for value, is_leaf, has_text in children:
+			if is_leaf and siblings_have_text:
+				value = self.collector.force_text(value)
+			values.append(value)
+		return values
+
+	def _flush_pending(self, frame, final=False):
+		pending = frame.pending
+		while pending:
+			value, is_leaf, has_text = pending[0]
+			if is_leaf:
+				if frame.text_seen:
+					value = self.collector.force_text(value)
+				elif not final:
+					# wait until we know whether any sibling has text
+					return
+			pending.popleft()
+			self._open_list_item(frame)
+			self._write_value(value, frame.level + 2)
+
+	def _open_list_item(self, frame):
+		if frame.list_items:
+			self.write(self.item_separator)
+		frame.list_items += 1
+		self.write(self._newline(frame.level + 2))
+
+	def _close_list(self, frame):
+		self.write(self._newline(frame.level + 1))
+		self.write(']')
+
+	def _frame_key(self, frame, name):
+		# first time `name` is seen as a child of a streamed element
+		if frame.attr_keys and name in frame.attr_keys:
+			raise StreamFallback('attribute and child element share the name ' + name)
+
+	def startElement(self, name, attrs):
+		if self.sub is not None:
+			if self.sub_promotable and len(self.sub.path) == 1:
+				self._promote()
+			else:
+				self.sub.startElement(name, attrs)
+				return
+
+		promotable = False
+		if not self.frames:
+			# document element
+			self.write('{')
+			self.write(self._newline(1))
+			self.write(self.encode_string(name))
+			self.write(self.key_separator)
+			promotable = True
+		else:
+			frame = self.frames[-1]
+			if frame.first_key is None:
+				self._frame_key(frame, name)
+				frame.first_key = name
+				frame.first_count = 1
+			elif name == frame.first_key:
+				frame.first_count += 1
+				if frame.first_count == 2:
+					self._begin_entry(frame, name)
+					self.write('[')
+					frame.pending.append(frame.first_child)
+					frame.text_seen = frame.first_child[2]
+					frame.first_child = None
+					self._flush_pending(frame)
+				promotable = not frame.pending
+			else:
+				if frame.others is None:
+					frame.others = _ordered_dict()
+				if name not in frame.others:
+					self._frame_key(frame, name)
+					frame.others[name] = []
+		if promotable and self.normalize:
+			for i in range(0, len(attrs), 2):
+				if attrs[i] == self.value_key:
+					promotable = False
+					break
+
+		sub = self.sub = self.collector
+		sub.path = []
+		sub.stack = []
+		sub.item = sub.data = sub.info = None
+		sub.startElement(name, attrs)
+		self.sub_key = name
+		self.sub_promotable = promotable
+		if not promotable and self.parser is not None:
+			# nothing below this element can be streamed: let expat talk to
+			# the collector directly until the element closes
+			self.parser.StartElementHandler = sub.startElement
+			self.parser.CharacterDataHandler = sub.characters
+			self.parser.EndElementHandler = self._end_collected
+
+	def _promote(self):
+		# the pending element got its first child: open its JSON object
+		sub = self.sub
+		if self.frames:
+			parent = self.frames[-1]
+			self._open_list_item(parent)
+			level = parent.level + 2
+		else:
+			level = 1
+		frame = _StreamFrame(level)
+		self.write('{')
+		if sub.item:
+			# already unprefixed when normalizing
+			if self.normalize:
+				frame.attr_keys = set(sub.item)
+			for key, value in sub.item.items():
+				self._begin_entry(frame, key)
+				self.write(self.encode_string(value))
+		if type(sub.data) is _SpilledText:
+			frame.data = sub.data
+		elif sub.data:
+			frame.data.extend(sub.data)
+		self.frames.append(frame)
+		self.sub = None
+
+	def characters(self, data):
+		if self.sub is not None:
+			self.sub.characters(data)
+		elif self.frames:
+			frame = self.frames[-1]
+			chunks = frame.data
+			chunks.append(data)
+			if (self.spill_size and type(chunks) is list and len(chunks) % _SPILL_CHECK == 0
+					and sum(map(len, chunks)) >= self.spill_size):
+				frame.data = _SpilledText(chunks)
+				self.collector.spilled = True
+
+	def endElement(self, name):
+		if self.sub is not None:
+			self.sub.endElement(name)
+			if not self.sub.path:
+				self._end_sub(name)
+			return
+		self._close_frame(self.frames.pop())
+
+	def _end_collected(self, name):
+		self.sub.endElement(name)
+		if not self.sub.path:
+			parser = self.parser
+			parser.StartElementHandler = self.startElement
+			parser.CharacterDataHandler = self.characters
+			parser.EndElementHandler = self.endElement
+			self._end_sub(name)
+
+	def _end_sub(self, name):
+		sub = self.sub
+		self.sub = None
+		value = sub.item[name] if sub.item else None
+		if self.normalize and sub.info is not None:
+			child = (value, bool(sub.info.leaves), name in sub.info.text_keys)
+		else:
+			child = (value, False, False)
+		self._add_child(name, child)
+
+	def _add_child(self, name, child):
+		if not self.frames:
+			self._write_value(self._single_value(child), 1)
+			self._close_document()
+			return
+		frame = self.frames[-1]
+		if name == frame.first_key:
+			if frame.first_count == 1:
+				frame.first_child = child
+			else:
+				frame.pending.append(child)
+				if child[2]:
+					frame.text_seen = True
+				self._flush_pending(frame)
+		else:
+			frame.others[name].append(child)
+
+	def _close_frame(self, frame):
+		if frame.first_count == 1:
+			self._begin_entry(frame, frame.first_key)
+			self._write_value(self._single_value(frame.first_child), frame.level + 1)
+		elif frame.first_count > 1:
+			self._flush_pending(frame, final=True)
+			self._close_list(frame)
+
+		if type(frame.data) is _SpilledText:
+			data = frame.data.finish(True)
+		else:
+			data = ''.join(frame.data).strip() or None
+		has_text = data is not None
+		text_key = self.value_key if self.normalize else '#text'
+		if data and text_key == frame.first_key:
+			raise StreamFallback('text overrides the child element ' + text_key)
+
+		if frame.others:
+			for key, children in frame.others.items():
+				self._begin_entry(frame, key)
+				if data and key == text_key:
+					# the text replaces the child element value in place
+					self._write_value(data, frame.level + 1)
+					data = None
+					continue
+				if len(children) == 1:
+					value = self._single_value(children[0])
+				else:
+					value = self._list_value(children)
+				self._write_value(value, frame.level + 1)
+		if data:
+			self._begin_entry(frame, text_key)
+			self._write_value(data, frame.level + 1)
+
+		self.write(self._newline(frame.level))
+		self.write('}')
+
+		if self.frames:
+			if has_text:
+				self.frames[-1].text_seen = True
+		else:
+			self._close_document()
+
+	def _close_document(self):
+		self.write(self._newline(0))
+		self.write('}')
+
+
+def _to_bytes(xml_input):
+	if isinstance(xml_input, _unicode):
+		return xml_input.encode('utf-8')
+	return xml_input
+
+def feed_parser(parser, data, progress=None, chunk_size=CHUNK_SIZE):
+	"""
+	Feed `data` (bytes) to an expat parser `chunk_size` bytes at a time,
+	calling progress(done, total) after every chunk. `progress` may raise
+	ConversionCancelled to stop the parse.
+	"""
+	total = len(data)
+	if progress is None or total <= chunk_size:
+		parser.Parse(data, True)
+		if progress is not None:
+			progress(total, total)
+		return
+	for start in range(0, total, chunk_size):
+		parser.Parse(data[start:start + chunk_size], False)
+		progress(min(start + chunk_size, total), total)
+	parser.Parse(b'', True)
+
+def _dict_handler(**kwargs):
+	kwargs.setdefault('dict_constructor', _ordered_dict)
+	return xmltodict._DictSAXHandler(**kwargs)
+
+def parse_xml(xml_input, progress=None, **kwargs):
+	"""
+	xmltodict.parse() for str/bytes input with progress reporting.
+	"""
+	handler = _dict_handler(**kwargs)
+	feed_parser(xmltodict._make_parser(handler), _to_bytes(xml_input), progress)
+	return handler.item
+
+def parse_xml_normalized(xml_input, value_key='value', progress=None, **kwargs):
+	"""
+	parse_xml() followed by apply_attr_text_normalization(), done in one pass.
+	"""
+	handler = _NormalizingSAXHandler(value_key, **kwargs)
+	feed_parser(xmltodict._make_parser(handler), _to_bytes(xml_input), progress)
+	return handler.item
+
+def _xml_to_json_tree(xml_input, indent, ensure_ascii, sort_keys, normalize,
+	value_key, progress=None, timings=None):
+	with timed(timings, 'parse', len(xml_input)):
+		if normalize:
+			jsonObj = parse_xml_normalized(xml_input, value_key, progress)
+		else:
+			jsonObj = parse_xml(xml_input, progress)
+	with timed(timings, 'serialize') as stage:
+		text = dumps_json(
+			jsonObj,
+			indent=indent,
+			ensure_ascii=ensure_ascii,
+			sort_keys=sort_keys,
+			separators=PRETTY_SEPARATORS if indent is not None else None)
+		stage.size_out = len(text)
+	return text
+
+def xml_to_json(xml_input, output=None, pretty=True, indent=2,
+	ensure_ascii=False, sort_keys=False, normalize=True, value_key='value',
+	progress=None, timings=None, spill_size=SPILL_TEXT_SIZE):
+	"""
+	Convert an XML document (str or bytes) to JSON.
+
+	Returns the JSON string, or writes it to the file-like `output` and
+	returns None. Streams through _JSONStreamHandler unless `sort_keys` is set;
+	the result is identical to json.dumps() of the xmltodict tree either way.
+	Streaming parses, normalizes and serializes in one 'stream' stage of
+	`timings`; the tree path records 'parse' and 'serialize'. While
+	streaming, the text of an element that reaches `spill_size` characters
+	is kept in a temporary file until it is written (None or 0 never does).
+	"""
+	if not pretty:
+		indent = None
+	xml_input = _to_bytes(xml_input)
+	if not sort_keys:
+		target = StringIO() if output is None else output
+		try:
+			with timed(timings, 'stream', len(xml_input)) as stage:
+				xml_to_json_stream(xml_input, target.write, indent, ensure_ascii,
+					normalize, value_key, progress, spill_size)
+				if output is None:
+					stage.size_out = target.tell()
+		except StreamFallback:
+			if output is not None:
+				if not hasattr(output, 'truncate'):
+					raise
+				output.seek(0)
+				output.truncate()
+		else:
+			if output is None:
+				return target.getvalue()
+			return None
+
+	text = _xml_to_json_tree(xml_input, indent, ensure_ascii, sort_keys,
+		normalize, value_key, progress, timings)
+	if output is None:
+		return text
+	output.write(text)
+
+def xml_to_json_stream(xml_input, write, indent=None, ensure_ascii=False,
+	normalize=True, value_key='value', progress=None, spill_size=SPILL_TEXT_SIZE):
+	"""
+	Parse `xml_input` and pass the JSON text to `write` in pieces as elements
+	close. May raise StreamFallback; see xml_to_json() for the handling.
+	"""
+	handler = _JSONStreamHandler(write, indent, ensure_ascii, normalize, value_key,
+		spill_size)
+	parser = handler.parser = xmltodict._make_parser(handler)
+	feed_parser(parser, _to_bytes(xml_input), progress)
+
+# one step of an extract_path() path: element name or '*', attribute
+# predicates as (name, value or None), and the [start:stop] range of the
+# matching siblings to keep (stop None for no limit)
+PathStep = namedtuple('PathStep', 'name attrs start stop')
+
+_PATH_NAME = re.compile(r'\s*/\s*([^/\[\]\s]+)\s*')
+_PATH_PREDICATE = re.compile(r"""\[\s*(?:
+	@([^\s=\]]+)\s*(?:=\s*(?:"([^"]*)"|'([^']*)'))?
+	|(\d+)
+	|(\d*)\s*:\s*(\d*)
+	)\s*\]\s*""", re.VERBOSE)
+
+def parse_path(path):
+	"""
+	'/feed/entry[@type="post"][10:20]' ->
+	[PathStep('feed', (), 0, None), PathStep('entry', (('type', 'post'),), 10, 20)]
+
+	Steps are element names or '*' separated by '/', starting at the
+	document element. Each may be followed by attribute predicates
+	([@name] or [@name="value"]) and one index or slice ([5], [10:20],
+	[100:]), counted from 0 over the siblings that match name and
+	predicates. Raises ValueError for anything else.
+	"""
+	steps = []
+	text = path.strip()
+	if not text:
+		raise ValueError('empty path')
+	if not text.startswith('/'):
+		text = '/' + text
+	pos = 0
+	while pos < len(text):
+		match = _PATH_NAME.match(text, pos)
+		if match is None:
+			raise ValueError('bad path {!r}: unexpected {!r}'.format(path, text[pos:pos + 10]))
+		name = match.group(1)
+		pos = match.end()
+		attrs = []
+		start, stop = 0, None
+		ranged = False
+		match = _PATH_PREDICATE.match(text, pos)
+		while match is not None:
+			pos = match.end()
+			attr, double_quoted, single_quoted, index, first, last = match.groups()
+			if attr is not None:
+				attrs.append((attr, double_quoted if double_quoted is not None else single_quoted))
+			elif ranged:
+				raise ValueError('bad path {!r}: more than one index for {}'.format(path, name))
+			elif index is not None:
+				ranged = True
+				start, stop = int(index), int(index) + 1
+			else:
+				ranged = True
+				start = int(first) if first else 0
+				stop = int(last) if last else None
+			match = _PATH_PREDICATE.match(text, pos)
+		steps.append(PathStep(name, tuple(attrs), start, stop))
+	return steps
+
+class _PathFilter(object):
+	"""
+	Goes between expat and a handler with item_depth 1. Elements matching
+	the last step of `steps` are passed on, each wrapped in an element of
+	its own so it reaches the handler's item_callback whole, attributes
+	included. Everything else is dropped before the handler sees it, and
+	parsing stops with ParsingInterrupted once no later element can match.
+	"""
+	def __init__(self, steps, handler):
+		self.steps = steps
+		self.handler = handler
+		self.depth = 0
+		# depth inside an element that is being skipped
+		self.skipped = 0
+		# per step, the siblings so far (under the current parent) that
+		# match its name and predicates
+		self.counts = [0] * len(steps)
+
+	def startElement(self, name, attrs):
+		if self.skipped:
+			self.skipped += 1
+			return
+		depth = self.depth
+		last = len(self.steps) - 1
+		if depth <= last:
+			if not self._matches(self.steps[depth], depth, name, attrs):
+				self.skipped = 1
+				return
+			if depth < last:
+				self.counts[depth + 1] = 0
+				self.depth += 1
+				return
+			self.handler.startElement('#match', [])
+		self.depth += 1
+		self.handler.startElement(name, attrs)
+
+	def endElement(self, name):
+		if self.skipped:
+			self.skipped -= 1
+			return
+		self.depth -= 1
+		depth = self.depth
+		last = len(self.steps) - 1
+		if depth >= last:
+			self.handler.endElement(name)
+			if depth == last:
+				self.handler.endElement('#match')
+		elif self.exhausted(depth):
+			raise xmltodict.ParsingInterrupted()
+
+	def characters(self, data):
+		if not self.skipped and self.depth >= len(self.steps):
+			self.handler.characters(data)
+
+	def _matches(self, step, depth, name, attrs):
+		if step.name != '*' and step.name != name:
+			return False
+		if step.attrs:
+			values = dict(zip(attrs[0::2], attrs[1::2])) if isinstance(attrs, list) else attrs
+			for key, value in step.attrs:
+				if key not in values or (value is not None and values[key] != value):
+					return False
+		position = self.counts[depth]
+		self.counts[depth] = position + 1
+		return step.start <= position and (step.stop is None or position < step.stop)
+
+	def exhausted(self, depth):
+		"""
+		Whether nothing after the current element at `depth` can match: the
+		steps down to there have all counted past the end of their range.
+		"""
+		for level in range(1, depth + 1):
+			stop = self.steps[level].stop
+			if stop is None or self.counts[level] < stop:
+				return False
+		return True
+
+def _path_parser(path, on_match, normalize=True, value_key='value'):
+	"""
+	An expat parser that calls on_match(name, value) with the JSON tree of
+	each element `path` selects (see parse_path()) and raises
+	xmltodict.ParsingInterrupted once nothing after it can match.
+	"""
+	steps = parse_path(path)
+	if normalize:
+		handler = _NormalizingSAXHandler(value_key, item_depth=1)
+	else:
+		handler = _dict_handler(item_depth=1)
+	path_filter = _PathFilter(steps, handler)
+
+	def collect(match_path, item):
+		# {name: value} of the wrapped match
+		for name, value in item.items():
+			on_match(name, value)
+		return not path_filter.exhausted(len(steps) - 1)
+	handler.item_callback = collect
+	return xmltodict._make_parser(path_filter)
+
+def extract_path(xml_input, path, pretty=True, indent=2, ensure_ascii=False,
+	sort_keys=False, normalize=True, value_key='value', progress=None,
+	timings=None):
+	"""
+	Convert only the elements `path` selects (see parse_path()) to JSON.
+	The matches are grouped under their names the way repeated children
+	are, e.g. {"entry": [{...}, {...}]}, or {"entry": {...}} for one. Each
+	is converted as xml_to_json() would convert it on its own. The rest of
+	the document is scanned without building anything, and parsing stops
+	as soon as the ranges in the path are used up. Raises ValueError for a
+	bad path or when nothing matches.
+	"""
+	if not pretty:
+		indent = None
+	xml_input = _to_bytes(xml_input)
+	matches = _ordered_dict()
+	parser = _path_parser(path,
+		lambda name, value: matches.setdefault(name, []).append(value),
+		normalize, value_key)
+	with timed(timings, 'parse', len(xml_input)):
+		try:
+			feed_parser(parser, xml_input, progress)
+		except xmltodict.ParsingInterrupted:
+			pass
+	if not matches:
+		raise ValueError('nothing matches ' + path)
+	result = _ordered_dict(
+		(name, values[0] if len(values) == 1 else values)
+		for name, values in matches.items())
+	with timed(timings, 'serialize') as stage:
+		text = dumps_json(
+			result,
+			indent=indent,
+			ensure_ascii=ensure_ascii,
+			sort_keys=sort_keys,
+			separators=PRETTY_SEPARATORS if indent is not None else None)
+		stage.size_out = len(text)
+	return text
+
+def _ndjson_parser(write, records=NDJSON_RECORDS, ensure_ascii=False,
+	sort_keys=False, normalize=True, value_key='value'):
+	def write_record(name, value):
+		write(dumps_json(value, ensure_ascii=ensure_ascii, sort_keys=sort_keys,
+			separators=(',', ':')) + '\n')
+	return _path_parser(records, write_record, normalize, value_key)
+
+def xml_to_ndjson(xml_input, output=None, records=NDJSON_RECORDS,
+	ensure_ascii=False, sort_keys=False, normalize=True, value_key='value',
+	progress=None, timings=None):
+	"""
+	Convert each record `records` selects (a path, see parse_path()) to
+	one line of compact JSON, as JSON Lines / NDJSON. A record is written
+	as soon as it closes, so memory use is bounded by the largest record,
+	not by the document. Returns the text, or writes it to the file-like
+	`output` and returns None.
+	"""
+	target = StringIO() if output is None else output
+	xml_input = _to_bytes(xml_input)
+	with timed(timings, 'stream', len(xml_input)) as stage:
+		parser = _ndjson_parser(target.write, records, ensure_ascii, sort_keys,
+			normalize, value_key)
+		try:
+			feed_parser(parser, xml_input, progress)
+		except xmltodict.ParsingInterrupted:
+			pass
+		if output is None:
+			stage.size_out = target.tell()
+	if output is None:
+		return target.getvalue()
+
+def _common_prefix_length(a, b, block=1 << 16):
+	# compares whole blocks first, then narrows the first differing block
+	# down by bisection, so long unchanged texts cost a few memcmp calls
+	limit = min(len(a), len(b))
+	start = 0
+	while start < limit and a[start:start + block] == b[start:start + block]:
+		start += block
+	if start >= limit:
+		return limit
+	end = min(start + block, limit)
+	while start < end:
+		middle = (start + end + 1) // 2
+		if a[start:middle] == b[start:middle]:
+			start = middle
+		else:
+			end = middle - 1
+	return start
+
+def _common_suffix_length(a, b, limit, block=1 << 16):
+	# like _common_prefix_length from the end, at most `limit` long
+	len_a, len_b = len(a), len(b)
+	start = 0
+	while start < limit and a[len_a - min(start + block, limit):len_a - start] == \
+			b[len_b - min(start + block, limit):len_b - start]:
+		start += block
+	if start >= limit:
+		return limit
+	end = min(start + block, limit)
+	while start < end:
+		middle = (start + end + 1) // 2
+		if a[len_a - middle:len_a - start] == b[len_b - middle:len_b - start]:
+			start = middle
+		else:
+			end = middle - 1
+	return start
+
+# how a child of the document element is written, see LiveConversion
+_SINGLE = 0
+_IN_LIST = 1
+_FORCED = 2
+
+# the rest of a start, end or empty-element tag, up to and including its '>'
+_TAG_END = re.compile(br'(?:[^>"\']+|"[^"]*"|\'[^\']*\')*>')
+
+class _LiveChild(object):
+	"""
+	A child of the document element as LiveConversion keeps it: its byte
+	range in the source, its converted value and the JSON text for it.
+	"""
+	__slots__ = ('name', 'start', 'end', 'value', 'is_leaf', 'has_text',
+		'context', 'fragment')
+
+	def __init__(self, name, start, end, value, is_leaf, has_text):
+		self.name = name
+		self.start = start
+		self.end = end
+		self.value = value
+		self.is_leaf = is_leaf
+		self.has_text = has_text
+		self.context = None
+		self.fragment = None
+
+class _LiveIndexHandler(object):
+	"""
+	expat handler that converts each child of the document element on its
+	own and records where it is in the source, for LiveConversion. Byte
+	offsets are shifted by `offset`, for documents rebuilt around a part of
+	the source. With an `intern_table` dict, names and short values in the
+	converted children are shared through it (see INTERN_LIMIT).
+	"""
+
+	def __init__(self, data, normalize, value_key, offset=0, intern_table=None):
+		self.data = data
+		self.offset = offset
+		self.parser = None
+		self.depth = 0
+		self.root_name = None
+		self.root_attrs = None
+		self.root_start = None
+		self.root_end = None
+		self.content_start = None
+		self.content_end = None
+		self.text = []
+		self.children = []
+		self.start = None
+		self.empty_end = None
+		self.normalize = normalize
+		interning = {}
+		if intern_table is not None:
+			interning = dict(intern_limit=INTERN_LIMIT,
+				intern_value_length=INTERN_VALUE_LENGTH, intern_table=intern_table)
+		if normalize:
+			self.collector = _NormalizingSAXHandler(value_key, fix_root=False, **interning)
+		else:
+			self.collector = _dict_handler(**interning)
+
+	def startElement(self, name, attrs):
+		depth = self.depth
+		self.depth += 1
+		if depth == 0:
+			index = self.parser.CurrentByteIndex
+			self.root_name = name
+			self.root_attrs = attrs
+			self.root_start = index + self.offset
+			tag_end = _TAG_END.match(self.data, index).end()
+			self.content_start = tag_end + self.offset
+			if self.data[tag_end - 2:tag_end] == b'/>':
+				self.content_end = self.root_end = self.content_start
+			return
+		if depth == 1:
+			index = self.parser.CurrentByteIndex
+			self.start = index + self.offset
+			# expat reports the end of an empty-element tag at the position
+			# after it, and the end of any other element at its end tag
+			tag_end = _TAG_END.match(self.data, index).end()
+			self.empty_end = tag_end + self.offset if self.data[tag_end - 2:tag_end] == b'/>' else None
+			collector = self.collector
+			collector.path = []
+			collector.stack = []
+			collector.item = collector.data = None
+			if self.normalize:
+				collector.info = None
+		self.collector.startElement(name, attrs)
+
+	def endElement(self, name):
+		self.depth -= 1
+		depth = self.depth
+		if depth == 0:
+			if self.content_end is None:
+				index = self.parser.CurrentByteIndex
+				self.content_end = index + self.offset
+				self.root_end = _TAG_END.match(self.data, index).end() + self.offset
+			return
+		collector = self.collector
+		collector.endElement(name)
+		if depth == 1:
+			end = self.empty_end
+			if end is None:
+				end = _TAG_END.match(self.data, self.parser.CurrentByteIndex).end() + self.offset
+			value = collector.item[name] if collector.item else None
+			if self.normalize and collector.info is not None:
+				child = _LiveChild(name, self.start, end, value,
+					bool(collector.info.leaves), name in collector.info.text_keys)
+			else:
+				child = _LiveChild(name, self.start, end, value, False, False)
+			self.children.append(child)
+
+	def characters(self, data):
+		if self.depth > 1:
+			self.collector.characters(data)
+		elif self.depth == 1:
+			self.text.append(data)
+
+	def parse(self, data):
+		parser = self.parser = xmltodict._make_parser(self)
+		parser.Parse(data, True)
+		return self
+
+class LiveConversion(object):
+	"""
+	XML to JSON for a live preview that is converted again after every edit.
+
+	update(xml_text) returns how the previous JSON output changes, as
+	(begin, end, text): replace output[begin:end] with `text`. The output is
+	the same as xml_to_json() with these arguments gives. To get there
+	without converting the whole document, every child of the document
+	element is converted on its own and kept with its byte range in the
+	source; an edit inside the document element only parses the children
+	it touches again and splices their JSON between the unchanged ones.
+	Documents with text directly in the document element or attributes of
+	it named like its children, and sort_keys, are converted in full every
+	time.
+
+	Raises expat.ExpatError for malformed XML and keeps the last output.
+	"""
+
+	def __init__(self, pretty=True, indent=2, ensure_ascii=False,
+		sort_keys=False, normalize=True, value_key='value'):
+		self.indent = indent if pretty else None
+		self.ensure_ascii = ensure_ascii
+		self.sort_keys = sort_keys
+		self.normalize = normalize
+		self.value_key = value_key
+		encoder = json.JSONEncoder(indent=self.indent,
+			separators=PRETTY_SEPARATORS if self.indent is not None else None)
+		self.item_separator = encoder.item_separator
+		self.key_separator = encoder.key_separator
+		if ensure_ascii:
+			self.encode_string = json.encoder.encode_basestring_ascii
+		else:
+			self.encode_string = json.encoder.encode_basestring
+		self.force_text = _NormalizingSAXHandler(value_key).force_text
+		self.newlines = []
+		self.data = None
+		# JSON output in pieces: one per child of the document element and
+		# the punctuation between them, or the whole text in one piece
+		self.pieces = []
+		self.index = None
+		self.partial = False
+		# shared by the converted children kept in the index, which outlive
+		# the parse that made them
+		self.intern_table = {}
+
+	@property
+	def text(self):
+		return ''.join(self.pieces)
+
+	def update(self, xml_text):
+		data = _to_bytes(xml_text)
+		if data == self.data:
+			return 0, 0, ''
+		pieces = None
+		if self.index is not None and self.data is not None:
+			pieces = self._update_index(data)
+		self.partial = pieces is not None
+		if pieces is None:
+			pieces = self._convert(data)
+		self.data = data
+		return self._splice(pieces)
+
+	def _splice(self, pieces):
+		old = self.pieces
+		self.pieces = pieces
+		if len(old) <= 1 or len(pieces) == 1:
+			old_text, text = ''.join(old), ''.join(pieces)
+			begin = _common_prefix_length(old_text, text)
+			same = _common_suffix_length(old_text, text, min(len(old_text), len(text)) - begin)
+			return begin, len(old_text) - same, text[begin:len(text) - same]
+		# pieces of unchanged children are the same string objects
+		first = 0
+		limit = min(len(old), len(pieces))
+		while first < limit and (old[first] is pieces[first] or old[first] == pieces[first]):
+			first += 1
+		last = 0
+		limit -= first
+		while last < limit and (old[-1 - last] is pieces[-1 - last] or old[-1 - last] == pieces[-1 - last]):
+			last += 1
+		begin = sum(map(len, old[:first]))
+		end = begin + sum(map(len, old[first:len(old) - last]))
+		return begin, end, ''.join(pieces[first:len(pieces) - last])
+
+	def _convert(self, data):
+		self.index = None
+		if not self.sort_keys:
+			handler = _LiveIndexHandler(data, self.normalize, self.value_key,
+				intern_table=self.intern_table).parse(data)
+			if self._indexable(handler, handler.children):
+				self.index = handler
+				return self._pieces()
+		text = xml_to_json(data, pretty=self.indent is not None,
+			indent=self.indent, ensure_ascii=self.ensure_ascii,
+			sort_keys=self.sort_keys, normalize=self.normalize,
+			value_key=self.value_key)
+		return [text]
+
+	def _indexable(self, handler, children):
+		if not children or ''.join(handler.text).strip():
+			return False
+		if self.normalize:
+			names = set(handler.root_attrs[0::2])
+			for child in children:
+				if child.name in names:
+					return False
+		return True
+
+	def _update_index(self, data):
+		index = self.index
+		old = self.data
+		begin = _common_prefix_length(old, data)
+		same = _common_suffix_length(old, data, min(len(old), len(data)) - begin)
+		old_end = len(old) - same
+		shift = len(data) - len(old)
+		if begin < index.content_start or old_end > index.content_end:
+			# the document element's tags or what is outside them changed
+			return None
+		children = index.children
+		# children before the edit are the ones ending at or before it
+		low, high = 0, len(children)
+		while low < high:
+			middle = (low + high) // 2
+			if children[middle].end <= begin:
+				low = middle + 1
+			else:
+				high = middle
+		first = low
+		last = first
+		while last < len(children) and children[last].start < old_end:
+			last += 1
+		start = children[first - 1].end if first else index.content_start
+		stop = children[last].start if last < len(children) else index.content_end
+
+		# parse the changed stretch again between the unchanged prolog and
+		# tags of the document element, so it means what it does in the whole
+		opening = old[:index.content_start]
+		closing = old[index.content_end:index.root_end]
+		document = opening + data[start:stop + shift] + closing
+		handler = _LiveIndexHandler(document, self.normalize, self.value_key,
+			start - len(opening), self.intern_table)
+		handler.parse(document)
+		new_children = children[:first] + handler.children
+		for child in children[last:]:
+			child.start += shift
+			child.end += shift
+			new_children.append(child)
+		if not self._indexable(handler, new_children):
+			for child in children[last:]:
+				child.start -= shift
+				child.end -= shift
+			return None
+		index.children = new_children
+		index.content_end += shift
+		index.root_end += shift
+		return self._pieces()
+
+	def _newline(self, level):
+		if self.indent is None:
+			return ''
+		newlines = self.newlines
+		while len(newlines) <= level:
+			newlines.append('\n' + ' ' * (self.indent * len(newlines)))
+		return newlines[level]
+
+	def _fragment(self, child, context):
+		# context: _SINGLE or _IN_LIST, plus _FORCED when the child gets an
+		# empty text (see apply_attr_text_normalization)
+		value = child.value
+		if context & _FORCED:
+			value = self.force_text(_ordered_dict(value))
+		if isinstance(value, _basestring):
+			fragment = self.encode_string(value)
+		else:
+			chunks = []
+			_encode_walk(value, 3 if context & _IN_LIST else 2, chunks.append,
+				self.encode_string, self._newline, self.item_separator,
+				self.key_separator)
+			fragment = ''.join(chunks)
+		child.context = context
+		child.fragment = fragment
+		return fragment
+
+	def _pieces(self):
+		index = self.index
+		encode_string = self.encode_string
+		groups = _ordered_dict()
+		for child in index.children:
+			group = groups.get(child.name)
+			if group is None:
+				groups[child.name] = [child]
+			else:
+				group.append(child)
+
+		entry = self.item_separator + self._newline(2)
+		item = self.item_separator + self._newline(3)
+		pieces = ['{' + self._newline(1) + encode_string(index.root_name) +
+			self.key_separator + '{' + self._newline(2)]
+		append = pieces.append
+		first = True
+		attrs = index.root_attrs
+		for i in range(0, len(attrs), 2):
+			name = attrs[i] if self.normalize else '@' + attrs[i]
+			append(('' if first else entry) + encode_string(name) +
+				self.key_separator + encode_string(attrs[i + 1]))
+			first = False
+		for name, group in groups.items():
+			key = ('' if first else entry) + encode_string(name) + self.key_separator
+			first = False
+			if len(group) == 1:
+				child = group[0]
+				context = _SINGLE
+				if child.is_leaf and len(child.value) == 1:
+					context |= _FORCED
+				append(key)
+				append(child.fragment if child.context == context else self._fragment(child, context))
+				continue
+			forced = _IN_LIST
+			for child in group:
+				if child.has_text:
+					forced |= _FORCED
+					break
+			append(key + '[' + self._newline(3))
+			separator = None
+			for child in group:
+				if separator is not None:
+					append(separator)
+				separator = item
+				context = forced if child.is_leaf else _IN_LIST
+				append(child.fragment if child.context == context else self._fragment(child, context))
+			pieces.append(self._newline(2) + ']')
+		pieces.append(self._newline(1) + '}' + self._newline(0) + '}')
+		return pieces
+
+class _ChildScanner(object):
+	"""
+	expat handler that only finds the document element and the byte range
+	of each of its children, for xml_to_json_parallel().
+	"""
+	def __init__(self, data):
+		self.data = data
+		self.parser = None
+		self.depth = 0
+		self.root_name = None
+		self.root_attrs = None
+		self.content_start = None
+		self.content_end = None
+		self.root_end = None
+		self.text = []
+		# (start, end) of every child of the document element
+		self.children = []
+		self.names = set()
+		self.start = None
+		self.empty_end = None
+
+	def startElement(self, name, attrs):
+		depth = self.depth
+		self.depth += 1
+		if depth > 1:
+			return
+		index = self.parser.CurrentByteIndex
+		tag_end = _TAG_END.match(self.data, index).end()
+		empty = self.data[tag_end - 2:tag_end] == b'/>'
+		if depth == 0:
+			self.root_name = name
+			self.root_attrs = attrs
+			self.content_start = tag_end
+			if empty:
+				self.content_end = self.root_end = tag_end
+		else:
+			self.names.add(name)
+			self.start = index
+			self.empty_end = tag_end if empty else None
+
+	def endElement(self, name):
+		self.depth -= 1
+		depth = self.depth
+		if depth > 1:
+			return
+		if depth == 1:
+			end = self.empty_end
+			if end is None:
+				end = _TAG_END.match(self.data, self.parser.CurrentByteIndex).end()
+			self.children.append((self.start, end))
+		elif self.content_end is None:
+			index = self.parser.CurrentByteIndex
+			self.content_end = index
+			self.root_end = _TAG_END.match(self.data, index).end()
+
+	def characters(self, data):
+		if self.depth == 1:
+			self.text.append(data)
+
+	def parse(self):
+		parser = self.parser = xmltodict._make_parser(self)
+		parser.Parse(self.data, True)
+		return self
+
+def _convert_children(job):
+	# module level so process pools can pickle it: converts the children in
+	# `document` (the prolog and tags of the document element around a run
+	# of its children) to their JSON as list items, plus the value for the
+	# ones that may need another rendering (see xml_to_json_parallel)
+	document, indent, ensure_ascii, normalize, value_key = job
+	handler = _LiveIndexHandler(document, normalize, value_key).parse(document)
+	live = LiveConversion(indent is not None, indent, ensure_ascii, False,
+		normalize, value_key)
+	counts = {}
+	for child in handler.children:
+		counts[child.name] = counts.get(child.name, 0) + 1
+	results = []
+	for child in handler.children:
+		fragment = live._fragment(child, _IN_LIST)
+		keep = child.is_leaf or counts[child.name] == 1
+		results.append((child.name, child.is_leaf, child.has_text, fragment,
+			child.value if keep else None))
+	return results
+
+# xml_to_json_parallel() converts documents at least this big in parallel
+PARALLEL_MIN_SIZE = 1 << 23
+# smallest run of children (in bytes) handed to one worker
+_PARALLEL_RUN_SIZE = 1 << 20
+
+def xml_to_json_parallel(xml_input, output=None, pretty=True, indent=2,
+	ensure_ascii=False, sort_keys=False, normalize=True, value_key='value',
+	workers=None, progress=None, timings=None, min_size=PARALLEL_MIN_SIZE,
+	spill_size=SPILL_TEXT_SIZE):
+	"""
+	xml_to_json() spread over a process pool, for large documents made of
+	many children of the document element (records). The output is the
+	same as xml_to_json() gives.
+
+	A first pass with expat only records the byte range of every child
+	('scan' stage). Runs of children are then converted in worker
+	processes, each parsed between the prolog and the tags of the document
+	element so they mean what they do in the whole document ('convert').
+	Whether a child is written alone or in a list, and whether an
+	attribute-only child gets an empty text because a sibling of the same
+	name has text, depends on all the children. So the workers write every
+	child as a list item and return the values of the few children that
+	may need another form, and the JSON is joined in order once all
+	workers are done ('join').
+
+	Documents smaller than `min_size` bytes, with sort_keys, with text
+	directly in the document element or with its attributes named like its
+	children, and systems without working multiprocessing, are converted
+	by xml_to_json() instead. progress(done, total) is called with bytes
+	as runs finish and may raise ConversionCancelled.
+	"""
+	data = _to_bytes(xml_input)
+	sequential = lambda: xml_to_json(data, output, pretty, indent,
+		ensure_ascii, sort_keys, normalize, value_key, progress, timings,
+		spill_size)
+	if not pretty:
+		indent = None
+	if sort_keys or len(data) < min_size or ProcessPoolExecutor is None:
+		return sequential()
+	with timed(timings, 'scan', len(data)):
+		scan = _ChildScanner(data).parse()
+	children = scan.children
+	if len(children) < 2 or ''.join(scan.text).strip() or \
+		(normalize and scan.names.intersection(scan.root_attrs[0::2])):
+		return sequential()
+
+	if workers is None:
+		try:
+			import multiprocessing
+			workers = multiprocessing.cpu_count()
+		except (ImportError, NotImplementedError):
+			workers = 2
+	# a few runs per worker, so one slow run does not hold up the rest
+	run_size = max(len(data) // (workers * 4), _PARALLEL_RUN_SIZE)
+	opening = data[:scan.content_start]
+	closing = data[scan.content_end:scan.root_end]
+	runs = []
+	first = 0
+	while first < len(children):
+		last = first + 1
+		start = children[first][0]
+		while last < len(children) and children[last][1] - start < run_size:
+			last += 1
+		runs.append((first, last))
+		first = last
+	jobs = [(opening + data[children[first][0]:children[last - 1][1]] + closing,
+		indent, ensure_ascii, normalize, value_key) for first, last in runs]
+
+	pool = _process_pool(workers)
+	if pool is None:
+		return sequential()
+	results = [None] * len(jobs)
+	with timed(timings, 'convert', len(data)):
+		futures = dict((pool.submit(_convert_children, job), index)
+			for index, job in enumerate(jobs))
+		done = 0
+		try:
+			for future in as_completed(futures):
+				index = futures[future]
+				results[index] = future.result()
+				first, last = runs[index]
+				done += children[last - 1][1] - children[first][0]
+				if progress is not None:
+					progress(done, len(data))
+		finally:
+			for future in futures:
+				future.cancel()
+			pool.shutdown(wait=True)
+
+	with timed(timings, 'join') as stage:
+		live = LiveConversion(pretty, indent, ensure_ascii, False, normalize, value_key)
+		live_children = []
+		for run, converted in zip(runs, results):
+			for (start, end), (name, is_leaf, has_text, fragment, value) in \
+				zip(children[run[0]:run[1]], converted):
+				child = _LiveChild(name, start, end, value, is_leaf, has_text)
+				child.fragment = fragment
+				child.context = _IN_LIST
+				live_children.append(child)
+		scan.children = live_children
+		live.index = scan
+		pieces = live._pieces()
+		if output is None:
+			text = ''.join(pieces)
+			stage.size_out = len(text)
+			return text
+		for piece in pieces:
+			output.write(piece)
+
+# one step of _JSONFormatter: a literal, if there is one, and the
+# punctuation after it, if any
+_JSON_TOKEN = re.compile(r'''[ \t\n\r]*
+	("[^"\\\x00-\x1f]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\\x00-\x1f]*)*"|
+	-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?|
+	true|false|null|NaN|-?Infinity)?
+	[ \t\n\r]*([{}\[\],:]?)''', re.VERBOSE)
+
+# what _JSONFormatter expects next
+_J_VALUE = 0
+_J_VALUE_OR_CLOSE = 1
+_J_KEY = 2
+_J_KEY_OR_CLOSE = 3
+_J_AFTER = 4
+
+_J_EXPECTING = {
+	_J_VALUE: 'Expecting value',
+	_J_VALUE_OR_CLOSE: 'Expecting value',
+	_J_KEY: 'Expecting property name enclosed in double quotes',
+	_J_KEY_OR_CLOSE: 'Expecting property name enclosed in double quotes',
+	_J_AFTER: "Expecting ',' delimiter",
+}
+
+# tokens per block passed on by _JSONFormatter, and between progress reports
+_J_BLOCK_TOKENS = 1 << 14
+
+class _JSONFormatter(object):
+	"""
+	Lays JSON text out again like dumps_json() does for its decoded value,
+	but token by token, without decoding it: strings and numbers are
+	copied as they are, so their escapes and precision stay, and memory
+	does not grow with the size of the value. Invalid JSON raises
+	ValueError.
+	"""
+	def __init__(self, indent=None, separators=(',', ':'), progress=None):
+		if indent is None:
+			self.newlines = ['']
+			self.indent = ''
+		else:
+			if not isinstance(indent, _basestring):
+				indent = ' ' * indent
+			self.newlines = ['\n']
+			self.indent = indent
+		self.item_separator, self.key_separator = separators
+		self.progress = progress
+
+	def newline(self, depth):
+		newlines = self.newlines
+		while len(newlines) <= depth:
+			newlines.append(newlines[-1] + self.indent)
+		return newlines[depth]
+
+	def value(self, text, write, pos=0, end=None, depth=0):
+		"""
+		Pass the value at `pos` in text[:end] to `write` in blocks, laid
+		out as an item `depth` deep, and return the end of it.
+		"""
+		if end is None:
+			end = len(text)
+		newlines = self.newlines
+		item_separator = self.item_separator
+		key_separator = self.key_separator
+		progress = self.progress
+		chunks = []
+		append = chunks.append
+		countdown = _J_BLOCK_TOKENS
+		stack = []
+		state = _J_VALUE
+		for m in _JSON_TOKEN.finditer(text, pos, end):
+			literal, mark = m.groups()
+			if literal is not None:
+				if state == _J_KEY or state == _J_KEY_OR_CLOSE:
+					if literal[0] != '"':
+						self.error(state, m.start(1))
+					if mark != ':':
+						raise ValueError("Expecting ':' delimiter (char %d)" % m.end(1))
+					if state == _J_KEY_OR_CLOSE:
+						append(newlines[depth])
+					append(literal + key_separator)
+					state = _J_VALUE
+					continue
+				if state == _J_VALUE_OR_CLOSE:
+					append(newlines[depth])
+				elif state != _J_VALUE:
+					self.error(state, m.start(1))
+				append(literal)
+				if not stack:
+					write(''.join(chunks))
+					return m.end(1)
+				state = _J_AFTER
+			if not mark:
+				self.error(state, m.end())
+			if mark == ',':
+				if state != _J_AFTER:
+					self.error(state, m.end() - 1)
+				append(item_separator + newlines[depth])
+				state = _J_KEY if stack[-1] == '{' else _J_VALUE
+			elif mark == '{' or mark == '[':
+				if state == _J_VALUE_OR_CLOSE:
+					append(newlines[depth])
+				elif state != _J_VALUE:
+					self.error(state, m.end() - 1)
+				depth += 1
+				if depth == len(newlines):
+					self.newline(depth)
+				stack.append(mark)
+				append(mark)
+				state = _J_KEY_OR_CLOSE if mark == '{' else _J_VALUE_OR_CLOSE
+			elif mark == '}' or mark == ']':
+				empty = _J_KEY_OR_CLOSE if mark == '}' else _J_VALUE_OR_CLOSE
+				if not stack or stack[-1] != ('{' if mark == '}' else '[') or \
+					(state != _J_AFTER and state != empty):
+					self.error(state, m.end() - 1)
+				stack.pop()
+				depth -= 1
+				if state == _J_AFTER:
+					append(newlines[depth] + mark)
+				else:
+					append(mark)
+				if not stack:
+					write(''.join(chunks))
+					return m.end()
+				state = _J_AFTER
+			else:
+				self.error(state, m.end() - 1)
+			countdown -= 1
+			if not countdown:
+				countdown = _J_BLOCK_TOKENS
+				write(''.join(chunks))
+				del chunks[:]
+				if progress is not None:
+					progress(m.end(), len(text))
+		# only reached with nothing left to match
+		self.error(state, end)
+
+	def error(self, state, pos):
+		raise ValueError('%s (char %d)' % (_J_EXPECTING[state], pos))
+
+def format_json(json_input, pretty=True, indent=2, ensure_ascii=False,
+	sort_keys=False, progress=None, timings=None):
+	"""
+	JSON text laid out again, pretty with `indent` or compact. Strings and
+	numbers are copied as they are (see _JSONFormatter), unless sort_keys
+	or ensure_ascii need the value decoded and encoded again.
+	"""
+	if progress is not None:
+		progress(0, len(json_input))
+	if sort_keys or ensure_ascii:
+		with timed(timings, 'decode', len(json_input)):
+			value = json.JSONDecoder(object_pairs_hook=_object_pairs_hook).decode(json_input)
+		if progress is not None:
+			progress(len(json_input) // 2, len(json_input))
+		with timed(timings, 'serialize') as stage:
+			if pretty:
+				text = dumps_json(value, indent=indent, ensure_ascii=ensure_ascii,
+					sort_keys=sort_keys, separators=PRETTY_SEPARATORS)
+			else:
+				text = dumps_json(value, ensure_ascii=ensure_ascii,
+					sort_keys=sort_keys, separators=(',', ':'))
+			stage.size_out = len(text)
+		return text
+	if pretty:
+		formatter = _JSONFormatter(indent, PRETTY_SEPARATORS, progress)
+	else:
+		formatter = _JSONFormatter(None, (',', ':'), progress)
+	with timed(timings, 'reformat', len(json_input)) as stage:
+		blocks = []
+		end = formatter.value(json_input, blocks.append)
+		end = _JSON_BLANK(json_input, end).end()
+		if end != len(json_input):
+			raise ValueError('Extra data (char %d)' % end)
+		text = ''.join(blocks)
+		stage.size_out = len(text)
+	return text
+
+def _format_items(job):
+	# module level so process pools can pickle it: formats the items of a
+	# top-level array in `text`, which starts where an item should. Returns
+	# where it stopped (relative to `offset`), which is the start of the
+	# next item, the end of the last one, or the start of the item that
+	# is not valid JSON; the formatted items; how many there are; and
+	# whether it stopped right after a separator, so that stopping at the
+	# closing ']' there means a dangling ','
+	text, offset, indent, ensure_ascii, sort_keys = job
+	separators = (',', ':') if indent is None else PRETTY_SEPARATORS
+	chunks = []
+	append = chunks.append
+	if sort_keys or ensure_ascii:
+		encode, newline, item_separator = _json_encoder(indent, ensure_ascii,
+			sort_keys, separators)
+		decode = json.JSONDecoder(object_pairs_hook=_object_pairs_hook).raw_decode
+		def item(start):
+			value, end = decode(text, start)
+			encode(value, 1, append)
+			return end
+	else:
+		formatter = _JSONFormatter(indent, separators)
+		newline, item_separator = formatter.newline, formatter.item_separator
+		def item(start):
+			return formatter.value(text, append, start, depth=1)
+	separator = item_separator + newline(1)
+	count = 0
+	stop = 0
+	separated = False
+	while stop < len(text):
+		done = len(chunks)
+		if count:
+			append(separator)
+		try:
+			end = item(stop)
+		except ValueError:
+			del chunks[done:]
+			break
+		count += 1
+		separated = False
+		stop = _JSON_BLANK(text, end).end()
+		if text[stop:stop + 1] != ',':
+			break
+		stop = _JSON_BLANK(text, stop + 1).end()
+		separated = True
+	return offset + stop, ''.join(chunks), count, separated
+
+def format_json_parallel(json_input, pretty=True, indent=2, ensure_ascii=False,
+	sort_keys=False, workers=None, progress=None, timings=None,
+	min_size=PARALLEL_MIN_SIZE):
+	"""
+	format_json() spread over a process pool, for JSON that is one large
+	array. The output is the same as format_json() gives.
+
+	The text is cut where the separator between the first two items (say
+	'},\n  {') appears again, about evenly ('scan' stage), and the items
+	of each piece are decoded and written again in worker processes
+	('format'). A cut may land inside an item, where the same characters
+	occur in a string or a nested array: pieces are only used when the one
+	before them stopped exactly at their start, and from anywhere else the
+	items are formatted again in this process until the next piece fits
+	('join').
+
+	Text smaller than `min_size` characters, that is not an array of
+	several items, or that is not valid JSON, and systems without working
+	multiprocessing, are formatted by format_json() instead, which reports
+	the errors. progress(done, total) is called with characters as pieces
+	finish and may raise ConversionCancelled.
+	"""
+	text = json_input
+	sequential = lambda: format_json(text, pretty, indent, ensure_ascii,
+		sort_keys, progress, timings)
+	if not pretty:
+		indent = None
+	if len(text) < min_size or ProcessPoolExecutor is None:
+		return sequential()
+	with timed(timings, 'scan', len(text)):
+		first = _JSON_BLANK(text).end()
+		if text[first:first + 1] != '[':
+			return sequential()
+		first = _JSON_BLANK(text, first + 1).end()
+		try:
+			end = json.JSONDecoder().raw_decode(text, first)[1]
+		except ValueError:
+			return sequential()
+		second = _JSON_BLANK(text, end).end()
+		if text[second:second + 1] != ',':
+			return sequential()
+		second = _JSON_BLANK(text, second + 1).end()
+		# the closing character of the first item, if it has one, and the
+		# opening one of the second make the separator less likely to
+		# appear anywhere else
+		before = end - 1 if text[end - 1] in '"]}' else end
+		separator = text[before:second + 1]
+		if workers is None:
+			try:
+				import multiprocessing
+				workers = multiprocessing.cpu_count()
+			except (ImportError, NotImplementedError):
+				workers = 2
+		piece_size = max(len(text) // (workers * 4), _PARALLEL_RUN_SIZE)
+		starts = [first]
+		while True:
+			cut = text.find(separator, starts[-1] + piece_size)
+			if cut < 0:
+				break
+			starts.append(cut + len(separator) - 1)
+		ends = starts[1:] + [len(text)]
+	if len(starts) < 2:
+		return sequential()
+
+	pool = _process_pool(workers)
+	if pool is None:
+		return sequential()
+	results = [None] * len(starts)
+	with timed(timings, 'format', len(text)):
+		futures = dict((pool.submit(_format_items, (text[start:end], start,
+			indent, ensure_ascii, sort_keys)), index)
+			for index, (start, end) in enumerate(zip(starts, ends)))
+		done = 0
+		try:
+			for future in as_completed(futures):
+				index = futures[future]
+				results[index] = future.result()
+				done += ends[index] - starts[index]
+				if progress is not None:
+					progress(done, len(text))
+		finally:
+			for future in futures:
+				future.cancel()
+			pool.shutdown(wait=True)
+
+	with timed(timings, 'join') as stage:
+		chunks = []
+		position = first
+		# whether `position` follows a ',' after the last item
+		separated = False
+		for start, end, result in zip(starts, ends, results):
+			if start != position:
+				result = _format_items((text[position:end], position,
+					indent, ensure_ascii, sort_keys))
+			position, chunk, count, after_separator = result
+			if count:
+				chunks.append(chunk)
+				separated = after_separator
+		if separated or text[position:position + 1] != ']' or \
+			_JSON_BLANK(text, position + 1).end() != len(text):
+			# not an array, or not valid JSON
+			return sequential()
+		encode, newline, item_separator = _json_encoder(indent, ensure_ascii,
+			sort_keys, PRETTY_SEPARATORS if pretty else (',', ':'))
+		formatted = '[' + newline(1) + (item_separator + newline(1)).join(chunks) + \
+			newline(0) + ']'
+		stage.size_out = len(formatted)
+	return formatted
+
+# reformat_xml() decides whether an element's content may be indented
+# looking ahead at most this many characters of it
+_REFORMAT_LOOKAHEAD = 1 << 16
+
+_XML_BLANK = ' \t\r\n'
+
+# how the content of an element is written: not known yet, indented, or
+# as it is; and what is outside the document element
+_UNDECIDED = None
+_INDENT = 1
+_PRESERVE = 2
+_TOP = 3
+
+# reformat_xml() events
+_EV_START = 0
+_EV_END = 1
+_EV_TEXT = 2
+_EV_CDATA = 3
+_EV_MARKUP = 4
+# an element with nothing but text in it, as (frame, text)
+_EV_LEAF = 5
+
+def _escape_xml_text(text):
+	text = xmltodict._escape_text(text)
+	if '\r' in text:
+		# or it would be read back as a newline
+		text = text.replace('\r', '&#13;')
+	return text
+
+class _ReformatFrame(object):
+	__slots__ = ('name', 'tag', 'mode', 'outer', 'inner', 'has_children')
+
+	def __init__(self, name, tag, mode, outer, inner):
+		self.name = name
+		# '<name attr="..."' without the closing '>'
+		self.tag = tag
+		self.mode = mode
+		# the line breaks and indents before the element and its children
+		self.outer = outer
+		self.inner = inner
+		self.has_children = False
+
+class _XMLReformatter(object):
+	"""
+	expat handler for reformat_xml(): writes the document again as the
+	events come in, without building a tree.
+
+	Elements holding only other elements, comments and processing
+	instructions (and whitespace) are indented. An element with other text
+	or CDATA directly in it has mixed content, which is written as it is,
+	with everything inside it, so no whitespace is added where it would
+	change the text; so is the content of elements with
+	xml:space="preserve". Whether an element has text is only known later,
+	so the events inside undecided elements wait in a queue; past
+	_REFORMAT_LOOKAHEAD characters the outermost of them is indented.
+	"""
+	def __init__(self, write, data, indent, empty_tag_style, encoding):
+		self.write = write
+		self.data = data
+		self.encoding = encoding
+		self.indent = indent
+		if empty_tag_style == 'expanded':
+			self.empty_end = None
+		elif empty_tag_style == 'spaced':
+			self.empty_end = ' />'
+		else:
+			self.empty_end = '/>'
+		self.newlines = []
+		self.parser = None
+		# parsing side: open elements, text not queued yet, the doctype
+		# being read, and the queued (kind, value, size) events
+		self.stack = []
+		self.text = []
+		self.cdata = None
+		self.doctype = None
+		self.events = deque()
+		self.queued = 0
+		# the innermost element while nothing but text has come after its
+		# start tag: if it ends like that it is queued as one _EV_LEAF
+		self.leaf = None
+		# writing side: open elements, and whether the last start tag
+		# still needs its '>'
+		self.open = []
+		self.pending = False
+		self.started = False
+
+	def newline(self, depth):
+		newlines = self.newlines
+		while len(newlines) <= depth:
+			if self.indent is None:
+				newlines.append('')
+			else:
+				newlines.append('\n' + self.indent * len(newlines))
+		return newlines[depth]
+
+	def queue(self, kind, value, size=1, decided=False):
+		# events can only be written when the element they are in is
+		# decided: when that just happened or nothing waits before them
+		events = self.events
+		events.append((kind, value, size))
+		self.queued += size
+		if self.queued > _REFORMAT_LOOKAHEAD:
+			for frame in self.stack:
+				if frame.mode is _UNDECIDED:
+					frame.mode = _INDENT
+					break
+			self.drain()
+		elif decided or len(events) == 1:
+			self.drain()
+
+	def open_leaf(self):
+		frame = self.leaf
+		self.leaf = None
+		self.queue(_EV_START, frame, len(frame.tag))
+
+	def before_markup(self):
+		if self.leaf is not None:
+			self.open_leaf()
+		if self.text:
+			self.flush_text()
+
+	def flush_text(self):
+		text = ''.join(self.text)
+		del self.text[:]
+		if self.stack:
+			frame = self.stack[-1]
+			if frame.mode is _UNDECIDED and text.strip(_XML_BLANK):
+				frame.mode = _PRESERVE
+				self.queue(_EV_TEXT, text, len(text), True)
+			else:
+				self.queue(_EV_TEXT, text, len(text))
+
+	# expat handlers
+
+	def xmlDecl(self, version, encoding, standalone):
+		decl = '<?xml version="%s"' % version
+		if encoding:
+			decl += ' encoding="%s"' % encoding
+			if self.encoding is None:
+				self.encoding = encoding
+		if standalone != -1:
+			decl += ' standalone="%s"' % ('yes' if standalone else 'no')
+		self.queue(_EV_MARKUP, decl + '?>')
+
+	def startDoctype(self, name, system_id, public_id, has_internal_subset):
+		doctype = '<!DOCTYPE ' + name
+		if public_id:
+			doctype += ' PUBLIC "%s" "%s"' % (public_id, system_id)
+		elif system_id:
+			doctype += ' SYSTEM "%s"' % system_id
+		# expat is at the '[' of the internal subset, which is copied
+		self.doctype = (doctype,
+			self.parser.CurrentByteIndex if has_internal_subset else None)
+
+	def endDoctype(self):
+		doctype, start = self.doctype
+		self.doctype = None
+		if start is not None:
+			subset = self.data[start:self.parser.CurrentByteIndex]
+			doctype += ' ' + subset.decode(self.encoding or 'utf-8')
+		self.queue(_EV_MARKUP, doctype + '>')
+
+	def startElement(self, name, attrs):
+		if self.leaf is not None:
+			self.open_leaf()
+		if self.text:
+			self.flush_text()
+		stack = self.stack
+		mode = _UNDECIDED
+		if stack and stack[-1].mode is _PRESERVE:
+			mode = _PRESERVE
+		if attrs:
+			tag = [name]
+			quote = xmltodict._quote_attr
+			for index in range(0, len(attrs), 2):
+				key, value = attrs[index], attrs[index + 1]
+				tag.append(key + '=' + quote(value))
+				if key == 'xml:space' and value == 'preserve':
+					mode = _PRESERVE
+			tag = '<' + ' '.join(tag)
+		else:
+			tag = '<' + name
+		depth = len(stack)
+		newlines = self.newlines
+		if depth + 1 >= len(newlines):
+			self.newline(depth + 1)
+		frame = _ReformatFrame(name, tag, mode, newlines[depth], newlines[depth + 1])
+		stack.append(frame)
+		self.leaf = frame
+
+	def endElement(self, name):
+		frame = self.leaf
+		if frame is not None:
+			self.leaf = None
+			self.stack.pop()
+			text = ''.join(self.text)
+			del self.text[:]
+			self.queue(_EV_LEAF, (frame, text), len(frame.tag) + len(text))
+			return
+		if self.text:
+			self.flush_text()
+		frame = self.stack.pop()
+		if frame.mode is _UNDECIDED:
+			frame.mode = _INDENT
+		self.queue(_EV_END, frame, 1, True)
+
+	def characters(self, data):
+		if self.cdata is not None:
+			self.cdata.append(data)
+		else:
+			self.text.append(data)
+
+	def startCdata(self):
+		self.before_markup()
+		self.cdata = []
+
+	def endCdata(self):
+		data = ''.join(self.cdata)
+		self.cdata = None
+		frame = self.stack[-1]
+		decided = frame.mode is _UNDECIDED
+		if decided:
+			frame.mode = _PRESERVE
+		self.queue(_EV_CDATA, '<![CDATA[' + data + ']]>', len(data), decided)
+
+	def comment(self, data):
+		# comments in the internal subset are part of the doctype
+		if self.doctype is None:
+			self.before_markup()
+			self.queue(_EV_MARKUP, '<!--' + data + '-->', len(data))
+
+	def processingInstruction(self, target, data):
+		if self.doctype is None:
+			self.before_markup()
+			markup = '<?' + target + (' ' + data if data else '') + '?>'
+			self.queue(_EV_MARKUP, markup, len(markup))
+
+	# writing
+
+	def drain(self):
+		events = self.events
+		open_frames = self.open
+		write = self.write
+		pending = self.pending
+		while events:
+			kind, value, size = events[0]
+			if kind == _EV_END:
+				mode = value.mode
+			elif open_frames:
+				mode = open_frames[-1].mode
+				if mode is _UNDECIDED:
+					break
+			else:
+				mode = _TOP
+			events.popleft()
+			self.queued -= size
+			if kind == _EV_END:
+				open_frames.pop()
+				if pending:
+					pending = False
+					if self.empty_end is None:
+						write('></' + value.name + '>')
+					else:
+						write(self.empty_end)
+				elif value.has_children and mode == _INDENT:
+					write(value.outer + '</' + value.name + '>')
+				else:
+					write('</' + value.name + '>')
+				continue
+			if kind == _EV_TEXT:
+				if mode == _INDENT and not value.strip(_XML_BLANK):
+					# whitespace between elements
+					continue
+				# (other text in an indented element, which was too far
+				# ahead to be seen, stays where it is)
+				value = _escape_xml_text(value)
+			elif kind == _EV_LEAF:
+				frame, text = value
+				if text and (mode == _PRESERVE or frame.mode is _PRESERVE or \
+					text.strip(_XML_BLANK)):
+					value = frame.tag + '>' + _escape_xml_text(text) + '</' + frame.name + '>'
+				elif self.empty_end is None:
+					value = frame.tag + '></' + frame.name + '>'
+				else:
+					value = frame.tag + self.empty_end
+			if pending:
+				write('>')
+				pending = False
+			if mode == _INDENT and kind != _EV_TEXT:
+				parent = open_frames[-1]
+				parent.has_children = True
+				write(parent.inner)
+			elif mode == _TOP:
+				# one node per line
+				if self.started:
+					write('\n')
+				self.started = True
+			if kind == _EV_START:
+				if mode == _PRESERVE:
+					# whatever was decided inside, this is mixed content
+					value.mode = _PRESERVE
+				write(value.tag)
+				pending = True
+				open_frames.append(value)
+			else:
+				write(value)
+		self.pending = pending
+
+	def parse(self, progress=None):
+		parser = self.parser = xmltodict._make_parser(self, self.encoding)
+		parser.XmlDeclHandler = self.xmlDecl
+		parser.StartDoctypeDeclHandler = self.startDoctype
+		parser.EndDoctypeDeclHandler = self.endDoctype
+		parser.StartCdataSectionHandler = self.startCdata
+		parser.EndCdataSectionHandler = self.endCdata
+		parser.CommentHandler = self.comment
+		parser.ProcessingInstructionHandler = self.processingInstruction
+		feed_parser(parser, self.data, progress)
+		self.drain()
+
+def reformat_xml(xml_input, output=None, pretty=True, indent='  ',
+	empty_tag_style='compact', progress=None, timings=None):
+	"""
+	The XML written again, indented with `indent` or compact, straight from
+	the parser events. Unlike a round trip through xmltodict, comments,
+	processing instructions, CDATA sections, the doctype, the XML
+	declaration (only if there is one) and mixed content are kept; see
+	_XMLReformatter. Memory use grows with the nesting depth, not with the
+	size of the document.
+	"""
+	data = _to_bytes(xml_input)
+	# text was just encoded as UTF-8, whatever the declaration says
+	encoding = 'utf-8' if isinstance(xml_input, _unicode) else None
+	chunks = []
+	if output is None:
+		write = chunks.append
+	else:
+		def write(text):
+			chunks.append(text)
+			if len(chunks) >= 4096:
+				output.write(''.join(chunks))
+				del chunks[:]
+	with timed(timings, 'reformat', len(data)) as stage:
+		formatter = _XMLReformatter(write, data, indent if pretty else None,
+			empty_tag_style, encoding)
+		formatter.parse(progress)
+		if output is not None:
+			output.write(''.join(chunks))
+			return
+		text = ''.join(chunks)
+		stage.size_out = len(text)
+	return text
+
+def wrap_for_xml(data, root_name='root'):
+	"""
+	Wrap decoded JSON so xmltodict.unparse() can write it as one document.
+	"""
+	# decide if we need to wrap the data
+	if isinstance(data, list):
+		# Case 1: List at root level (e.g. [{}, {}]) -> Wrap in item tags under root
+		return _ordered_dict([(
+			root_name,
+			_ordered_dict([("item", data)])
+		)])
+	elif not isinstance(data, dict):
+		# Case 2: Primitive types (string, int, etc.) -> Wrap directly
+		return _ordered_dict([(root_name, data)])
+
+	# Case 3: Dictionary
+	# We must wrap if:
+	# A) There are multiple keys (e.g. {"a":1, "b":2})
+	# OR
+	# B) There is exactly 1 key, BUT its value is a LIST (e.g. {"string": [{}, {}]})
+	#    Because xmltodict expands lists into sibling nodes, creating multiple roots.
+
+	need_wrap = False
+	if len(data) > 1:
+		need_wrap = True
+	elif len(data) == 1:
+		first_key = list(data.keys())[0]
+		first_value = list(data.values())[0]
+
+		# 1. If value is a list, xmltodict creates multiple roots -> Must Wrap
+		if isinstance(first_value, list):
+			need_wrap = True
+		# 2. If key looks like an attribute (@...) or text (#text),
+		#    it cannot be a root tag name -> Must Wrap
+		elif first_key.startswith('@') or first_key == '#text':
+			need_wrap = True
+
+	if need_wrap:
+		return _ordered_dict([(root_name, data)])
+	return data
+
+# blanks JSON allows between values
+_JSON_BLANK = re.compile(r'[ \t\n\r]*').match
+_JSON_NUMBER_CHARS = frozenset('0123456789.eE+-')
+# longest first line of JSON Lines that is checked for a whole array
+_FIRST_LINE_LIMIT = 1 << 20
+
+class _JSONReader(object):
+	"""
+	Decodes JSON values one at a time with raw_decode() and a moving index.
+	Text comes from `text`, or is read from the file-like `source` in
+	chunks; only the part not decoded yet is kept. progress(done, total)
+	is called as the position passes each `chunk_size` characters of `text`.
+	"""
+	def __init__(self, text='', source=None, progress=None, chunk_size=CHUNK_SIZE):
+		self.decoder = json.JSONDecoder(object_pairs_hook=_object_pairs_hook)
+		self.text = text
+		self.pos = 0
+		# characters dropped from the front of `text`
+		self.offset = 0
+		self.source = source
+		self.chunk_size = chunk_size
+		self.progress = progress
+		self.reported = 0
+
+	def _more(self):
+		# a value longer than what is buffered reads as much again, so
+		# retrying its decode stays linear
+		if self.source is None:
+			return False
+		data = self.source.read(max(self.chunk_size, len(self.text) - self.pos))
+		if not data:
+			self.source = None
+			return False
+		self.offset += self.pos
+		self.text = self.text[self.pos:] + data
+		self.pos = 0
+		return True
+
+	def peek(self):
+		"""
+		The next character that is not a blank, or '' at the end.
+		"""
+		while True:
+			self.pos = _JSON_BLANK(self.text, self.pos).end()
+			if self.pos < len(self.text):
+				return self.text[self.pos]
+			if not self._more():
+				return ''
+
+	def error(self, message):
+		return ValueError('{} (char {})'.format(message, self.offset + self.pos))
+
+	def value(self):
+		self.peek()
+		while True:
+			try:
+				value, end = self.decoder.raw_decode(self.text, self.pos)
+			except ValueError:
+				if self._more():
+					continue
+				raise
+			# a number cut off by the end of the buffer ('12', '2.' of
+			# '2.5') decodes to the wrong value: read on while it may go on
+			if (end == len(self.text) or self.text[end] in _JSON_NUMBER_CHARS) \
+				and self._more():
+				continue
+			break
+		self.pos = end
+		if self.progress is not None and end - self.reported >= self.chunk_size:
+			self.reported = end
+			self.progress(end, len(self.text))
+		return value
+
+	def array_items(self):
+		"""
+		The items of the array whose '[' was just read.
+		"""
+		if self.peek() == ']':
+			self.pos += 1
+		else:
+			while True:
+				yield self.value()
+				delimiter = self.peek()
+				if delimiter not in (',', ']') or not delimiter:
+					raise self.error("Expecting ',' delimiter or ']'")
+				self.pos += 1
+				if delimiter == ']':
+					break
+		if self.peek():
+			raise self.error('Extra data')
+
+	def values(self, first):
+		"""
+		`first` and the values after it, for JSON Lines.
+		"""
+		yield first
+		while self.peek():
+			yield self.value()
+
+	def _first_line_value(self):
+		# JSON Lines may start with an array too: a first line of reasonable
+		# length that holds a whole value, with more after it, is taken for
+		# one; anything else starting with '[' is streamed as an array
+		while True:
+			line_end = self.text.find('\n', self.pos, self.pos + _FIRST_LINE_LIMIT)
+			if line_end != -1:
+				break
+			if len(self.text) - self.pos >= _FIRST_LINE_LIMIT or not self._more():
+				return None
+		try:
+			value, end = self.decoder.raw_decode(self.text[self.pos:line_end])
+		except ValueError:
+			return None
+		if _JSON_BLANK(self.text, self.pos + end).end() < line_end:
+			return None
+		line_length = line_end - self.pos
+		# _more() keeps the buffer from self.pos on, so the line stays
+		while _JSON_BLANK(self.text, self.pos + line_length).end() == len(self.text):
+			if not self._more():
+				return None
+		self.pos += line_length
+		return value
+
+	def document(self):
+		"""
+		(value, None) for a single JSON value, or (None, records) with a
+		generator that decodes the items of a top-level array or the values
+		of JSON Lines (one value per line) as it is consumed.
+		"""
+		if self.peek() == '[':
+			first_line = self._first_line_value()
+			if first_line is None:
+				self.pos += 1
+				return None, self.array_items()
+			return None, self.values(first_line)
+		value = self.value()
+		if not self.peek():
+			return value, None
+		return None, self.values(value)
+
+class _DecodingReader(object):
+	"""
+	Text from a binary file read as UTF-8, reporting progress(done, total)
+	in bytes.
+	"""
+	def __init__(self, source, total=None, progress=None, encoding='utf-8-sig'):
+		self.source = source
+		self.total = total
+		self.progress = progress
+		self.decoder = codecs.getincrementaldecoder(encoding)()
+		self.done = 0
+
+	def read(self, size):
+		while True:
+			data = self.source.read(size)
+			self.done += len(data)
+			if self.progress is not None:
+				self.progress(self.done, self.total)
+			text = self.decoder.decode(data, not data)
+			if text or not data:
+				return text
+
+def json_to_xml(json_input, output=None, pretty=True, root_name='root',
+	full_document=True, indent='  ', empty_tag_style='compact', progress=None,
+	timings=None):
+	"""
+	Convert JSON (str, or a text file object that is read in chunks) to
+	XML. Returns the XML string, or writes it to the text stream `output`
+	and returns None.
+
+	A top-level array and JSON Lines (several values, one per line) both
+	become <item> elements under `root_name`. Their values are decoded
+	one at a time as the XML is written, so only one is in memory at once.
+	Those conversions are a single 'stream' stage of `timings`; other
+	documents record 'decode' and 'unparse'.
+	"""
+	if hasattr(json_input, 'read'):
+		reader = _JSONReader(source=json_input)
+		total = None
+	else:
+		reader = _JSONReader(json_input, progress=progress)
+		total = len(json_input)
+		if progress is not None:
+			progress(0, total)
+	root_name = root_name or 'root'
+	unparse = lambda data: xmltodict.unparse(
+		data,
+		output=output,
+		pretty=pretty,
+		full_document=full_document,
+		indent=indent,
+		empty_tag_style=empty_tag_style,
+		emitter='direct')
+
+	with timed(timings, 'decode', total) as stage:
+		data, records = reader.document()
+		if records is not None:
+			stage.name = 'stream'
+			result = unparse(_ordered_dict([(root_name, _ordered_dict([('item', records)]))]))
+			if result is not None:
+				stage.size_out = len(result)
+	if records is None:
+		if progress is not None and total is not None:
+			progress(total // 2, total)
+		with timed(timings, 'unparse') as stage:
+			result = unparse(wrap_for_xml(data, root_name))
+			if result is not None:
+				stage.size_out = len(result)
+	if progress is not None and total is not None:
+		progress(total, total)
+	return result
+
+
+def _normalize_block(text, newline, trim):
+	# each step only copies the text when it has something to change, so
+	# the usual clean output from json/xmltodict goes through untouched
+	if '\r' in text:
+		text = text.replace('\r\n', '\n').replace('\r', '\n')
+	if trim and (' \n' in text or '\t\n' in text):
+		text = '\n'.join([line.rstrip(' \t') for line in text.split('\n')])
+	if newline != '\n':
+		text = text.replace('\n', newline)
+	return text
+
+class NewlineWriter(io.TextIOBase):
+	"""
+	Text stream that applies the newline settings to everything written
+	through it: newlines become `newline`, trailing spaces/tabs are trimmed
+	and, on finish(), a final newline is added if missing. Output is passed
+	on to `out` in blocks of about `buffer_size` characters.
+
+	Call finish() when done; close() does not flush, so a writer dropped half
+	way (e.g. after StreamFallback) never appends to its target.
+	"""
+
+	def __init__(self, out, newline='\n', trim_trailing_whitespace=True,
+		ensure_final_newline=True, buffer_size=1 << 16):
+		self.out = out
+		self.newline = newline or '\n'
+		self.trim = trim_trailing_whitespace
+		self.ensure_final_newline = ensure_final_newline
+		self.buffer_size = buffer_size
+		self.chunks = []
+		self.buffered = 0
+		self.held = ''
+		self.ends_with_newline = False
+
+	def writable(self):
+		return True
+
+	def write(self, text):
+		self.chunks.append(text)
+		self.buffered += len(text)
+		if self.buffered >= self.buffer_size:
+			self._flush_chunks(False)
+		return len(text)
+
+	def _flush_chunks(self, final):
+		text = self.held + ''.join(self.chunks)
+		self.chunks = []
+		self.buffered = 0
+		if not final:
+			# a trailing '\r' may be half of '\r\n', trailing blanks may end a line
+			cut = len(text.rstrip(' \t\r' if self.trim else '\r'))
+			self.held = text[cut:]
+			text = text[:cut]
+		else:
+			self.held = ''
+			if self.trim:
+				text = text.rstrip(' \t')
+		if not text:
+			return
+		text = _normalize_block(text, self.newline, self.trim)
+		self.ends_with_newline = text.endswith(('\n', '\r'))
+		self.out.write(text)
+
+	def finish(self):
+		self._flush_chunks(True)
+		if self.ensure_final_newline and not self.ends_with_newline:
+			self.out.write(self.newline)
+
+
+def normalize_newlines(text, newline=None, trim_trailing_whitespace=True,
+	ensure_final_newline=True, source_text=None, clean=False,
+	block_size=CHUNK_SIZE):
+	"""
+	Give `text` uniform line endings: `newline`, or when None the ending of
+	the first line of `source_text` (default '\n'). Optionally trims
+	trailing spaces/tabs from every line and adds a missing final newline.
+
+	Text that needs trimming or mixes line endings is rewritten in blocks of
+	`block_size` characters through a NewlineWriter, so only one extra copy
+	of a large document is ever alive. Pass clean=True for text known to use
+	'\n' only and to have no trailing blanks, such as JSON from this module,
+	to skip looking for either.
+	"""
+	if newline is None:
+		newline = (source_text and detect_newline(source_text)) or '\n'
+	if clean:
+		if newline != '\n':
+			text = text.replace('\n', newline)
+		if ensure_final_newline and not text.endswith(newline):
+			text += newline
+		return text
+	trim = trim_trailing_whitespace
+	if len(text) > block_size and ('\r' in text or
+		(trim and (' \n' in text or '\t\n' in text))):
+		out = []
+		writer = NewlineWriter(_ListWriter(out), newline, trim,
+			ensure_final_newline, block_size)
+		for start in range(0, len(text), block_size):
+			writer.write(text[start:start + block_size])
+		writer.finish()
+		return ''.join(out)
+
+	text = _normalize_block(text, newline, trim)
+	if trim:
+		text = text.rstrip(' \t')
+	if ensure_final_newline and not text.endswith(('\n', '\r')):
+		text += newline
+	return text
+
+class _ListWriter(object):
+	__slots__ = ('write',)
+
+	def __init__(self, chunks):
+		self.write = chunks.append
+
+
+def detect_newline(sample):
+	"""
+	Line ending used by the first line of `sample` (str or bytes), or None.
+	"""
+	if isinstance(sample, bytes):
+		sample = sample.decode('latin-1')
+	match = re.search('\r\n|\r|\n', sample)
+	return match.group(0) if match else None
+
+_EXTENSIONS = {'json': '.json', 'ndjson': '.jsonl', 'xml': '.xml'}
+_JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
+
+def _target_extension(source_path, to):
+	return os.path.splitext(source_path)[0] + _EXTENSIONS[to]
+
+def guess_direction(source_path):
+	"""
+	'json' for XML sources, 'xml' for JSON and JSON Lines sources, judged
+	by extension.
+	"""
+	ext = os.path.splitext(source_path)[1].lower()
+	if ext == '.json' or ext in _JSON_LINES_EXTENSIONS:
+		return 'xml'
+	return 'json'
+
+def convert_file(source_path, target_path=None, to=None, pretty=True,
+	indent=2, ensure_ascii=False, sort_keys=False, normalize=True,
+	value_key='value', root_name='root', full_document=True,
+	xml_indent='  ', empty_tag_style='compact', newline=None,
+	trim_trailing_whitespace=True, ensure_final_newline=True,
+	progress=None, chunk_size=CHUNK_SIZE, records=NDJSON_RECORDS,
+	parallel=False, workers=None, spill_size=SPILL_TEXT_SIZE):
+	"""
+	Convert the file at `source_path` and write the result to `target_path`
+	without holding either document in memory as a whole.
+
+	`to` is 'json', 'ndjson' (JSON Lines of the `records` path, see
+	xml_to_ndjson()) or 'xml', guessed from the extension when None. XML is
+	read `chunk_size` bytes at a time and fed to expat incrementally. JSON is
+	read in chunks as well; a single document has to be decoded in one
+	piece, but top-level arrays and JSON Lines are decoded one value at a
+	time (see json_to_xml()), and the XML is written out as it is
+	generated. With `parallel`, XML to JSON reads the whole file and goes
+	through xml_to_json_parallel() with `workers` processes instead. Text
+	nodes of `spill_size` characters or more are copied from XML to JSON
+	through a temporary file (see xml_to_json()).
+	`newline=None` keeps the line ending of the source's first line.
+	Returns the target path.
+	"""
+	if to is None:
+		to = guess_direction(source_path)
+		if to == 'json' and target_path and \
+			os.path.splitext(target_path)[1].lower() in _JSON_LINES_EXTENSIONS:
+			to = 'ndjson'
+	if target_path is None:
+		target_path = _target_extension(source_path, to)
+	total = os.path.getsize(source_path)
+	# write next to the target and rename at the end, so a failed or
+	# cancelled run leaves an existing target untouched
+	partial_path = target_path + '.part'
+	try:
+		_convert_file(source_path, partial_path, to, total, pretty, indent,
+			ensure_ascii, sort_keys, normalize, value_key, root_name,
+			full_document, xml_indent, empty_tag_style, newline,
+			trim_trailing_whitespace, ensure_final_newline, progress, chunk_size,
+			records, parallel, workers, spill_size)
+		_replace_file(partial_path, target_path)
+	except BaseException:
+		if os.path.exists(partial_path):
+			os.remove(partial_path)
+		raise
+	return target_path
+
+def _replace_file(source_path, target_path):
+	if hasattr(os, 'replace'):
+		os.replace(source_path, target_path)
+	else:
+		if os.path.exists(target_path):
+			os.remove(target_path)
+		os.rename(source_path, target_path)
+
+def _convert_file(source_path, target_path, to, total, pretty, indent,
+	ensure_ascii, sort_keys, normalize, value_key, root_name, full_document,
+	xml_indent, empty_tag_style, newline, trim_trailing_whitespace,
+	ensure_final_newline, progress, chunk_size, records=NDJSON_RECORDS,
+	parallel=False, workers=None, spill_size=SPILL_TEXT_SIZE):
+	with open(source_path, 'rb') as source:
+		if newline is None:
+			newline = detect_newline(source.read(1 << 16)) or '\n'
+			source.seek(0)
+		with io.open(target_path, 'w', encoding='utf-8', newline='') as target:
+			def make_writer():
+				# JSON from this module never has trailing blanks to trim
+				return NewlineWriter(target, newline,
+					trim_trailing_whitespace and to == 'xml', ensure_final_newline)
+
+			writer = make_writer()
+			if to == 'xml':
+				json_to_xml(_DecodingReader(source, total, progress), writer, pretty,
+					root_name, full_document, xml_indent, empty_tag_style)
+				writer.finish()
+				return
+
+			if to == 'ndjson':
+				try:
+					_feed_file(_ndjson_parser(writer.write, records, ensure_ascii,
+						sort_keys, normalize, value_key), source, total, progress, chunk_size)
+				except xmltodict.ParsingInterrupted:
+					pass
+				writer.finish()
+				return
+
+			if parallel:
+				writer.write(xml_to_json_parallel(source.read(), None, pretty,
+					indent, ensure_ascii, sort_keys, normalize, value_key, workers,
+					progress, spill_size=spill_size))
+				writer.finish()
+				return
+
+			if not pretty:
+				indent = None
+			if not sort_keys:
+				handler = _JSONStreamHandler(writer.write, indent, ensure_ascii,
+					normalize, value_key, spill_size)
+				parser = handler.parser = xmltodict._make_parser(handler)
+				try:
+					_feed_file(parser, source, total, progress, chunk_size)
+					writer.finish()
+					return
+				except StreamFallback:
+					source.seek(0)
+					target.seek(0)
+					target.truncate()
+					writer = make_writer()
+
+			writer.write(_xml_to_json_tree(source.read(), indent, ensure_ascii,
+				sort_keys, normalize, value_key, progress))
+			writer.finish()
+
+
+def _feed_file(parser, source, total, progress, chunk_size):
+	done = 0
+	while True:
+		chunk = source.read(chunk_size)
+		if not chunk:
+			break
+		parser.Parse(chunk, False)
+		done += len(chunk)
+		if progress is not None:
+			progress(done, total)
+	parser.Parse(b'', True)
+
+def convert_file_with_settings(source_path, target_path=None, settings=None,
+	to=None, progress=None, parallel=False, workers=None):
+	"""
+	convert_file() with the options taken from a ConversionSettings.
+	"""
+	settings = settings or ConversionSettings()
+	return convert_file(
+		source_path,
+		target_path,
+		to=to,
+		pretty=settings.pretty,
+		indent=settings.json_indent,
+		ensure_ascii=settings.ensure_ascii,
+		sort_keys=settings.sort_keys,
+		normalize=settings.normalize,
+		value_key=settings.value_key,
+		root_name=settings.root_name,
+		full_document=settings.xml_declaration,
+		xml_indent=settings.xml_indent,
+		empty_tag_style=settings.empty_tag_style,
+		newline=settings.line_ending,
+		trim_trailing_whitespace=settings.trim_trailing_whitespace,
+		ensure_final_newline=settings.ensure_final_newline,
+		progress=progress,
+		records=settings.json_lines_records,
+		parallel=parallel,
+		workers=workers,
+		spill_size=settings.spill_text_min_size)
+
+
+FileResult = namedtuple('FileResult', 'source target status error size seconds')
+
+class BatchSummary(object):
+	"""
+	Per-file results of convert_folder() and the totals over them.
+	"""
+	def __init__(self, results, seconds):
+		self.results = results
+		self.seconds = seconds
+
+	def count(self, status):
+		return sum(1 for result in self.results if result.status == status)
+
+	@property
+	def converted_bytes(self):
+		return sum(result.size for result in self.results if result.status == 'converted')
+
+	@property
+	def files_per_second(self):
+		return self.count('converted') / self.seconds if self.seconds else 0.0
+
+	@property
+	def mb_per_second(self):
+		return self.converted_bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+	def __str__(self):
+		return '{} converted, {} skipped, {} failed in {:.2f}s ({:.1f} files/s, {:.2f} MB/s)'.format(
+			self.count('converted'), self.count('skipped'), self.count('failed'),
+			self.seconds, self.files_per_second, self.mb_per_second)
+
+
+def find_files(folder, include=('*',), exclude=()):
+	"""
+	Paths below `folder` whose name or folder-relative path matches one of
+	the `include` globs and none of the `exclude` globs, in sorted order.
+	"""
+	def matches(name, relative, patterns):
+		return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative, pattern)
+			for pattern in patterns)
+
+	found = []
+	for dirpath, dirnames, filenames in os.walk(folder):
+		dirnames.sort()
+		for name in sorted(filenames):
+			path = os.path.join(dirpath, name)
+			relative = os.path.relpath(path, folder).replace(os.sep, '/')
+			if matches(name, relative, include) and not matches(name, relative, exclude):
+				found.append(path)
+	return found
+
+def _batch_target(source_path, folder, output_folder, to):
+	target = _target_extension(source_path, to)
+	if output_folder:
+		target = os.path.join(output_folder, os.path.relpath(target, folder))
+	return target
+
+def _convert_batch_file(job):
+	# module level so process pools can pickle it
+	source, target, to, settings, skip_newer = job
+	started = time.time()
+	try:
+		size = os.path.getsize(source)
+		if skip_newer and os.path.exists(target) and \
+			os.path.getmtime(target) >= os.path.getmtime(source):
+			return FileResult(source, target, 'skipped', None, size, 0.0)
+		target_dir = os.path.dirname(target)
+		if target_dir and not os.path.isdir(target_dir):
+			try:
+				os.makedirs(target_dir)
+			except OSError:
+				# another worker may have created it meanwhile
+				if not os.path.isdir(target_dir):
+					raise
+		convert_file_with_settings(source, target, settings, to)
+		return FileResult(source, target, 'converted', None, size, time.time() - started)
+	except Exception as e:
+		return FileResult(source, target, 'failed', str(e) or e.__class__.__name__,
+			0, time.time() - started)
+
+def _process_pool(workers):
+	if ProcessPoolExecutor is None:
+		return None
+	try:
+		return ProcessPoolExecutor(workers)
+	except (OSError, NotImplementedError, ImportError):
+		# no working multiprocessing here (e.g. missing sem_open)
+		return None
+
+def convert_folder(folder, to='json', include=None, exclude=(), output_folder=None,
+	skip_newer=False, settings=None, processes=True, workers=None, progress=None):
+	"""
+	Convert every matching file below `folder` next to itself (or into the
+	same relative place under `output_folder`). `include` defaults to the
+	extension of the opposite format; with `skip_newer`, files whose target
+	is at least as new as the source are left alone.
+
+	Files are spread over a ProcessPoolExecutor when `processes` is set and
+	multiprocessing works, and converted one after another otherwise.
+	progress(done, total) is called with file counts after every file and
+	may raise ConversionCancelled. Returns a BatchSummary.
+	"""
+	if include is None:
+		include = ('*.json',) if to == 'xml' else ('*.xml',)
+	settings = settings or ConversionSettings()
+	jobs = [(source, _batch_target(source, folder, output_folder, to), to, settings, skip_newer)
+		for source in find_files(folder, include, exclude)]
+	started = time.time()
+	results = []
+
+	def report():
+		if progress is not None:
+			progress(len(results), len(jobs))
+
+	report()
+	pool = _process_pool(workers) if processes and len(jobs) > 1 else None
+	if pool is None:
+		for job in jobs:
+			results.append(_convert_batch_file(job))
+			report()
+	else:
+		futures = [pool.submit(_convert_batch_file, job) for job in jobs]
+		try:
+			for future in as_completed(futures):
+				results.append(future.result())
+				report()
+		finally:
+			for future in futures:
+				future.cancel()
+			pool.shutdown(wait=True)
+		order = dict((job[0], index) for index, job in enumerate(jobs))
+		results.sort(key=lambda result: order[result.source])
+	return BatchSummary(results, time.time() - started)
+
+
+def main(argv=None):
+	import argparse
+	parser = argparse.ArgumentParser(
+		description='Convert XML files to JSON and JSON files to XML.')
+	parser.add_argument('source', help='file or folder to convert')
+	parser.add_argument('target', nargs='?',
+		help='output file, or output folder when converting a folder '
+		'(default: next to the source with the extension swapped)')
+	parser.add_argument('--to', choices=('json', 'ndjson', 'xml'),
+		help='output format, ndjson for one line of JSON per record '
+		'(default: guessed from the source extension; json for folders)')
+	parser.add_argument('--records', default=NDJSON_RECORDS,
+		help='path of the records written with --to ndjson, e.g. '
+		'/feed/entry (default: every child of the document element)')
+	parser.add_argument('--include', action='append',
+		help='glob of files to convert in a folder, may be repeated '
+		'(default: *.xml, or *.json with --to xml)')
+	parser.add_argument('--exclude', action='append', default=[],
+		help='glob of files to leave out of a folder, may be repeated')
+	parser.add_argument('--skip-newer', action='store_true',
+		help='skip files whose target is at least as new as the source')
+	parser.add_argument('--jobs', type=int,
+		help='worker processes for folders and --parallel (default: one per CPU)')
+	parser.add_argument('--parallel', action='store_true',
+		help='convert a large XML file made of many records in worker '
+		'processes, split between the children of its document element')
+	parser.add_argument('--spill-text-size', type=int, default=SPILL_TEXT_SIZE,
+		help='keep text nodes of at least this many characters in a temporary '
+		'file while converting XML to JSON; 0 keeps them in memory '
+		'(default: 16777216)')
+	parser.add_argument('--compact', action='store_true',
+		help='write compact output instead of pretty printing')
+	parser.add_argument('--indent', type=int, default=2,
+		help='indentation size (default: 2)')
+	parser.add_argument('--sort-keys', action='store_true')
+	parser.add_argument('--ensure-ascii', action='store_true')
+	parser.add_argument('--no-normalize', action='store_true',
+		help='keep @attribute/#text keys instead of flattening them')
+	parser.add_argument('--value-key', default='value',
+		help='key for element text when normalizing (default: value)')
+	parser.add_argument('--root-name', default='root',
+		help='root element for JSON that lacks a single root (default: root)')
+	parser.add_argument('--no-declaration', action='store_true',
+		help='omit the XML declaration')
+	parser.add_argument('--empty-tag-style', default='compact',
+		choices=('compact', 'spaced', 'expanded'))
+	parser.add_argument('--line-ending', default='auto',
+		choices=('auto', 'lf', 'crlf', 'cr'))
+	args = parser.parse_args(argv)
+
+	settings = ConversionSettings(
+		pretty=not args.compact,
+		json_indent=args.indent,
+		xml_indent=' ' * args.indent,
+		ensure_ascii=args.ensure_ascii,
+		sort_keys=args.sort_keys,
+		normalize=not args.no_normalize,
+		value_key=args.value_key,
+		root_name=args.root_name,
+		json_lines_records=args.records,
+		xml_declaration=not args.no_declaration,
+		empty_tag_style=args.empty_tag_style,
+		line_ending=_setting_line_ending(args.line_ending),
+		spill_text_min_size=args.spill_text_size)
+
+	if os.path.isdir(args.source):
+		summary = convert_folder(args.source, args.to or 'json', args.include,
+			args.exclude, args.target, args.skip_newer, settings, workers=args.jobs)
+		for result in summary.results:
+			if result.status == 'failed':
+				sys.stderr.write('{}: {}\n'.format(result.source, result.error))
+		sys.stderr.write(str(summary) + '\n')
+		return 1 if summary.count('failed') else 0
+
+	started = time.time()
+	target = convert_file_with_settings(args.source, args.target, settings, args.to,
+		parallel=args.parallel, workers=args.jobs)
+	sys.stderr.write('{} -> {} ({:.2f}s)\n'.format(args.source, target, time.time() - started))
+	return 0
+
+if __name__ == '__main__':  # pragma: no cover
+	sys.exit(main())
@@ -1,9 +1,16 @@
 #!/usr/bin/env python
 "Makes working with XML feel like you are working with JSON"
 
+import re
 from xml.parsers import expat
-from xml.sax.saxutils import XMLGenerator
+from xml.sax.saxutils import XMLGenerator, quoteattr
 from xml.sax.xmlreader import AttributesImpl
+from itertools import repeat as _repeat
+from types import GeneratorType
+try:  # pragma no cover
+    from itertools import izip as _izip
+except ImportError:  # pragma no cover
+    _izip = zip
 try:  # pragma no cover
     from cStringIO import StringIO
 except ImportError:  # pragma no cover
@@ -74,7 +81,10 @@ class _DictSAXHandler(object):
                  dict_constructor=OrderedDict,
                  strip_whitespace=True,
                  namespace_separator=':',
-                 namespaces=None):
+                 namespaces=None,
+                 intern_limit=0,
+                 intern_value_length=0,
+                 intern_table=None):
         self.path = []
         self.stack = []
         self.data = None
@@ -91,32 +101,68 @@ class _DictSAXHandler(object):
         self.strip_whitespace = strip_whitespace
         self.namespace_separator = namespace_separator
         self.namespaces = namespaces
+        self.intern_limit = intern_limit
+        self.intern_value_length = intern_value_length
+        self.intern_table = {} if intern_table is None else intern_table
+        # attribute name -> prefixed key, while interning
+        self.attr_keys = {}
+
+    def _intern(self, value):
+        table = self.intern_table
+        interned = table.get(value)
+        if interned is not None:
+            return interned
+        if len(table) < self.intern_limit:
+            table[value] = value
+        return value
 
     def _build_name(self, full_name):
         if not self.namespaces:
-            return full_name
-        i = full_name.rfind(self.namespace_separator)
-        if i == -1:
-            return full_name
-        namespace, name = full_name[:i], full_name[i+1:]
-        short_namespace = self.namespaces.get(namespace, namespace)
-        if not short_namespace:
-            return name
+            name = full_name
         else:
-            return self.namespace_separator.join((short_namespace, name))
+            i = full_name.rfind(self.namespace_separator)
+            if i == -1:
+                name = full_name
+            else:
+                namespace, name = full_name[:i], full_name[i+1:]
+                short_namespace = self.namespaces.get(namespace, namespace)
+                if short_namespace:
+                    name = self.namespace_separator.join((short_namespace, name))
+        if self.intern_limit:
+            name = self._intern(name)
+        return name
 
     def _attrs_to_dict(self, attrs):
         if isinstance(attrs, dict):
             return attrs
+        if self.intern_limit and attrs:
+            intern = self._intern
+            length = self.intern_value_length
+            return self.dict_constructor(
+                (intern(key), intern(value) if len(value) <= length else value)
+                for (key, value) in zip(attrs[0::2], attrs[1::2]))
         return self.dict_constructor(zip(attrs[0::2], attrs[1::2]))
 
+    def _attr_key(self, key):
+        prefixed = self.attr_keys.get(key)
+        if prefixed is None:
+            prefixed = self.attr_prefix + key
+            if len(self.attr_keys) < self.intern_limit:
+                self.attr_keys[key] = prefixed
+        return prefixed
+
     def startElement(self, full_name, attrs):
         name = self._build_name(full_name)
         attrs = self._attrs_to_dict(attrs)
         self.path.append((name, attrs or None))
         if len(self.path) > self.item_depth:
             self.stack.append((self.item, self.data))
-            if self.xml_attribs:
+            if self.xml_attribs and self.intern_limit:
+                attr_key = self._attr_key
+                attrs = self.dict_constructor(
+                    (attr_key(key), value)
+                    for (key, value) in attrs.items())
+            elif self.xml_attribs:
                 attrs = self.dict_constructor(
                     (self.attr_prefix+key, value)
                     for (key, value) in attrs.items())
@@ -129,16 +175,16 @@ class _DictSAXHandler(object):
         name = self._build_name(full_name)
         if len(self.path) == self.item_depth:
             item = self.item
-            if item is None:
-                item = self.data
+            if item is None and self.data is not None:
+                item = self.cdata_separator.join(self.data)
             should_continue = self.item_callback(self.path, item)
             if not should_continue:
                 raise ParsingInterrupted()
         if len(self.stack):
             item, data = self.item, self.data
             self.item, self.data = self.stack.pop()
-            if self.strip_whitespace and data is not None:
-                data = data.strip() or None
+            if data is not None:
+                data = self._join_data(data)
             if data and self.force_cdata and item is None:
                 item = self.dict_constructor()
             if item is not None:
@@ -152,10 +198,21 @@ class _DictSAXHandler(object):
         self.path.pop()
 
     def characters(self, data):
-        if not self.data:
-            self.data = data
+        # keep the pieces and join them once the element closes: adding
+        # them up one by one copies a large text node over and over
+        if self.data is None:
+            self.data = [data]
         else:
-            self.data += self.cdata_separator + data
+            self.data.append(data)
+
+    def _join_data(self, data):
+        data = self.cdata_separator.join(data)
+        if self.strip_whitespace:
+            data = data.strip() or None
+        if (self.intern_limit and data is not None
+                and len(data) <= self.intern_value_length):
+            data = self._intern(data)
+        return data
 
     def push_data(self, item, key, data):
         if self.postprocessor is not None:
@@ -176,6 +233,33 @@ class _DictSAXHandler(object):
         return item
 
 
+def _make_parser(handler, encoding=None, expat=expat,
+                 process_namespaces=False, namespace_separator=':'):
+    """Create an expat parser wired to the `startElement`, `endElement` and
+    `characters` methods of `handler`, configured the way `parse` uses it.
+
+    Callers that want to drive the parser themselves (e.g. feeding it chunks
+    with `parser.Parse(chunk, False)`) can use this instead of `parse`.
+
+    """
+    if not process_namespaces:
+        namespace_separator = None
+    parser = expat.ParserCreate(
+        encoding,
+        namespace_separator
+    )
+    try:
+        parser.ordered_attributes = True
+    except AttributeError:
+        # Jython's expat does not support ordered_attributes
+        pass
+    parser.StartElementHandler = handler.startElement
+    parser.EndElementHandler = handler.endElement
+    parser.CharacterDataHandler = handler.characters
+    parser.buffer_text = True
+    return parser
+
+
 def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
           namespace_separator=':', **kwargs):
     """Parse the given XML input and convert it into a dictionary.
@@ -237,6 +321,17 @@ def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
         ...                 postprocessor=postprocessor)
         OrderedDict([(u'a', OrderedDict([(u'b:int', [1, 2]), (u'b', u'x')]))])
 
+    With `intern_limit`, element names, attribute names and prefixed
+    attribute keys are looked up in a table of up to that many strings, so
+    each one is kept once however often it repeats; attribute values and
+    text of at most `intern_value_length` characters are shared the same
+    way. Pass a dict as `intern_table` to share the table between parses::
+
+        >>> doc = xmltodict.parse('<a><b x="1">on</b><b x="1">on</b></a>',
+        ...                       intern_limit=1000, intern_value_length=8)
+        >>> doc['a']['b'][0]['#text'] is doc['a']['b'][1]['#text']
+        True
+
     You can pass an alternate version of `expat` (such as `defusedexpat`) by
     using the `expat` parameter. E.g:
 
@@ -251,21 +346,8 @@ def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
         if not encoding:
             encoding = 'utf-8'
         xml_input = xml_input.encode(encoding)
-    if not process_namespaces:
-        namespace_separator = None
-    parser = expat.ParserCreate(
-        encoding,
-        namespace_separator
-    )
-    try:
-        parser.ordered_attributes = True
-    except AttributeError:
-        # Jython's expat does not support ordered_attributes
-        pass
-    parser.StartElementHandler = handler.startElement
-    parser.EndElementHandler = handler.endElement
-    parser.CharacterDataHandler = handler.characters
-    parser.buffer_text = True
+    parser = _make_parser(handler, encoding, expat, process_namespaces,
+                          namespace_separator)
     try:
         parser.ParseFile(xml_input)
     except (TypeError, AttributeError):
@@ -273,6 +355,11 @@ def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
     return handler.item
 
 
+# values written as repeated elements; generators are consumed while the
+# document is written, so it never has to exist in memory as a whole
+_sequence_types = (list, tuple, GeneratorType)
+
+
 def _emit(key, value, content_handler,
           attr_prefix='@',
           cdata_key='#text',
@@ -281,53 +368,223 @@ def _emit(key, value, content_handler,
           pretty=False,
           newl='\n',
           indent='\t'):
-    if preprocessor is not None:
-        result = preprocessor(key, value)
-        if result is None:
-            return
-        key, value = result
-    if not isinstance(value, (list, tuple)):
-        value = [value]
-    if depth == 0 and len(value) > 1:
-        raise ValueError('document with multiple roots')
-    for v in value:
-        if v is None:
-            v = OrderedDict()
-        elif not isinstance(v, dict):
-            v = _unicode(v)
-        if isinstance(v, _basestring):
-            v = OrderedDict(((cdata_key, v),))
-        cdata = None
-        attrs = OrderedDict()
-        children = []
-        for ik, iv in v.items():
-            if ik == cdata_key:
-                cdata = iv
+    # frames are (items, key, child_depth, run_preprocessor, cdata): the
+    # (key, value) pairs still to emit and the element to end once they
+    # are done, or no key for the values of a list
+    stack = [(iter(((key, value),)), None, depth, True, None)]
+    push = stack.append
+    while stack:
+        items, key, depth, run_preprocessor, cdata = stack[-1]
+        for ik, iv in items:
+            if run_preprocessor:
+                if preprocessor is not None:
+                    result = preprocessor(ik, iv)
+                    if result is None:
+                        continue
+                    ik, iv = result
+                if isinstance(iv, _sequence_types):
+                    if depth == 0 and not isinstance(iv, GeneratorType) \
+                            and len(iv) > 1:
+                        raise ValueError('document with multiple roots')
+                    push((_izip(_repeat(ik), iv), None, depth, False, None))
+                    break
+            if iv is None:
+                iv = OrderedDict()
+            elif not isinstance(iv, dict):
+                iv = _unicode(iv)
+            if isinstance(iv, _basestring):
+                iv = OrderedDict(((cdata_key, iv),))
+            text = None
+            attrs = OrderedDict()
+            children = []
+            for name, v in iv.items():
+                if name == cdata_key:
+                    text = v
+                    continue
+                if name.startswith(attr_prefix):
+                    attrs[name[len(attr_prefix):]] = v
+                    continue
+                children.append((name, v))
+            if pretty:
+                content_handler.ignorableWhitespace(depth * indent)
+            content_handler.startElement(ik, AttributesImpl(attrs))
+            if children:
+                if pretty:
+                    content_handler.ignorableWhitespace(newl)
+                push((iter(children), ik, depth + 1, True, text))
+                break
+            if text is not None:
+                content_handler.characters(text)
+            content_handler.endElement(ik)
+            if pretty and depth:
+                content_handler.ignorableWhitespace(newl)
+        else:
+            stack.pop()
+            if key is None:
                 continue
-            if ik.startswith(attr_prefix):
-                attrs[ik[len(attr_prefix):]] = iv
+            # every child is emitted: end the element
+            depth -= 1
+            if cdata is not None:
+                content_handler.characters(cdata)
+            if pretty:
+                content_handler.ignorableWhitespace(depth * indent)
+            content_handler.endElement(key)
+            if pretty and depth:
+                content_handler.ignorableWhitespace(newl)
+
+
+def _escape_text(data):
+    # membership tests first: most text has nothing to escape, and
+    # str.replace beats str.translate with a mapping table by far
+    if '&' in data or '<' in data or '>' in data:
+        data = data.replace('&', '&amp;').replace('>', '&gt;').replace('<', '&lt;')
+    return data
+
+
+_attr_special = re.compile('[&<>"\n\r\t]').search
+
+
+def _quote_attr(data):
+    """Same result as xml.sax.saxutils.quoteattr()."""
+    data = _escape_text(data)
+    if '\n' in data or '\r' in data or '\t' in data:
+        data = data.replace('\n', '&#10;').replace('\r', '&#13;').replace('\t', '&#9;')
+    if '"' in data:
+        if "'" in data:
+            return '"%s"' % data.replace('"', '&quot;')
+        return "'%s'" % data
+    return '"%s"' % data
+
+
+def _emit_direct(key, value, write,
+                 attr_prefix='@',
+                 cdata_key='#text',
+                 depth=0,
+                 preprocessor=None,
+                 pretty=False,
+                 newl='\n',
+                 indent='\t',
+                 short_empty_elements=True,
+                 space_before_slash=False,
+                 encoding='utf-8'):
+    """Write the same markup as `_emit` through an `XMLGenerator`, but as
+    plain strings passed to `write`, walking the input with an explicit
+    stack instead of recursion. Values that are not strings are converted
+    (or rejected) the way `XMLGenerator` does it: attribute values go
+    through `quoteattr` and text is decoded with `encoding`."""
+    empty_end = ' />' if space_before_slash else '/>'
+    prefix_len = len(attr_prefix)
+    if not pretty:
+        newl = indent = ''
+    # the start tag of the innermost element is left open ('<a x="1"')
+    # until something is written inside it, so empty elements can be
+    # closed with '/>'
+    pending = False
+    # frames are (items, key, child_depth, run_preprocessor, cdata): the
+    # (key, value) pairs still to write and the element to close once they
+    # are done, or no key for the values of a list
+    stack = [(iter(((key, value),)), None, depth, True, None)]
+    push = stack.append
+    while stack:
+        items, key, depth, run_preprocessor, cdata = stack[-1]
+        for ik, iv in items:
+            if run_preprocessor:
+                if preprocessor is not None:
+                    result = preprocessor(ik, iv)
+                    if result is None:
+                        continue
+                    ik, iv = result
+                if isinstance(iv, _sequence_types):
+                    if depth == 0 and not isinstance(iv, GeneratorType) \
+                            and len(iv) > 1:
+                        raise ValueError('document with multiple roots')
+                    push((_izip(_repeat(ik), iv), None, depth, False, None))
+                    break
+
+            start = '>' if pending else ''
+            if indent and depth:
+                start += depth * indent
+            text = None
+            children = None
+            if iv is None:
+                start += '<' + ik
+            elif isinstance(iv, dict):
+                attrs = None
+                for name, v in iv.items():
+                    if name == cdata_key:
+                        text = v
+                    elif name.startswith(attr_prefix):
+                        if attrs is None:
+                            attrs = []
+                        if not isinstance(v, _basestring):
+                            v = quoteattr(v)
+                        elif _attr_special(v):
+                            v = _quote_attr(v)
+                        else:
+                            v = '"' + v + '"'
+                        attrs.append(' ' + name[prefix_len:] + '=' + v)
+                    elif children is None:
+                        children = [(name, v)]
+                    else:
+                        children.append((name, v))
+                start += '<' + ik + ''.join(attrs) if attrs else '<' + ik
+            else:
+                text = iv if isinstance(iv, _basestring) else _unicode(iv)
+                start += '<' + ik
+
+            if children is not None:
+                if newl:
+                    write(start + '>' + newl)
+                    pending = False
+                elif short_empty_elements:
+                    write(start)
+                    pending = True
+                else:
+                    write(start + '>')
+                    pending = False
+                push((iter(children), ik, depth + 1, True, text))
+                break
+            if text:
+                if not isinstance(text, _basestring):
+                    text = _unicode(text, encoding)
+                start += '>' + _escape_text(text) + '</' + ik + '>'
+            elif short_empty_elements:
+                start += empty_end
+            else:
+                start += '></' + ik + '>'
+            if newl and depth:
+                start += newl
+            write(start)
+            pending = False
+        else:
+            stack.pop()
+            if key is None:
                 continue
-            children.append((ik, iv))
-        if pretty:
-            content_handler.ignorableWhitespace(depth * indent)
-        content_handler.startElement(key, AttributesImpl(attrs))
-        if pretty and children:
-            content_handler.ignorableWhitespace(newl)
-        for child_key, child_value in children:
-            _emit(child_key, child_value, content_handler,
-                  attr_prefix, cdata_key, depth+1, preprocessor,
-                  pretty, newl, indent)
-        if cdata is not None:
-            content_handler.characters(cdata)
-        if pretty and children:
-            content_handler.ignorableWhitespace(depth * indent)
-        content_handler.endElement(key)
-        if pretty and depth:
-            content_handler.ignorableWhitespace(newl)
+            # every child is written: close the element
+            depth -= 1
+            end = ''
+            if cdata:
+                if not isinstance(cdata, _basestring):
+                    cdata = _unicode(cdata, encoding)
+                end = '>' + _escape_text(cdata) if pending else _escape_text(cdata)
+                pending = False
+            if indent and depth:
+                if pending:
+                    end += '>'
+                    pending = False
+                end += depth * indent
+            if pending:
+                end += empty_end
+                pending = False
+            else:
+                end += '</' + key + '>'
+            if newl and depth:
+                end += newl
+            write(end)
 
 
 def unparse(input_dict, output=None, encoding='utf-8', full_document=True,
-            empty_tag_style='compact', **kwargs):
+            empty_tag_style='compact', emitter='sax', **kwargs):
     """Emit an XML document for the given `input_dict` (reverse of `parse`).
 
     The resulting XML document is returned as a string, but if `output` (a
@@ -345,6 +602,13 @@ def unparse(input_dict, output=None, encoding='utf-8', full_document=True,
     accepts one of `'compact'` (default: `<tag/>`), `'spaced'` (`<tag />`), or
     `'expanded'` (`<tag></tag>`).
 
+    With `emitter='direct'` the markup is built as strings without going
+    through `XMLGenerator`; the output is the same, several times faster.
+
+    Lists may also be generators. They are consumed as the document is
+    written, so with `output` a long run of elements can be streamed
+    without building it first.
+
     """
     if empty_tag_style is None:
         empty_tag_style = 'compact'
@@ -362,6 +626,12 @@ def unparse(input_dict, output=None, encoding='utf-8', full_document=True,
         raise ValueError("empty_tag_style must be one of 'compact', "
                          "'spaced' or 'expanded'")
     ((key, value),) = input_dict.items()
+    if emitter == 'direct':
+        return _unparse_direct(key, value, output, encoding, full_document,
+                               short_empty_elements, space_before_slash,
+                               **kwargs)
+    elif emitter != 'sax':
+        raise ValueError("emitter must be 'sax' or 'direct'")
     must_return = False
     if output is None:
         output = StringIO()
@@ -383,6 +653,38 @@ def unparse(input_dict, output=None, encoding='utf-8', full_document=True,
             pass
         return value
 
+
+def _unparse_direct(key, value, output, encoding, full_document,
+                    short_empty_elements, space_before_slash, **kwargs):
+    chunks = []
+    if full_document:
+        chunks.append('<?xml version="1.0" encoding="%s"?>\n' % encoding)
+    if output is None:
+        _emit_direct(key, value, chunks.append,
+                     short_empty_elements=short_empty_elements,
+                     space_before_slash=space_before_slash,
+                     encoding=encoding, **kwargs)
+        return ''.join(chunks)
+
+    try:
+        from xml.sax.saxutils import _gettextwriter
+        out = _gettextwriter(output, encoding)
+    except ImportError:  # pragma no cover
+        out = output
+
+    def write(data):
+        chunks.append(data)
+        if len(chunks) >= 4096:
+            out.write(''.join(chunks))
+            del chunks[:]
+    _emit_direct(key, value, write,
+                 short_empty_elements=short_empty_elements,
+                 space_before_slash=space_before_slash,
+                 encoding=encoding, **kwargs)
+    out.write(''.join(chunks))
+    out.flush()
+
+
 if __name__ == '__main__':  # pragma: no cover
     import sys
     import marshal